@@ -1,8 +1,7 @@
 from abc import ABC, abstractmethod
-import random
 
+from percepts import Percepts
 from state import State
-from rng import labyrinthSeed
 
 
 class Agent(ABC):
@@ -13,20 +12,28 @@ class Agent(ABC):
     RIGHT = "right"
     DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
 
-    def __init__(self, startingLocation, sightRange, width, height, name):
+    def __init__(self, startingLocation, sightRange, width, height, name, rng):
         self.__location = startingLocation  # {'x': x, 'y', y}
         self.__sightRange = sightRange  # how far the agent can see in front of itself
         self.__state = State(memoryLoss=0, width=width, height=height)
+        # random.Random owned by this agent alone, so its choices do not depend on other agents
+        self.__rng = rng
         # TODO: possibly change how direction is selected, will depend on how agents are spawned in
-        labyrinthSeed(name)
-        self.__direction = random.choice(self.DIRECTIONS)
+        self.__direction = self.__rng.choice(self.DIRECTIONS)
         self.__inventory = []
         self.__isAlive = True
         self.__score = 0
         self.__name = name
         self.__knowsMonsterIsDead = False
         self.__fleeCountdown = 0
+        self.__percepts = None
 
+        self.__bindTurnDirections()
+
+        self.__actions = [self.pickUp, self.die, self.win,
+                          self.turnRight, self.turnLeft, self.turnAround, self.move]
+
+    def __bindTurnDirections(self):
         # map of how to turn based on current direction and desired direction
         # (agentDirection, desiredDirection): turnFunction
         self.turnDirections = {
@@ -47,45 +54,83 @@ class Agent(ABC):
             (self.RIGHT, self.LEFT): self.turnAround
         }
 
-        self.__actions = [self.pickUp, self.die, self.win,
-                          self.turnRight, self.turnLeft, self.turnAround, self.move]
+    def __getstate__(self):
+        # TRICKY: Copies and saved runs keep the actions by name and drop the turn table and the Percepts,
+        # which hold bound methods and Cell views of the Gamestate. They are bound again on the copy,
+        # and a copy observes before it uses its Percepts
+        state = self.__dict__.copy()
+        del state["turnDirections"]
+        state["_Agent__actions"] = [action.__name__ for action in self.__actions]
+        state["_Agent__percepts"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # agents saved before actions were kept by name hold bound methods
+        self.__actions = [getattr(self, action if isinstance(action, str) else action.__name__)
+                          for action in self.__actions]
+        self.__bindTurnDirections()
 
     """
     Abstract Methods
     """
 
     @abstractmethod
-    def getValidActions(self, actions):
+    def getValidActions(self, actions, percepts):
         """
         Find which actions are valid to perform
-        :param actions:  the list of all possible actions the agent can choose from
-        :return:         the list of all valid actions the agent can choose from
+        :param actions:   the list of all possible actions the agent can choose from
+        :param percepts:  the Percepts of the current tick
+        :return:          the list of all valid actions the agent can choose from
         """
         # TODO: implement
         pass
 
-    @abstractmethod
-    def chooseAction(self, percepts):
-        """
-        Choose an action to perform
-        :param percepts:  list of what the agent currently perceives
-        :return:          the chosen action function
-        """
-        pass
-
     # TRICKY: While we would prefer to have this be a "private" method,
     # mangling makes it impossible to implement in the subclasses
     # See https://stackoverflow.com/a/31458576/7759262
     @abstractmethod
-    def _getUtility(self, action, percepts):
+    def _getUtilities(self, percepts):
         """
-        Get the utility of a potential action
-        :param action:    the action to determine the utility of
-        :param percepts:  list of what the agent currently perceives
-        :return:          the numerical utility of the action
+        Get the utility of every action in a single pass
+        Called once per tick, so any changes it makes to the agent's State happen once per tick
+        :param percepts:  the Percepts of the current tick
+        :return:          a dict of action function: numerical utility of the action
         """
         pass
 
+    """
+    Decision
+    """
+
+    def chooseAction(self, percepts):
+        """
+        Choose an action to perform
+        :param percepts:  the Percepts of the current tick
+        :return:          the chosen action function
+        """
+        validActions = self.getValidActions(self.getActions(), percepts)
+        if len(validActions) == 0:
+            return self.doNothing
+
+        utility = self._getUtilities(percepts)
+        actionUtility = {}
+        for action in validActions:
+            actionUtility[action] = utility[action]
+
+        # TODO: discuss with group and choose between these two methods
+
+        # if multiple actions tie for best utility, pick the first option
+        # return max(actionUtility, key=actionUtility.get)
+
+        # if multiple actions tie for best utility, pick randomly between them
+        maxUtility = actionUtility[max(actionUtility, key=actionUtility.get)]
+        maxActions = []
+        for action in actionUtility.keys():
+            if actionUtility[action] == maxUtility:
+                maxActions.append(action)
+        return self.getRng().choice(maxActions)
+
     """
     Getter Methods
     """
@@ -114,9 +159,18 @@ class Agent(ABC):
     def getActions(self):
         return self.__actions
 
+    def getPercepts(self):
+        """
+        :return:  the Percepts of the latest tick, or None before the agent has observed anything
+        """
+        return self.__percepts
+
     def getName(self):
         return self.__name
 
+    def getRng(self):
+        return self.__rng
+
     def isFleeing(self):
         return self.__fleeCountdown > 0
 
@@ -127,9 +181,18 @@ class Agent(ABC):
     def setLocation(self, location):
         self.__location = location
 
+    def setDirection(self, direction):
+        self.__direction = direction
+
     def setScore(self, score):
         self.__score = score
 
+    def setInventory(self, inventory):
+        self.__inventory = inventory
+
+    def setAlive(self, isAlive):
+        self.__isAlive = isAlive
+
     def addAction(self, action):
         self.__actions.append(action)
 
@@ -202,8 +265,7 @@ class Agent(ABC):
         return
 
     def flee(self):
-        cell = self.getState().getCellAt(
-            self.getLocation()['x'], self.getLocation()['y'])
+        cell = self.getPercepts().getCurrentCell()
         # Turn to the direction where there are no walls to run away
         facing = self.getDirection()
         if facing == "up":
@@ -249,24 +311,36 @@ class Agent(ABC):
         Take a look at the environment and add it to agent's internal state
         Does not count as an action, as it is always performed every tick
         :param cell:  The cell the agent is currently in
+        :return:      the Percepts of this tick
         """
+        self.__state.nextTick()
+
         # remember cell agent is standing in and mark it as traversed
         self.__state.remember(
             self.getLocation()['x'], self.getLocation()['y'], cell, beenTo=True)
 
         # remember cells the agent can see in front of itself
-        cells = self.getSeenCells()
+        cells = self.getSeenCells(cell)
         for seenCell in cells.keys():
             self.__state.remember(
                 cells[seenCell]["x"], cells[seenCell]["y"], seenCell)
 
-    def getSeenCells(self):
+        self.__percepts = Percepts(currentCell=cell,
+                                   seenCells=cells,
+                                   seenAgents=self.__seenAgents(cells),
+                                   seenItems=self.__seenItems(cells),
+                                   seesExit=self.__seesExit(cells),
+                                   surroundings=self.__state.getKnownSurroundings(
+                                       self.getLocation()["x"], self.getLocation()["y"]))
+        return self.__percepts
+
+    def getSeenCells(self, cell):
         """
         Get the cells the agent can currently see as determined by its sight range
-        :return:  A dict of cells and their {"x": x, "y": y} coordinates
+        :param cell:  The cell the agent is currently in
+        :return:      A dict of cells and their {"x": x, "y": y} coordinates
         """
-        seenCell = self.getState().getCellAt(
-            self.getLocation()["x"], self.getLocation()["y"])
+        seenCell = cell
         seenCells = {}
         seenCellDirection = [0, 0]
 
@@ -312,62 +386,62 @@ class Agent(ABC):
             return False
         return True
 
-    def seenAgents(self):
+    def isRememberingPath(self):
+        """
+        Check if the Agent is remembering a path as it moves
+        :return:  True if agent is leaving a BreadTrail, False if not
+        """
+        return len(self.getState().getBreadTrails()) != 0
+
+    def learnOfMonsterDeath(self):
+        """
+        The agent has learned of the monsters death. This is important for the soldier
+        """
+        self.__knowsMonsterIsDead = True
+
+    def knowsMonsterIsDead(self):
+        return self.__knowsMonsterIsDead
+
+    """
+    Private Methods
+    """
+
+    def __seenAgents(self, seenCells):
         """
         Determine if the agent can see another agent
-        :return:  List of agents that are seen. Empty if sees none.
+        :param seenCells:  the cells the agent can see
+        :return:           List of agents that are seen. Empty if sees none.
         """
         seenAgents = []
-        seenCells = self.getSeenCells()
         for cell in seenCells.keys():
             for agent in cell.getAgentList():
                 seenAgents.append(agent)
         seenNotSelf = [a for a in seenAgents if a != self]
         return seenNotSelf
 
-    def seenItems(self):
+    def __seenItems(self, seenCells):
         """
         Determine if the agent can see an item
-        :return:  List of items that are seen. Empty if sees none.
+        :param seenCells:  the cells the agent can see
+        :return:           List of items that are seen. Empty if sees none.
         """
         seenItems = []
-        seenCells = self.getSeenCells()
         for cell in seenCells.keys():
             for item in cell.getItemList():
                 seenItems.append(item)
         return seenItems
 
-    def seesExit(self):
+    def __seesExit(self, seenCells):
         """
         Determine if the agent can see the exit
-        :return:  True if it sees the exit, False if not
+        :param seenCells:  the cells the agent can see
+        :return:           True if it sees the exit, False if not
         """
-        seenCells = self.getSeenCells()
         for cell in seenCells.keys():
             if cell.isExit:
                 return True
         return False
 
-    def isRememberingPath(self):
-        """
-        Check if the Agent is remembering a path as it moves
-        :return:  True if agent is leaving a BreadTrail, False if not
-        """
-        return len(self.getState().getBreadTrails()) != 0
-
-    def learnOfMonsterDeath(self):
-        """
-        The agent has learned of the monsters death. This is important for the soldier
-        """
-        self.__knowsMonsterIsDead = True
-
-    def knowsMonsterIsDead(self):
-        return self.__knowsMonsterIsDead
-
-    """
-    Private Methods
-    """
-
     def __getForwards(self):
         """
         Get the coordinates of the cell directly in front of the Agent
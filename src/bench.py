@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from gameState import Gamestate
+from maze import MAZE_GENERATORS, LegacyMaze, makeMazeGenerator
+from run import Run, SimParams
+from state import State
+
+# the grid sizes of the micro benchmarks and of the suite, unless given
+BENCH_SIZES = [10, 20, 40, 80, 160]
+SUITE_SIZES = [10, 40]
+# every layout of the suite, as (maze generator, loopChance) by name. The last three are stress layouts:
+# one corridor through every cell, a single room without inner walls, and a dead end down every column
+SUITE_LAYOUTS = {
+    "legacy": ("legacy", 0.0),
+    "backtracker": ("backtracker", 0.0),
+    "sidewinder": ("sidewinder", 0.0),
+    "binaryTree": ("binaryTree", 0.0),
+    "loops": ("backtracker", 0.1),
+    "corridor": ("serpentine", 0.0),
+    "openRoom": ("binaryTree", 1.0),
+    "deadEnds": ("comb", 0.0),
+}
+# every metric the suite compares, and whether larger is better. Throughput is counted per run of the
+# calibration loop rather than per second, so it does not depend on how fast the machine is
+SUITE_METRICS = {
+    "roundsPerCalibration": True,
+    "runsPerCalibration": True,
+    "peakMemory": False,
+    "replaySize": False,
+}
+# the iterations of the calibration loop, timed after every run of the suite
+CALIBRATION_ITERATIONS = 50000
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchBaseline.json")
+
+
+class BenchArgs:
+    def __init__(self):
+        parser = argparse.ArgumentParser(
+            prog="bench", description='Benchmark the Labyrinth simulation')
+        parser.add_argument('--sizes', type=int, nargs='+', default=None,
+                            help=f'The grid sizes to benchmark. {BENCH_SIZES} by default, {SUITE_SIZES} for the suite')
+        parser.add_argument('--repeats', type=int, default=200,
+                            help='The number of decisions timed per agent and grid size')
+        parser.add_argument('--maze-size', type=int, default=1000,
+                            help='The width and height of the mazes generated')
+        parser.add_argument('--suite', action='store_true',
+                            help='Measure whole runs over a matrix of layouts, grid sizes, round limits and seeds '
+                                 'instead, and compare them to a baseline')
+        parser.add_argument('--layouts', type=str, nargs='+', default=list(SUITE_LAYOUTS), choices=SUITE_LAYOUTS.keys(),
+                            help='The layouts of the suite')
+        parser.add_argument('--round-limits', type=int, nargs='+', default=[200, 1000],
+                            help='The round limits of the suite')
+        parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2],
+                            help='The seeds every case of the suite is simulated with')
+        parser.add_argument('--run-repeats', type=int, default=3,
+                            help='The number of times every run of the suite is timed. The fastest counts')
+        parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE,
+                            help='The baseline file the suite is compared to')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results of the suite to the baseline file instead of comparing')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='The share a metric of the suite may get worse by before it fails')
+        args = vars(parser.parse_args())
+        self.suite = args['suite']
+        self.sizes = args['sizes'] or (SUITE_SIZES if self.suite else BENCH_SIZES)
+        self.repeats = args['repeats']
+        self.mazeSize = args['maze_size']
+        self.layouts = args['layouts']
+        self.roundLimits = args['round_limits']
+        self.seeds = args['seeds']
+        self.runRepeats = args['run_repeats']
+        self.baselinePath = args['baseline']
+        self.saveBaseline = args['save_baseline']
+        self.threshold = args['threshold']
+
+
+def benchDecisions(size: int, repeats: int):
+    """
+    Time how long agents take to choose an action on a square grid
+    :param size:     the width and height of the grid
+    :param repeats:  the number of decisions timed per agent
+    :return:         the mean time of a decision in seconds
+    """
+    state = Gamestate(width=size, height=size, seed=0, mazeGenerator=makeMazeGenerator("sidewinder", 0.05))
+    elapsed = 0
+    decisions = 0
+    for agent in state.getAgents().values():
+        percepts = agent.observe(state.getCellAt(agent.getLocation()['x'],
+                                                 agent.getLocation()['y']))
+        start = time.perf_counter()
+        for i in range(repeats):
+            agent.chooseAction(percepts)
+        elapsed += time.perf_counter() - start
+        decisions += repeats
+    return elapsed / decisions
+
+
+def benchMemory(size: int):
+    """
+    Measure how much memory an agent's State takes on a square grid
+    :param size:  the width and height of the grid
+    :return:      the number of bytes used by one agent's State
+    """
+    state = Gamestate(width=size, height=size, seed=0, mazeGenerator=makeMazeGenerator("sidewinder", 0.05))
+    agent = next(iter(state.getAgents().values()))
+    return agent.getState().getMemoryUsage()
+
+
+def benchMaze(name: str, size: int):
+    """
+    Time how long a maze generator takes to build a square layout
+    :param name:  the name of the MazeGenerator
+    :param size:  the width and height of the grid
+    :return:      the time taken in seconds
+    """
+    generator = MAZE_GENERATORS[name](loopChance=0.05)
+    start = time.perf_counter()
+    generator.generate(size, size, random.Random(0))
+    return time.perf_counter() - start
+
+
+def benchPlanning(size: int, repeats: int):
+    """
+    Time how long an agent's path planner takes to plan across a square maze, and to repair
+    the plan as the agent learns the walls cell by cell
+    :param size:     the width and height of the grid
+    :param repeats:  the number of cells learned
+    :return:         the time of the first plan and the mean time of a repaired plan, in seconds
+    """
+    state = Gamestate(width=size, height=size, seed=0, mazeGenerator=makeMazeGenerator("sidewinder", 0.05))
+    memory = State(0, size, size)
+    start = time.perf_counter()
+    memory.getNextStepToward(0, 0, size - 1, size - 1)
+    firstPlan = time.perf_counter() - start
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(repeats):
+        x, y = rng.randrange(size), rng.randrange(size)
+        memory.remember(x, y, state.getCellAt(x, y))
+        memory.getNextStepToward(0, 0, size - 1, size - 1)
+    return firstPlan, (time.perf_counter() - start) / repeats
+
+
+def benchRuns(layout: str, size: int, roundLimit: int, seeds: [int], repeats: int):
+    """
+    Simulate a case of the suite with every seed, and measure the runs
+    :param layout:      the name of the layout, see SUITE_LAYOUTS
+    :param size:        the width and height of the grid
+    :param roundLimit:  the most rounds a run lasts
+    :param seeds:       the master seed of every run
+    :param repeats:     the number of times every run is timed. The fastest counts
+    :return:            dict of roundsPerSecond, runsPerSecond, peakMemory and replaySize, and the metrics of
+                        SUITE_METRICS. Memory and replay sizes are bytes per run
+    """
+    maze, loopChance = SUITE_LAYOUTS[layout]
+    paramsList = [SimParams(width=size, height=size, seed=seed, maze=maze, loopChance=loopChance,
+                            roundLimit=roundLimit) for seed in seeds]
+    elapsed = 0
+    # the time of the runs in runs of the calibration loop
+    calibratedElapsed = 0
+    nRounds = 0
+    peakMemory = 0
+    replaySize = 0
+    # TRICKY: Runs print as they start and save, which would break up the report
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as replayDir:
+        for simParams in paramsList:
+            times = []
+            calibratedTimes = []
+            for i in range(repeats):
+                start = time.perf_counter()
+                run = Run(simParams=simParams)
+                times.append(time.perf_counter() - start)
+                # TRICKY: The machine may speed up or slow down during the suite, so every run is
+                # compared to the calibration loop timed straight after it
+                calibratedTimes.append(times[-1] / calibrate())
+            elapsed += min(times)
+            calibratedElapsed += min(calibratedTimes)
+            nRounds += run.getRoundCount()
+
+            # memory is measured on runs of its own, as tracing slows them down
+            tracemalloc.start()
+            run = Run(simParams=simParams)
+            peakMemory += tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            replayPath = os.path.join(replayDir, "run.replay")
+            run.toFile(replayPath)
+            replaySize += os.path.getsize(replayPath)
+    return {"roundsPerSecond": nRounds / elapsed,
+            "runsPerSecond": len(seeds) / elapsed,
+            "roundsPerCalibration": nRounds / calibratedElapsed,
+            "runsPerCalibration": len(seeds) / calibratedElapsed,
+            "peakMemory": peakMemory / len(seeds),
+            "replaySize": replaySize / len(seeds)}
+
+
+def calibrate():
+    """
+    Time a fixed loop of pure python work that has nothing to do with the simulation, to tell how fast
+    the machine is right now
+    :return:  the time of the loop in seconds
+    """
+    start = time.perf_counter()
+    counts = {}
+    total = 0
+    for j in range(CALIBRATION_ITERATIONS):
+        location = {'x': j % 97, 'y': j % 89}
+        key = (location['x'], location['y'])
+        counts[key] = counts.get(key, 0) + 1
+        total += len(counts) & j
+    return time.perf_counter() - start
+
+
+def runSuite(layouts: [str], sizes: [int], roundLimits: [int], seeds: [int], repeats: int):
+    """
+    Measure every case of the suite, a case per layout, grid size and round limit.
+    The legacy layout only comes in its own size
+    :return:  dict of case name: dict of metric: value, see SUITE_METRICS
+    """
+    print(f"===Suite (seeds {' '.join(map(str, seeds))})===")
+    results = {}
+    for layout in layouts:
+        for size in sizes:
+            if SUITE_LAYOUTS[layout][0] == "legacy" and size != LegacyMaze.SIZE:
+                continue
+            for roundLimit in roundLimits:
+                case = f"{layout} {size}x{size} {roundLimit} rounds"
+                metrics = benchRuns(layout, size, roundLimit, seeds, repeats)
+                print(f"{case}: 	{metrics['roundsPerSecond']:.0f} rounds/s, {metrics['runsPerSecond']:.1f} runs/s, "
+                      f"{metrics['peakMemory'] / 1024:.0f} KiB peak/run, {metrics['replaySize'] / 1024:.1f} KiB replay/run")
+                results[case] = {metric: metrics[metric] for metric in SUITE_METRICS}
+    return results
+
+
+def findRegressions(results, baseline, threshold: float):
+    """
+    Compare the results of the suite to a baseline. Cases that are not in the baseline are skipped
+    :param results:    dict of case name: dict of metric: value
+    :param baseline:   the same, from an earlier run of the suite
+    :param threshold:  the share a metric may get worse by
+    :return:           a line describing every metric that got worse by more than threshold
+    """
+    regressions = []
+    for case, metrics in results.items():
+        for metric, largerIsBetter in SUITE_METRICS.items():
+            before = baseline.get(case, {}).get(metric)
+            if not before:
+                continue
+            change = (metrics[metric] - before) / before
+            if (-change if largerIsBetter else change) > threshold:
+                regressions.append(f"{case} {metric}: {before:.4g} -> {metrics[metric]:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    args = BenchArgs()
+    if args.suite:
+        results = runSuite(args.layouts, args.sizes, args.roundLimits, args.seeds, args.runRepeats)
+        if args.saveBaseline:
+            with open(args.baselinePath, "w") as file:
+                json.dump({"seeds": args.seeds, "cases": results}, file, indent=2)
+            print(f"Wrote baseline to {args.baselinePath}")
+            return
+        if not os.path.exists(args.baselinePath):
+            sys.exit(f"No baseline at {args.baselinePath}. Pass --save-baseline to record one")
+        with open(args.baselinePath) as file:
+            baseline = json.load(file)
+        if baseline["seeds"] != args.seeds:
+            sys.exit(f"The baseline was recorded with seeds {baseline['seeds']}, not {args.seeds}")
+        regressions = findRegressions(results, baseline["cases"], args.threshold)
+        print(f"===Regressions beyond {args.threshold:.0%}===")
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(f"{len(regressions)} metrics regressed")
+        print("None")
+        return
+
+    print("===Decision Cost===")
+    for size in args.sizes:
+        print(f"{size}x{size}: \t{benchDecisions(size, args.repeats) * 1e6:.1f} us/decision")
+    print("===State Memory===")
+    for size in args.sizes:
+        print(f"{size}x{size}: \t{benchMemory(size) / 1024:.1f} KiB/agent")
+    print("===Path Planning===")
+    for size in args.sizes:
+        firstPlan, repairedPlan = benchPlanning(size, args.repeats)
+        print(f"{size}x{size}: \t{firstPlan * 1e3:.1f} ms first plan, {repairedPlan * 1e6:.1f} us/repaired plan")
+    print(f"===Maze Generation ({args.mazeSize}x{args.mazeSize})===")
+    for name in MAZE_GENERATORS:
+        if name != "legacy":
+            print(f"{name}: \t{benchMaze(name, args.mazeSize) * 1e3:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,88 +1,128 @@
 class Cell:
-    def __init__(self, wallUp, wallDown, wallLeft, wallRight):
-        # Boolean: Whether there is a wall
-        self.WALL_UP = wallUp
-        self.WALL_DOWN = wallDown
-        self.WALL_LEFT = wallLeft
-        self.WALL_RIGHT = wallRight
-        # Cell object: Adjacent cell data
-        self.cellUp = None
-        self.cellDown = None
-        self.cellRight = None
-        self.cellLeft = None
-        self.itemList = []
-        self.agentList = []
-        self.isExit = False
-
-    def setWalls(self, up, down, left, right):
-        self.WALL_UP = up
-        self.WALL_DOWN = down
-        self.WALL_LEFT = left
-        self.WALL_RIGHT = right
+    """
+    A view of one cell of a Gamestate.
+    The walls and exit flag live in the Gamestate's Layout, which is read only, and the agents and items
+    in its occupancy and item tables. A Cell only knows where to find them. The Gamestate hands out a single
+    Cell per location, so cells can still be compared by identity
+    """
+
+    # bits of a cell in the wall bitmask array
+    WALL_UP_BIT = 1
+    WALL_DOWN_BIT = 2
+    WALL_LEFT_BIT = 4
+    WALL_RIGHT_BIT = 8
+    WALLS_BITS = WALL_UP_BIT | WALL_DOWN_BIT | WALL_LEFT_BIT | WALL_RIGHT_BIT
+    EXIT_BIT = 16
+    # number of walls of a cell, by its bits
+    WALL_COUNTS = bytes(bin(bits & 0b1111).count("1") for bits in range(256))
+
+    def __init__(self, gamestate, x, y):
+        self.__gamestate = gamestate
+        self.__x = x
+        self.__y = y
+        self.__index = gamestate.getCellIndex(x, y)
+        # TRICKY: These are the Gamestate's own containers, not copies, so the view always reads the true state
+        self.__walls = gamestate.getWalls()
+        self.__agentLists = gamestate.getAgentLists()
+        self.__itemLists = gamestate.getItemLists()
+
+    """
+    Walls
+    """
+
+    def getBits(self):
+        """
+        :return:  the wall and exit bits of the cell
+        """
+        return self.__walls[self.__index]
 
     def isWallUp(self):
-        return self.WALL_UP
+        return self.__walls[self.__index] & self.WALL_UP_BIT != 0
 
     def isWallDown(self):
-        return self.WALL_DOWN
+        return self.__walls[self.__index] & self.WALL_DOWN_BIT != 0
 
     def isWallLeft(self):
-        return self.WALL_LEFT
+        return self.__walls[self.__index] & self.WALL_LEFT_BIT != 0
 
     def isWallRight(self):
-        return self.WALL_RIGHT
+        return self.__walls[self.__index] & self.WALL_RIGHT_BIT != 0
 
-    def setCellUp(self, cell):
-        self.cellUp = cell
+    @property
+    def WALL_UP(self):
+        return self.isWallUp()
 
-    def setCellDown(self, cell):
-        self.cellDown = cell
+    @property
+    def WALL_DOWN(self):
+        return self.isWallDown()
 
-    def setCellLeft(self, cell):
-        self.cellLeft = cell
+    @property
+    def WALL_LEFT(self):
+        return self.isWallLeft()
 
-    def setCellRight(self, cell):
-        self.cellRight = cell
+    @property
+    def WALL_RIGHT(self):
+        return self.isWallRight()
 
-    def setIsExit(self, boolean):
-        self.isExit = boolean
+    @property
+    def isExit(self):
+        return self.__walls[self.__index] & self.EXIT_BIT != 0
+
+    """
+    Neighbors
+    """
+
+    def getLocation(self):
+        return {"x": self.__x, "y": self.__y}
 
     def getCellUp(self):
-        return self.cellUp
+        return self.__gamestate.getCellAt(self.__x, self.__y - 1) if self.__y > 0 else None
 
     def getCellDown(self):
-        return self.cellDown
+        if self.__y + 1 < self.__gamestate.getHeight():
+            return self.__gamestate.getCellAt(self.__x, self.__y + 1)
+        return None
 
     def getCellLeft(self):
-        return self.cellLeft
+        return self.__gamestate.getCellAt(self.__x - 1, self.__y) if self.__x > 0 else None
 
     def getCellRight(self):
-        return self.cellRight
+        if self.__x + 1 < self.__gamestate.getWidth():
+            return self.__gamestate.getCellAt(self.__x + 1, self.__y)
+        return None
+
+    """
+    Agents and items
+    """
 
     def getItemList(self):
-        return self.itemList
+        return self.__itemLists.get(self.__index, [])
 
     def getAgentList(self):
-        return self.agentList
+        return self.__agentLists.get(self.__index, [])
 
     def addAgent(self, agent):
-        self.agentList.append(agent)
+        self.__agentLists.setdefault(self.__index, []).append(agent)
 
     def addItem(self, item):
-        self.itemList.append(item)
+        self.__itemLists.setdefault(self.__index, []).append(item)
 
     def removeAgent(self, agent):
         try:
-            self.agentList.remove(agent)
+            self.__agentLists.get(self.__index, []).remove(agent)
         except ValueError:
             print('The agent is not in the cell')
             return False
+        if not self.__agentLists[self.__index]:
+            del self.__agentLists[self.__index]
         return True
 
     def removeItem(self, item):
         try:
-            self.itemList.remove(item)
+            self.__itemLists.get(self.__index, []).remove(item)
         except ValueError:
             print('The item is not in the cell')
             return False
+        if not self.__itemLists[self.__index]:
+            del self.__itemLists[self.__index]
         return True
@@ -1,5 +1,3 @@
-import random
-
 from agent import Agent
 from item import Item
 from monster import Monster
@@ -7,20 +5,20 @@ from monster import Monster
 
 class Civilian(Agent):
 
-    def __init__(self, startingLocation, sightRange, width, height, name):
+    def __init__(self, startingLocation, sightRange, width, height, name, rng):
         super(Civilian, self).__init__(
-            startingLocation, sightRange, width, height, name)
+            startingLocation, sightRange, width, height, name, rng)
 
-    def getValidActions(self, actions):
+    def getValidActions(self, actions, percepts):
         """
         Find which actions are valid to perform
-        :param actions:  the list of all possible actions the agent can choose from
-        :return:         the list of all valid actions the agent can choose from
+        :param actions:   the list of all possible actions the agent can choose from
+        :param percepts:  the Percepts of the current tick
+        :return:          the list of all valid actions the agent can choose from
         """
         validActions = [self.turnLeft, self.turnRight,
                         self.turnAround, self.flee]
-        cell = self.getState().getCellAt(
-            self.getLocation()['x'], self.getLocation()['y'])
+        cell = percepts.getCurrentCell()
 
         if self.canMove(cell):
             validActions.append(self.move)
@@ -30,7 +28,7 @@ class Civilian(Agent):
                 if item is Item.keyCard or item is Item.gun:
                     validActions.append(self.pickUp)
 
-        if Item.gun in self.getInventory() and self.seenAgents():
+        if Item.gun in self.getInventory() and percepts.getSeenAgents():
             validActions.append(self.shoot)
 
         if Item.keyCard in self.getInventory() and cell.isExit:
@@ -38,33 +36,6 @@ class Civilian(Agent):
 
         return validActions
 
-    def chooseAction(self):
-        """
-        Choose an action to perform
-        :return:          the chosen action function
-        """
-        actionUtility = {}
-
-        currentCell = self.getState().getCellAt(
-            self.getLocation()["x"], self.getLocation()["y"])
-        surroundings = self.getState().getKnownSurroundings(
-            self.getLocation()["x"], self.getLocation()["y"])
-
-        validActions = self.getValidActions(self.getActions())
-        if len(validActions) == 0:
-            return self.doNothing
-
-        for action in validActions:
-            actionUtility[action] = self._getUtility(action, self.getState())
-
-        # if multiple actions tie for best utility, pick randomly between them
-        maxUtility = actionUtility[max(actionUtility, key=actionUtility.get)]
-        maxActions = []
-        for action in actionUtility.keys():
-            if actionUtility[action] == maxUtility:
-                maxActions.append(action)
-        return random.choice(maxActions)
-
     """
     Actions
     """
@@ -80,12 +51,11 @@ class Civilian(Agent):
     Private Methods
     """
 
-    def _getUtility(self, action, state):
+    def _getUtilities(self, percepts):
         """
-        Get the utility of a potential action
-        :param action:    the action to determine the utility of
-        :param state:    the known environment.
-        :return:          the numerical utility of the action
+        Get the utility of every action in a single pass
+        :param percepts:  the Percepts of the current tick
+        :return:          a dict of action function: numerical utility of the action
         """
         utility = {
             self.move: 1,
@@ -97,14 +67,12 @@ class Civilian(Agent):
             self.flee: 0
         }
 
-        currentCell = self.getState().getCellAt(
-            self.getLocation()["x"], self.getLocation()["y"])
-        surroundings = self.getState().getKnownSurroundings(
-            self.getLocation()["x"], self.getLocation()["y"])
+        currentCell = percepts.getCurrentCell()
+        surroundings = percepts.getSurroundings()
 
         # If agent has a gun, and agent sees (and is facing) the monster, prioritize shooting
         # Otherwise flee
-        seen = self.seenAgents()
+        seen = percepts.getSeenAgents()
         for s in seen:
             if isinstance(s, Monster):
                 if Item.gun in self.getInventory():
@@ -119,11 +87,11 @@ class Civilian(Agent):
             utility[self.pickUp] = 20
 
         # agent will prioritize moving towards items
-        if len(self.seenItems()) != 0:
+        if len(percepts.getSeenItems()) != 0:
             utility[self.move] = 10
 
         # agent will move towards exit when it sees it and has the key
-        if self.seesExit() and Item.keyCard in self.getInventory():
+        if percepts.seesExit() and Item.keyCard in self.getInventory():
             utility[self.move] = 15
 
         # agent will exit when it has the key
@@ -142,10 +110,8 @@ class Civilian(Agent):
             if nextCellLocation == None:
                 self.getState().finishBreadTrail()
             else:
-                nextCell = self.getState().getCellAt(
-                    nextCellLocation["x"], nextCellLocation["y"])
                 nextCellDirection = list(surroundings.keys())[list(
-                    surroundings.values()).index(nextCell)]  # get key of value in dict
+                    surroundings.values()).index(nextCellLocation)]  # get key of value in dict
                 if nextCellDirection == self.getDirection():
                     utility[self.move] = 10
                 else:
@@ -155,25 +121,25 @@ class Civilian(Agent):
         # agent prioritizes learning its surroundings over moving ONLY if it is not fleeing
         if not self.isFleeing():
             # check up
-            if self.getState().getCellLocation(surroundings[self.UP]) == None and not currentCell.isWallUp():
+            if self.getState().getKnownLocation(surroundings[self.UP]) == None and not currentCell.isWallUp():
                 utility[self.turnDirections[(
                     self.getDirection(), self.UP)]] = 2
             # check down
-            if self.getState().getCellLocation(surroundings[self.DOWN]) == None and not currentCell.isWallDown():
+            if self.getState().getKnownLocation(surroundings[self.DOWN]) == None and not currentCell.isWallDown():
                 utility[self.turnDirections[(
                     self.getDirection(), self.DOWN)]] = 2
             # check left
-            if self.getState().getCellLocation(surroundings[self.LEFT]) == None and not currentCell.isWallLeft():
+            if self.getState().getKnownLocation(surroundings[self.LEFT]) == None and not currentCell.isWallLeft():
                 utility[self.turnDirections[(
                     self.getDirection(), self.LEFT)]] = 2
             # check right
-            if self.getState().getCellLocation(surroundings[self.RIGHT]) == None and not currentCell.isWallRight():
+            if self.getState().getKnownLocation(surroundings[self.RIGHT]) == None and not currentCell.isWallRight():
                 utility[self.turnDirections[(
                     self.getDirection(), self.RIGHT)]] = 2
 
             # agent tries to not retread ground
             nextCell = surroundings[self.getDirection()]
-            nextCellLocation = self.getState().getCellLocation(nextCell)
+            nextCellLocation = self.getState().getKnownLocation(nextCell)
             if nextCellLocation != None:
                 # TODO: This is kinda ugly. Figure out some way to make this less messy
                 if self.getState().isVisited(nextCellLocation["x"], nextCellLocation["y"]):
@@ -181,7 +147,7 @@ class Civilian(Agent):
                     unvisitedNeighbors = False
                     for direction in self.DIRECTIONS:
                         if direction != self.getDirection():
-                            location = self.getState().getCellLocation(
+                            location = self.getState().getKnownLocation(
                                 surroundings[direction])
                             if location != None:
                                 if not self.getState().isVisited(location["x"], location["y"]):
@@ -195,4 +161,4 @@ class Civilian(Agent):
                         # Right now, the agent simply resets its visited cells
                         self.getState().resetVisitedCells()
 
-        return utility[action]
+        return utility
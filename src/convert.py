@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+
+from replay import CODECS, isReplay
+from run import Run
+
+
+class ConvertArgs:
+    def __init__(self):
+        parser = argparse.ArgumentParser(
+            prog="convert", description='Convert runs saved as .pkl files to replay files')
+        parser.add_argument('runs', type=str, nargs='+',
+                            help='The saved runs to convert')
+        parser.add_argument('--codec', type=str, default="zlib", choices=CODECS.keys(),
+                            help='How the replays are compressed')
+        args = vars(parser.parse_args())
+        self.runPaths = args['runs']
+        self.codec = args['codec']
+
+
+def convertRun(runPath: str, codec: str = "zlib"):
+    """
+    Convert a pickled run to a replay file next to it
+    :param runPath:  the .pkl file
+    :param codec:    how the replay is compressed. One of replay.CODECS
+    :return:         the path of the replay file
+    """
+    replayPath = os.path.splitext(runPath)[0] + ".replay"
+    Run(load_path=runPath).toFile(replayPath, codec)
+    return replayPath
+
+
+def main():
+    args = ConvertArgs()
+    for runPath in args.runPaths:
+        if isReplay(runPath):
+            print(f"\"{runPath}\" is already a replay")
+            continue
+        replayPath = convertRun(runPath, args.codec)
+        print(f"{os.path.getsize(runPath)} bytes -> {os.path.getsize(replayPath)} bytes")
+
+
+if __name__ == '__main__':
+    main()
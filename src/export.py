@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+import argparse
+import multiprocessing
+import os
+from array import array
+
+# TRICKY: Frames are drawn offscreen, so SDL must not need a real display. Set before pygame starts
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from gif import GifWriter, encodeFrame
+from render import Renderer, COLOR_BLACK, COLOR_WHITE, COLOR_RED, COLOR_GREEN, COLOR_ORANGE, \
+    COLOR_DARKGRAY, COLOR_BLUE, COLOR_PINK
+from run import Run
+
+FORMATS = ["png", "gif"]
+# the number of rounds a worker process draws at a time
+ROUNDS_PER_TASK = 32
+
+# every color the Renderer draws with, then a 6x6x6 color cube for the colors of the item images
+PALETTE = [COLOR_BLACK, COLOR_WHITE, COLOR_RED, COLOR_GREEN, COLOR_ORANGE, COLOR_DARKGRAY, COLOR_BLUE, COLOR_PINK] + \
+    [(r, g, b) for r in range(0, 256, 51) for g in range(0, 256, 51) for b in range(0, 256, 51)]
+CUBE_START = 8
+# the palette index of pixels a GIF frame leaves as they were, past the end of the palette
+TRANSPARENT = 255
+
+
+class ExportArgs:
+    def __init__(self):
+        parser = argparse.ArgumentParser(
+            prog="export", description='Draw every round of saved runs to PNG files or animated GIFs, without a display')
+        parser.add_argument('runs', type=str, nargs='+',
+                            help='The saved runs to export')
+        parser.add_argument('--format', type=str, default="png", choices=FORMATS,
+                            help='A numbered PNG per round in a directory per run, or a GIF per run')
+        parser.add_argument('-o', '--out', type=str, default="export",
+                            help='The directory to export to')
+        parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='The number of worker processes')
+        parser.add_argument('--size', type=int, default=800,
+                            help='The width and height of every frame')
+        parser.add_argument('--fps', type=int, default=10,
+                            help='The frame rate of GIFs')
+        args = vars(parser.parse_args())
+        if args['workers'] < 1:
+            parser.error(f"argument -w/--workers: must be at least 1, not {args['workers']}")
+        if args['fps'] < 1:
+            parser.error(f"argument --fps: must be at least 1, not {args['fps']}")
+        self.runPaths = args['runs']
+        self.format = args['format']
+        self.outDir = args['out']
+        self.nWorkers = args['workers']
+        self.size = args['size']
+        self.fps = args['fps']
+
+
+# the path, Run and Renderer of the run a worker process last drew
+_workerRun = (None, None, None)
+
+
+def _getRun(runPath: str, size: int):
+    global _workerRun
+    if _workerRun[0] != runPath:
+        run = Run(load_path=runPath)
+        state = run.getState(0)
+        renderer = Renderer(size, size, state.getWidth(), state.getHeight(), offscreen=True)
+        _workerRun = (runPath, run, renderer)
+    return _workerRun[1], _workerRun[2]
+
+
+def _getExportName(runPath: str):
+    return os.path.splitext(os.path.basename(runPath))[0]
+
+
+def _getFrameDelay(fps: int):
+    """
+    :return:  how long a GIF frame is shown, in hundredths of a second
+    """
+    # TRICKY: Many decoders play a delay of 0 at a speed of their own, so frames last at least 1
+    return max(1, round(100 / fps))
+
+
+def _toIndices(surface, rect: pygame.Rect, colorIndices: {int: int}):
+    """
+    :param colorIndices:  palette index by 32 bit RGBX color, of every color seen so far. Updated in place
+    :return:              the palette index of every pixel of a rect of the surface, row by row
+    """
+    pixels = array('I', pygame.image.tostring(surface.subsurface(rect), 'RGBX'))
+    for color in set(pixels) - colorIndices.keys():
+        rgb = (color & 0xFF, color >> 8 & 0xFF, color >> 16 & 0xFF)
+        if rgb in PALETTE[:CUBE_START]:
+            colorIndices[color] = PALETTE.index(rgb)
+        else:
+            r, g, b = ((c + 25) // 51 for c in rgb)
+            colorIndices[color] = CUBE_START + r * 36 + g * 6 + b
+    return bytes(map(colorIndices.__getitem__, pixels))
+
+
+def _exportRounds(task):
+    """
+    Draw a range of rounds of a run
+    :return:  (run path, first round, list of encoded GIF frames). The list is empty for PNGs
+    """
+    runPath, format, outDir, size, fps, firstRound, lastRound = task
+    run, renderer = _getRun(runPath, size)
+    surface = renderer.getSurface()
+    if firstRound > 0:
+        # draw the round before, so the first frame only covers what changed since then
+        renderer.draw(run.getState(firstRound - 1))
+    frames = []
+    colorIndices = {}
+    for round in range(firstRound, lastRound):
+        dirtyRects = renderer.draw(run.getState(round))
+        if format == "png":
+            pygame.image.save(surface, os.path.join(outDir, _getExportName(runPath), f"round_{round:05d}.png"))
+            continue
+        if round == 0:
+            rect = surface.get_rect()
+            frames.append(encodeFrame(_toIndices(surface, rect, colorIndices), *rect, _getFrameDelay(fps)))
+            continue
+        if not dirtyRects:
+            # nothing changed, but the frame still has to be shown for as long as the others
+            dirtyRects = [pygame.Rect(0, 0, 1, 1)]
+        # the frame covers every changed cell, and is transparent everywhere else
+        dirtyRects = [rect.clip(surface.get_rect()) for rect in dirtyRects]
+        bounds = dirtyRects[0].unionall(dirtyRects[1:])
+        indices = bytearray([TRANSPARENT]) * (bounds.width * bounds.height)
+        for rect in dirtyRects:
+            rectIndices = _toIndices(surface, rect, colorIndices)
+            for row in range(rect.height):
+                start = (rect.top - bounds.top + row) * bounds.width + rect.left - bounds.left
+                indices[start:start + rect.width] = rectIndices[row * rect.width:(row + 1) * rect.width]
+        frames.append(encodeFrame(bytes(indices), *bounds, _getFrameDelay(fps), TRANSPARENT))
+    return runPath, firstRound, frames
+
+
+def exportRuns(runPaths, outDir: str = "export", format: str = "png", nWorkers: int = 1, size: int = 800,
+               fps: int = 10):
+    """
+    Draw every round of saved runs, spread across a pool of worker processes
+    Each worker draws a range of rounds at a time. GIF frames are encoded by the workers and only
+    written in order here
+    :param runPaths:  the .replay (or .pkl) files of the runs
+    :param outDir:    the directory to export to. PNGs go in a directory per run, named after the run
+    :param format:    "png" or "gif"
+    :param nWorkers:  the number of worker processes. 1 draws in this process
+    :param size:      the width and height of every frame
+    :param fps:       the frame rate of GIFs. At least 1
+    """
+    if nWorkers < 1:
+        raise ValueError(f"The number of workers must be at least 1, not {nWorkers}")
+    if fps < 1:
+        raise ValueError(f"The frame rate must be at least 1, not {fps}")
+    # runs are exported under their file name, so two runs with the same name would overwrite each other
+    runPathsByName = {}
+    for runPath in runPaths:
+        runPathsByName.setdefault(_getExportName(runPath), []).append(runPath)
+    for name, paths in runPathsByName.items():
+        if len(paths) > 1:
+            raise ValueError(f"Runs {', '.join(paths)} would all be exported as \"{name}\". Rename or export them apart")
+    os.makedirs(outDir, exist_ok=True)
+    tasks = []
+    roundCounts = {}
+    nextRounds = {}
+    for runPath in runPaths:
+        nRounds = Run(load_path=runPath).getRoundCount()
+        roundCounts[runPath] = nRounds
+        if format == "png":
+            os.makedirs(os.path.join(outDir, _getExportName(runPath)), exist_ok=True)
+        nextRounds[runPath] = 0
+        tasks += [(runPath, format, outDir, size, fps, first, min(first + ROUNDS_PER_TASK, nRounds))
+                  for first in range(0, nRounds, ROUNDS_PER_TASK)]
+
+    if nWorkers == 1:
+        results = map(_exportRounds, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(nWorkers)
+        results = pool.imap_unordered(_exportRounds, tasks)
+
+    # GIF frames that finished before the frames in front of them, by run and first round
+    pending = {runPath: {} for runPath in runPaths}
+    writers = {}
+    nFinished = 0
+    for runPath, firstRound, frames in results:
+        nFinished += 1
+        if nFinished % max(1, len(tasks) // 10) == 0:
+            print(f"Drew {nFinished}/{len(tasks)} batches of rounds")
+        if format == "png":
+            continue
+        pending[runPath][firstRound] = frames
+        while nextRounds[runPath] in pending[runPath]:
+            if runPath not in writers:
+                writers[runPath] = GifWriter(os.path.join(outDir, _getExportName(runPath) + ".gif"),
+                                             size, size, PALETTE)
+            frames = pending[runPath].pop(nextRounds[runPath])
+            for frame in frames:
+                writers[runPath].writeFrame(frame)
+            nextRounds[runPath] += len(frames)
+        if nextRounds[runPath] == roundCounts[runPath]:
+            writers.pop(runPath).close()
+    if pool != None:
+        pool.close()
+        pool.join()
+
+
+def main():
+    args = ExportArgs()
+    exportRuns(args.runPaths, args.outDir, args.format, args.nWorkers, args.size, args.fps)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,270 +1,212 @@
-import random
-
 from cell import Cell
 from civilian import Civilian
-from item import Item
+from layout import Layout, closeWalls
+from maze import LegacyMaze
 from monster import Monster
 from scientist import Scientist
 from soldier import Soldier
-from rng import labyrinthSeed
+from rng import labyrinthRng, LABYRINTH_SEED_IDXS
 
 
 class Gamestate:
     """
     This is the representation for the true state of the game, separate from the Agent State (state.py)
+    The walls and exits are a Layout, which never changes and is shared with every copy of the Gamestate.
+    Agents and items are kept in tables of cell index: list, which only hold the occupied cells.
+    Cells are views onto these, made on demand by getCellAt
     """
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, seedIdxs=LABYRINTH_SEED_IDXS, seed=None, mazeGenerator=None):
         self.__agents = {}
         self.__width = width
         self.__height = height
-        self.__grid = []
-        for i in range(width):
-            self.__grid.append([])
-            for j in range(height):
-                cell = Cell(wallUp=False, wallDown=False,
-                            wallLeft=False, wallRight=False)
-                self.__grid[i].append(cell)
-        self.__applyLayout()
-        self.__linkCells()
+        self.__seedIdxs = seedIdxs
+        self.__seed = seed
+        self.__rng = labyrinthRng('layout', seedIdxs, seed)
+        self.__layout = None
+        self.__agentLists = {}
+        self.__itemLists = {}
+        self.__cells = {}
+        # the MazeGenerator builds the walls and places the exits and items. The original 10x10 layout by default
+        self.__applyLayout(mazeGenerator or LegacyMaze())
+        # every agent that was placed, including the ones removed since
+        self.__allAgents = dict(self.__agents)
         self.__escapees = []
         self.__victors = []
 
-    def __applyLayout(self):
-        # Place agents
+    def __applyLayout(self, mazeGenerator):
+        # Create agents
 
         # TRICKY: With the way things are now, the order here determines move priority
         # Place Monster at (width-1, height-1)
         self.__agents["monster"] = Monster(
             startingLocation={'x': self.__width-1, 'y': self.__height-1},
             sightRange=3, width=self.__width, height=self.__height,
-            name="monster")
-        self.__grid[self.__width-1][self.__height -
-                                    1].addAgent(self.__agents["monster"])
+            name="monster", rng=labyrinthRng("monster", self.__seedIdxs, self.__seed))
 
         # Place Civilian at (0, 0)
         self.__agents["civilian"] = Civilian(
             startingLocation={'x': 0, 'y': 0},
             sightRange=3, width=self.__width, height=self.__height,
-            name="civilian")
-        self.__grid[0][0].addAgent(self.__agents["civilian"])
+            name="civilian", rng=labyrinthRng("civilian", self.__seedIdxs, self.__seed))
 
         # Place Soldier at (width-1, 0)
         self.__agents["soldier"] = Soldier(
             startingLocation={'x': self.__width-1, 'y': 0},
             sightRange=3, width=self.__width, height=self.__height,
-            name="soldier")
-        self.__grid[self.__width - 1][0].addAgent(self.__agents["soldier"])
+            name="soldier", rng=labyrinthRng("soldier", self.__seedIdxs, self.__seed))
 
         # Place Scientist at (0, height-1)
         self.__agents["scientist"] = Scientist(
             startingLocation={'x': 0, 'y': self.__height-1},
             sightRange=3, width=self.__width, height=self.__height,
-            name="scientist")
-        self.__grid[0][self.__height - 1].addAgent(self.__agents["scientist"])
-
-        exit1Locations = [{'x': 0, 'y': 8},
-                          {'x': 5, 'y': 9},
-                          {'x': 9, 'y': 4}]
-        exit2Locations = [{'x': 9, 'y': 1},
-                          {'x': 3, 'y': 0},
-                          {'x': 0, 'y': 3}]
-        researchLocations = [{'x': 1, 'y': 1},
-                             {'x': 2, 'y': 9},
-                             {'x': 7, 'y': 6},
-                             {'x': 7, 'y': 0},
-                             {'x': 5, 'y': 5}]
-        gunLocations = [{'x': 1, 'y': 8},
-                        {'x': 4, 'y': 1},
-                        {'x': 7, 'y': 2},
-                        {'x': 9, 'y': 8},
-                        {'x': 4, 'y': 4}]
-        keyCardLocations = [{'x': 6, 'y': 3},
-                            {'x': 1, 'y': 6},
-                            {'x': 3, 'y': 2},
-                            {'x': 8, 'y': 9},
-                            {'x': 6, 'y': 5}]
-
-        labyrinthSeed('layout')
-        exitNum = random.randint(0, 2)
-        researchNum = random.randint(0, 4)
-        gunNum = random.randint(0, 4)
-        keyNum = random.randint(0, 4)
-
-        # Place both Exits at random location for the seed (they are paired together)
-        self.__grid[exit1Locations[exitNum]['x']
-                    ][exit1Locations[exitNum]['y']].setIsExit(True)
-        self.__grid[exit2Locations[exitNum]['x']
-                    ][exit2Locations[exitNum]['y']].setIsExit(True)
-        # Place Research at random location for the seed
-        self.__grid[researchLocations[researchNum]['x']
-                    ][researchLocations[researchNum]['y']].addItem(Item.research)
-        # Place Gun at random location for the seed
-        self.__grid[gunLocations[gunNum]['x']
-                    ][gunLocations[gunNum]['y']].addItem(Item.gun)
-        # Place Keycard at random location for the seed
-        self.__grid[keyCardLocations[keyNum]['x']
-                    ][keyCardLocations[keyNum]['y']].addItem(Item.keyCard)
-
-        # Place walls
-        # Top row of maze
-        self.__grid[0][0].setWalls(True, False, True, True)
-        self.__grid[1][0].setWalls(True, False, True, True)
-        self.__grid[2][0].setWalls(True, False, True, False)
-        self.__grid[3][0].setWalls(True, False, False, False)
-        self.__grid[4][0].setWalls(True, True, False, False)
-        self.__grid[5][0].setWalls(True, False, False, True)
-        self.__grid[6][0].setWalls(True, False, True, False)
-        self.__grid[7][0].setWalls(True, False, False, False)
-        self.__grid[8][0].setWalls(True, False, False, False)
-        self.__grid[9][0].setWalls(True, True, False, True)
-        # 2nd Row
-        self.__grid[0][1].setWalls(False, False, True, True)
-        self.__grid[1][1].setWalls(False, False, True, False)
-        self.__grid[2][1].setWalls(False, True, False, True)
-        self.__grid[3][1].setWalls(False, True, True, False)
-        self.__grid[4][1].setWalls(True, True, False, True)
-        self.__grid[5][1].setWalls(False, False, True, False)
-        self.__grid[6][1].setWalls(False, False, False, True)
-        self.__grid[7][1].setWalls(False, False, True, True)
-        self.__grid[8][1].setWalls(False, False, True, False)
-        self.__grid[9][1].setWalls(True, True, False, True)
-        # 3rd Row
-        self.__grid[0][2].setWalls(False, True, True, False)
-        self.__grid[1][2].setWalls(False, True, False, False)
-        self.__grid[2][2].setWalls(True, True, False, False)
-        self.__grid[3][2].setWalls(True, True, False, False)
-        self.__grid[4][2].setWalls(True, True, False, False)
-        self.__grid[5][2].setWalls(False, False, False, True)
-        self.__grid[6][2].setWalls(False, False, False, True)
-        self.__grid[7][2].setWalls(False, False, True, True)
-        self.__grid[8][2].setWalls(False, True, True, False)
-        self.__grid[9][2].setWalls(True, False, False, True)
-        # 4th Row
-        self.__grid[0][3].setWalls(True, True, True, False)
-        self.__grid[1][3].setWalls(True, True, False, False)
-        self.__grid[2][3].setWalls(True, False, False, False)
-        self.__grid[3][3].setWalls(True, True, False, False)
-        self.__grid[4][3].setWalls(False, True, False, False)
-        self.__grid[5][3].setWalls(False, False, False, True)
-        self.__grid[6][3].setWalls(False, False, True, True)
-        self.__grid[7][3].setWalls(False, True, True, False)
-        self.__grid[8][3].setWalls(True, True, False, False)
-        self.__grid[9][3].setWalls(False, False, False, True)
-        # 5th Row
-        self.__grid[0][4].setWalls(True, False, True, False)
-        self.__grid[1][4].setWalls(True, True, False, False)
-        self.__grid[2][4].setWalls(False, False, False, False)
-        self.__grid[3][4].setWalls(True, False, True, True)
-        self.__grid[4][4].setWalls(True, False, True, True)
-        self.__grid[5][4].setWalls(False, False, True, True)
-        self.__grid[6][4].setWalls(False, True, True, False)
-        self.__grid[7][4].setWalls(True, True, False, False)
-        self.__grid[8][4].setWalls(True, True, False, False)
-        self.__grid[9][4].setWalls(False, False, False, True)
-        # 6th Row
-        self.__grid[0][5].setWalls(False, True, True, False)
-        self.__grid[1][5].setWalls(True, False, False, True)
-        self.__grid[2][5].setWalls(False, False, True, True)
-        self.__grid[3][5].setWalls(False, False, True, True)
-        self.__grid[4][5].setWalls(False, False, True, True)
-        self.__grid[5][5].setWalls(False, False, True, True)
-        self.__grid[6][5].setWalls(True, False, True, True)
-        self.__grid[7][5].setWalls(True, False, True, False)
-        self.__grid[8][5].setWalls(True, True, False, True)
-        self.__grid[9][5].setWalls(False, False, True, False)
-        # 7th Row
-        self.__grid[0][6].setWalls(True, False, True, False)
-        self.__grid[1][6].setWalls(False, True, False, True)
-        self.__grid[2][6].setWalls(False, True, True, False)
-        self.__grid[3][6].setWalls(False, False, False, True)
-        self.__grid[4][6].setWalls(False, False, True, True)
-        self.__grid[5][6].setWalls(False, False, True, True)
-        self.__grid[6][6].setWalls(False, False, True, True)
-        self.__grid[7][6].setWalls(False, False, True, False)
-        self.__grid[8][6].setWalls(True, False, False, False)
-        self.__grid[9][6].setWalls(False, False, False, True)
-        # 8th Row
-        self.__grid[0][7].setWalls(False, True, True, False)
-        self.__grid[1][7].setWalls(True, False, False, False)
-        self.__grid[2][7].setWalls(True, True, False, False)
-        self.__grid[3][7].setWalls(False, True, False, False)
-        self.__grid[4][7].setWalls(False, True, False, True)
-        self.__grid[5][7].setWalls(False, False, True, True)
-        self.__grid[6][7].setWalls(False, False, True, False)
-        self.__grid[7][7].setWalls(True, False, False, False)
-        self.__grid[8][7].setWalls(False, False, False, True)
-        self.__grid[9][7].setWalls(True, False, True, True)
-        # 9th Row
-        self.__grid[0][8].setWalls(True, True, True, False)
-        self.__grid[1][8].setWalls(False, False, False, False)
-        self.__grid[2][8].setWalls(True, True, False, False)
-        self.__grid[3][8].setWalls(True, True, False, False)
-        self.__grid[4][8].setWalls(True, False, False, True)
-        self.__grid[5][8].setWalls(False, True, True, False)
-        self.__grid[6][8].setWalls(False, True, False, True)
-        self.__grid[7][8].setWalls(False, False, True, True)
-        self.__grid[8][8].setWalls(False, False, True, True)
-        self.__grid[9][8].setWalls(False, False, True, True)
-        # 10th Row
-        self.__grid[0][9].setWalls(True, True, True, False)
-        self.__grid[1][9].setWalls(False, True, False, True)
-        self.__grid[2][9].setWalls(True, True, True, False)
-        self.__grid[3][9].setWalls(True, True, False, False)
-        self.__grid[4][9].setWalls(False, True, False, False)
-        self.__grid[5][9].setWalls(True, True, False, False)
-        self.__grid[6][9].setWalls(True, True, False, False)
-        self.__grid[7][9].setWalls(False, True, False, True)
-        self.__grid[8][9].setWalls(False, True, True, False)
-        self.__grid[9][9].setWalls(False, True, False, True)
+            name="scientist", rng=labyrinthRng("scientist", self.__seedIdxs, self.__seed))
+
+        layout = mazeGenerator.generate(
+            self.__width, self.__height, self.__rng,
+            reserved=[agent.getLocation() for agent in self.__agents.values()])
+        walls = bytearray(layout.getWalls())
+        # Place both Exits (they are paired together)
+        for location in layout.getExits():
+            walls[self.getCellIndex(location['x'], location['y'])] |= Cell.EXIT_BIT
+        closeWalls(walls, self.__width, self.__height)
+        self.__layout = Layout.intern(self.__width, self.__height, walls)
 
-    def __linkCells(self):
+        # Place agents
+        for agent in self.__agents.values():
+            self.getCellAt(agent.getLocation()['x'], agent.getLocation()['y']).addAgent(agent)
+        # Place Research, Gun and Keycard
+        for location, item in layout.getItems():
+            self.getCellAt(location['x'], location['y']).addItem(item)
+
+    @classmethod
+    def fromLayout(cls, layout, agents):
+        """
+        Make an empty Gamestate around an existing Layout, for rounds loaded from a replay
+        :param layout:  the Layout
+        :param agents:  dict of agent name: agent, of every agent in the run
+        :return:        the Gamestate, with nothing placed. See setSnapshot
+        """
+        state = cls.__new__(cls)
+        state.__width = layout.getWidth()
+        state.__height = layout.getHeight()
+        state.__seedIdxs = None
+        state.__seed = None
+        state.__rng = None
+        state.__layout = layout
+        state.__agents = {}
+        state.__allAgents = dict(agents)
+        state.__agentLists = {}
+        state.__itemLists = {}
+        state.__cells = {}
+        state.__escapees = []
+        state.__victors = []
+        return state
+
+    def setSnapshot(self, agents, agentLists, itemLists, escapees, victors):
         """
-        Link all cells together by filling in their neighbor variables
-        Also fill in walls from neighbors and grid edges where necessary
+        Replace everything that changes during a run at once
+        :param agents:      dict of agent name: agent, of the agents still in play
+        :param agentLists:  dict of cell index: list of agents in the cell
+        :param itemLists:   dict of cell index: list of items in the cell
+        :param escapees:    list of the agents that escaped, in the order they escaped
+        :param victors:     list of the agents that won
         """
-        for x in range(len(self.__grid)):
-            for y in range(len(self.__grid[x])):
-                if x + 1 < self.__width:
-                    self.__grid[x][y].setCellRight(
-                        self.__grid[x + 1][y])
-                    if self.__grid[x + 1][y].isWallLeft():
-                        self.__grid[x][y].WALL_RIGHT = True
-                else:
-                    self.__grid[x][y].WALL_RIGHT = True
-                if x - 1 >= 0:
-                    self.__grid[x][y].setCellLeft(
-                        self.__grid[x - 1][y])
-                    if self.__grid[x - 1][y].isWallRight():
-                        self.__grid[x][y].WALL_LEFT = True
-                else:
-                    self.__grid[x][y].WALL_LEFT = True
-                if y + 1 < self.__height:
-                    self.__grid[x][y].setCellDown(
-                        self.__grid[x][y + 1])
-                    if self.__grid[x][y + 1].isWallUp():
-                        self.__grid[x][y].WALL_DOWN = True
-                else:
-                    self.__grid[x][y].WALL_DOWN = True
-                if y - 1 >= 0:
-                    self.__grid[x][y].setCellUp(self.__grid[x][y - 1])
-                    if self.__grid[x][y - 1].isWallDown():
-                        self.__grid[x][y].WALL_UP = True
-                else:
-                    self.__grid[x][y].WALL_UP = True
+        self.__agents = agents
+        # TRICKY: Update the tables in place, since the Cell views hold on to them
+        self.__agentLists.clear()
+        self.__agentLists.update(agentLists)
+        self.__itemLists.clear()
+        self.__itemLists.update(itemLists)
+        self.__escapees = escapees
+        self.__victors = victors
+
+    def __getstate__(self):
+        # TRICKY: Cells are views that are made again on demand, so copies and saved runs leave them out.
+        # Keyframes are deep copies, and copying every Cell made so far was most of their cost
+        state = self.__dict__.copy()
+        state["_Gamestate__cells"] = {}
+        return state
+
+    def __setstate__(self, state):
+        if "_Gamestate__grid" in state:
+            # Gamestates saved before cells became views hold a list of lists of standalone cells
+            grid = state.pop("_Gamestate__grid")
+            width, height = len(grid), len(grid[0])
+            walls = bytearray(width * height)
+            agentLists, itemLists = {}, {}
+            for x in range(width):
+                for y in range(height):
+                    legacy = grid[x][y].__dict__
+                    i = y * width + x
+                    walls[i] = (Cell.WALL_UP_BIT if legacy["WALL_UP"] else 0) | \
+                        (Cell.WALL_DOWN_BIT if legacy["WALL_DOWN"] else 0) | \
+                        (Cell.WALL_LEFT_BIT if legacy["WALL_LEFT"] else 0) | \
+                        (Cell.WALL_RIGHT_BIT if legacy["WALL_RIGHT"] else 0) | \
+                        (Cell.EXIT_BIT if legacy["isExit"] else 0)
+                    if legacy["agentList"]:
+                        agentLists[i] = list(legacy["agentList"])
+                    if legacy["itemList"]:
+                        itemLists[i] = list(legacy["itemList"])
+            state["_Gamestate__walls"] = walls
+            state["_Gamestate__agentLists"] = agentLists
+            state["_Gamestate__itemLists"] = itemLists
+            state["_Gamestate__cells"] = {}
+            state.setdefault("_Gamestate__allAgents", dict(state["_Gamestate__agents"]))
+        if "_Gamestate__walls" in state:
+            # Gamestates saved before the Layout was split out own a bytearray of walls
+            walls = state.pop("_Gamestate__walls")
+            state["_Gamestate__layout"] = Layout.intern(state["_Gamestate__width"], state["_Gamestate__height"], walls)
+            state["_Gamestate__cells"] = {}
+        self.__dict__.update(state)
 
     def getWidth(self):
         return self.__width
 
+    def getRng(self):
+        return self.__rng
+
     def getHeight(self):
         return self.__height
 
+    def getCellIndex(self, x, y):
+        return y * self.__width + x
+
     def getCellAt(self, x, y):
-        return self.__grid[x][y]
+        index = y * self.__width + x
+        cell = self.__cells.get(index)
+        if cell == None:
+            cell = Cell(self, x, y)
+            self.__cells[index] = cell
+        return cell
+
+    def getLayout(self):
+        return self.__layout
+
+    def getWalls(self):
+        """
+        :return:  the bytes of Cell wall and exit bits of the Layout, indexed by getCellIndex
+        """
+        return self.__layout.getWalls()
+
+    def getAgentLists(self):
+        """
+        :return:  dict of cell index: list of agents in the cell, for the cells that have agents
+        """
+        return self.__agentLists
+
+    def getItemLists(self):
+        """
+        :return:  dict of cell index: list of items in the cell, for the cells that have items
+        """
+        return self.__itemLists
 
     def getAgents(self):
         return self.__agents
 
+    def getAllAgents(self):
+        return self.__allAgents
+
     def removeAgent(self, agent):
         self.__agents = {an: a for an,
                          a in self.__agents.items() if a != agent}
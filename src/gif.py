@@ -0,0 +1,166 @@
+import struct
+
+"""
+Animated GIF writing, without any imaging library
+
+Every frame of a GIF is a rectangle of palette indexes compressed on its own, so frames can be
+encoded in parallel with encodeFrame and written in order with a GifWriter. A frame only needs to
+cover what changed since the frame before it, as frames are drawn over each other
+"""
+
+# the number of bits of a palette index, and the size of the LZW code table
+INDEX_BITS = 8
+MAX_CODES = 4095
+# the largest block of data GIF allows
+MAX_BLOCK = 255
+
+
+def lzwEncode(indices: bytes, runIndex: int = None):
+    """
+    Compress palette indexes the way GIF image data is compressed
+    :param indices:   the palette index of every pixel
+    :param runIndex:  an index that comes in long runs, like the transparent index of a frame that only
+                      covers a few changes. Its runs are skipped over without looking up every index
+    :return:          the variable length codes, packed least significant bit first
+    """
+    clearCode = 1 << INDEX_BITS
+    endCode = clearCode + 1
+    out = bytearray()
+    bits = 0
+    nBits = 0
+
+    # code for a string of indexes, by code of the string without its last index << 8 | last index
+    codes = {}
+    # codes of the strings of 1, 2, 3... runIndexes. The table always has every length up to the longest
+    runCodes = [None, runIndex]
+    if runIndex != None:
+        isOther = indices.translate(bytes(0 if i == runIndex else 1 for i in range(256)))
+    nextCode = endCode + 1
+    codeSize = INDEX_BITS + 1
+    bits |= clearCode << nBits
+    nBits += codeSize
+
+    n = len(indices)
+    prefix = indices[0]
+    # the length of prefix if it is a run of runIndexes, 0 if not
+    runLength = 1 if prefix == runIndex else 0
+    i = 1
+    while i < n:
+        index = indices[i]
+        if runLength and index == runIndex:
+            # match as much of the run as the table has
+            runEnd = isOther.find(1, i)
+            skip = min((n if runEnd == -1 else runEnd) - i, len(runCodes) - 1 - runLength)
+            if skip > 0:
+                runLength += skip
+                i += skip
+                prefix = runCodes[runLength]
+                continue
+        key = prefix << 8 | index
+        code = codes.get(key)
+        if code != None:
+            prefix = code
+            runLength = 0
+            i += 1
+            continue
+        bits |= prefix << nBits
+        nBits += codeSize
+        while nBits >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            nBits -= 8
+        # TRICKY: The decoder adds each code a step behind the encoder, so the code size grows
+        # once the next code is out of range, not once it is used
+        if nextCode >= 1 << codeSize and codeSize < 12:
+            codeSize += 1
+        if nextCode >= MAX_CODES:
+            bits |= clearCode << nBits
+            nBits += codeSize
+            codes = {}
+            runCodes = [None, runIndex]
+            nextCode = endCode + 1
+            codeSize = INDEX_BITS + 1
+        else:
+            codes[key] = nextCode
+            if runLength and index == runIndex:
+                runCodes.append(nextCode)
+            nextCode += 1
+        prefix = index
+        runLength = 1 if index == runIndex else 0
+        i += 1
+
+    for code in (prefix, endCode):
+        bits |= code << nBits
+        nBits += codeSize
+        if code == prefix and nextCode >= 1 << codeSize and codeSize < 12:
+            codeSize += 1
+    while nBits > 0:
+        out.append(bits & 0xFF)
+        bits >>= 8
+        nBits -= 8
+    return bytes(out)
+
+
+def encodeFrame(indices: bytes, left: int, top: int, width: int, height: int, delay: int, transparent: int = None):
+    """
+    Encode one frame of an animated GIF
+    :param indices:      the palette index of every pixel of the frame, row by row
+    :param left:         where the frame goes on the image
+    :param top:          where the frame goes on the image
+    :param width:        the size of the frame
+    :param height:       the size of the frame
+    :param delay:        how long the frame is shown, in hundredths of a second
+    :param transparent:  the index of pixels that keep the color of the frame before. None if there are none
+    :return:             the bytes of the frame, for GifWriter.writeFrame
+    """
+    data = lzwEncode(indices, transparent)
+    frame = bytearray()
+    # graphic control extension. Frames are left in place for the next one to be drawn over
+    frame += struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 1 << 2 | (transparent != None), delay,
+                         transparent or 0, 0)
+    frame += struct.pack("<BHHHHB", 0x2C, left, top, width, height, 0)
+    frame.append(INDEX_BITS)
+    for i in range(0, len(data), MAX_BLOCK):
+        block = data[i:i + MAX_BLOCK]
+        frame.append(len(block))
+        frame += block
+    frame.append(0)
+    return bytes(frame)
+
+
+class GifWriter:
+    """
+    Writes an animated GIF that loops forever, one encoded frame at a time
+    """
+
+    def __init__(self, path: str, width: int, height: int, palette: [(int, int, int)]):
+        """
+        :param palette:  the colors of the palette indexes of every frame. At most 256
+        """
+        if len(palette) > 1 << INDEX_BITS:
+            raise ValueError(f"A GIF palette has at most {1 << INDEX_BITS} colors, not {len(palette)}")
+        self.__file = open(path, "wb")
+        self.__file.write(b"GIF89a")
+        # a global palette of 256 colors, padded with black
+        self.__file.write(struct.pack("<HHBBB", width, height, 0xF0 | (INDEX_BITS - 1), 0, 0))
+        for i in range(1 << INDEX_BITS):
+            self.__file.write(bytes(palette[i] if i < len(palette) else (0, 0, 0)))
+        self.__file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writeFrame(self, frame: bytes):
+        """
+        :param frame:  a frame from encodeFrame
+        """
+        self.__file.write(frame)
+
+    def close(self):
+        if self.__file.closed:
+            return
+        self.__file.write(b"\x3B")
+        self.__file.close()
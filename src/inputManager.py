@@ -13,6 +13,15 @@ class InputEvent(Enum):
     terminate = 5
     autoStep = 6
     restart = 7
+    zoomIn = 8
+    zoomOut = 9
+    panUp = 10
+    panDown = 11
+    panLeft = 12
+    panRight = 13
+    resetCamera = 14
+    faster = 15
+    slower = 16
 
 
 DEFAULT_INPUT_MAPPING = {
@@ -22,7 +31,19 @@ DEFAULT_INPUT_MAPPING = {
     K_s: InputEvent.saveRun,
     K_n: InputEvent.newRun,
     K_a: InputEvent.autoStep,
-    K_r: InputEvent.restart}
+    K_r: InputEvent.restart,
+    K_EQUALS: InputEvent.zoomIn,
+    K_PLUS: InputEvent.zoomIn,
+    K_KP_PLUS: InputEvent.zoomIn,
+    K_MINUS: InputEvent.zoomOut,
+    K_KP_MINUS: InputEvent.zoomOut,
+    K_i: InputEvent.panUp,
+    K_k: InputEvent.panDown,
+    K_j: InputEvent.panLeft,
+    K_l: InputEvent.panRight,
+    K_0: InputEvent.resetCamera,
+    K_PERIOD: InputEvent.faster,
+    K_COMMA: InputEvent.slower}
 
 
 class InputManager:
@@ -40,3 +61,5 @@ class InputManager:
             elif event.type == KEYDOWN:
                 if event.key in self.__inputMapping:
                     return self.__inputMapping[event.key]
+            elif event.type == MOUSEWHEEL and event.y != 0:
+                return InputEvent.zoomIn if event.y > 0 else InputEvent.zoomOut
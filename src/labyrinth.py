@@ -3,13 +3,20 @@
 import argparse
 import pygame
 import sys
-import random
-import time
 
 from inputManager import InputManager, InputEvent
+from playback import PlaybackClock
 from render import Renderer
+from maze import MAZE_GENERATORS
 from run import Run, SimParams
-from rng import LABYRINTH_SEEDS
+from sim import runSimulations
+
+# how much one zoom step scales the cells, and how many pixels one pan step moves the camera
+ZOOM_STEP = 1.25
+PAN_STEP = 80
+# frames drawn per second, and rounds played per second at a playback speed of 1
+FPS = 30
+ROUNDS_PER_SECOND = 10
 
 
 class LabyrinthArgs:
@@ -20,9 +27,27 @@ class LabyrinthArgs:
                             default="", help='A previous run to display')
         parser.add_argument(
             '-s', '--stats', action='store_true', help='Run simulations and present stats before presenting a new run')
+        parser.add_argument('--round', type=int, default=0,
+                            help='The round of the run to start viewing at')
+        parser.add_argument('--maze', type=str, default="legacy", choices=MAZE_GENERATORS.keys(),
+                            help='How new runs build their layout')
+        parser.add_argument('--width', type=int, default=10,
+                            help='The width of new runs. Generated mazes only')
+        parser.add_argument('--height', type=int, default=10,
+                            help='The height of new runs. Generated mazes only')
+        parser.add_argument('--loops', type=float, default=0.0,
+                            help='The share of inner walls a generated maze knocks down to make loops')
+        parser.add_argument('--speed', type=float, default=1, choices=PlaybackClock.SPEEDS,
+                            help='How many times faster than 10 rounds a second to play runs back with "a"')
         args = vars(parser.parse_args())
         self.run_path = args['run']
         self.simulate = args['stats']
+        self.round = args['round']
+        self.maze = args['maze']
+        self.width = args['width']
+        self.height = args['height']
+        self.loopChance = args['loops']
+        self.speed = args['speed']
 
 
 def terminate():
@@ -30,79 +55,31 @@ def terminate():
     sys.exit()
 
 
-def runSimulations():
-    nSimulations = 20
-    allStats = []
-    for i in range(nSimulations):
-        seedIdxMax = len(LABYRINTH_SEEDS)-1
-        random.seed(time.time())
-        simParams = SimParams(width=10, height=10, seedIdxs={
-            # Random seed indexes for each run.
-            # If we wanted, we could control for any one of these by making the index fixed
-            'layout': random.randint(0, seedIdxMax),
-            'monster': random.randint(0, seedIdxMax),
-            'civilian': random.randint(0, seedIdxMax),
-            'scientist': random.randint(0, seedIdxMax),
-            'soldier': random.randint(0, seedIdxMax),
-        })
-        run = Run(simParams=simParams)
-        stats = run.getStats()
-        allStats.append(stats)
-
-    # Aggrigate and report overall stats
-    averageNRounds = sum([s[0] for s in allStats]) // nSimulations
-    humanWinRate = sum([1 if 'monster' not in s[1]
-                        and len(s[1]) else 0 for s in allStats]) / nSimulations
-    monsterWinRate = sum(
-        [1 if 'monster' in s[1] and len(s[1]) else 0 for s in allStats]) / nSimulations
-    stalemateRate = sum(
-        [1 if len(s[1]) == 0 else 0 for s in allStats]) / nSimulations
-    civilianEscapeRate = sum(
-        [1 if 'civilian' in s[2] else 0 for s in allStats]) / nSimulations
-    civilianDeathRate = sum(
-        [1 if 'civilian' in s[3] else 0 for s in allStats]) / nSimulations
-    scientistEscapeRate = sum(
-        [1 if 'scientist' in s[2] else 0 for s in allStats]) / nSimulations
-    scientistDeathRate = sum(
-        [1 if 'scientist' in s[3] else 0 for s in allStats]) / nSimulations
-    soldierEscapeRate = sum(
-        [1 if 'soldier' in s[2] else 0 for s in allStats]) / nSimulations
-    soldierDeathRate = sum(
-        [1 if 'soldier' in s[3] else 0 for s in allStats]) / nSimulations
-
-    print("===Simulation Stats===")
-    print(f"Avg number of rounds: \t{averageNRounds}")
-    print(f"Human win rate: \t{humanWinRate:.2f}")
-    print(f"Monster win rate: \t{monsterWinRate:.2f}")
-    print(f"Stalemate rate: \t{stalemateRate:.2f}")
-    print(f"Civilian escape rate: \t{civilianEscapeRate:.2f}")
-    print(f"Civilian death rate: \t{civilianDeathRate:.2f}")
-    print(f"Scientist escape rate: \t{scientistEscapeRate:.2f}")
-    print(f"Scientist death rate: \t{scientistDeathRate:.2f}")
-    print(f"Soldier escape rate: \t{soldierEscapeRate:.2f}")
-    print(f"Soldier death rate: \t{soldierDeathRate:.2f}")
-
-
 def main():
     args = LabyrinthArgs()
 
     if args.simulate:
-        runSimulations()
+        runSimulations(width=args.width, height=args.height, maze=args.maze, loopChance=args.loopChance)
 
-    simParams = SimParams(width=10, height=10)
+    simParams = SimParams(width=args.width, height=args.height,
+                          maze=args.maze, loopChance=args.loopChance)
     run = Run(load_path=args.run_path) if args.run_path else Run(
-        simParams=simParams)
+        simParams=simParams, background=True)
+    if args.round > 0:
+        # the round may not have been simulated yet
+        run.waitForSimulation()
+    run.seek(args.round)
+    # the run shown when "n" is pressed, simulated while the current one is watched
+    nextRun = None
     renderer = Renderer(windowWidth=800,
                         windowHeight=800,
-                        nCellsHorizontal=simParams.getWidth(),
-                        nCellsVertical=simParams.getHeight(),
-                        fps=10)
+                        nCellsHorizontal=run.getState().getWidth(),
+                        nCellsVertical=run.getState().getHeight(),
+                        fps=FPS)
     inputManager = InputManager()
     agents = run.getState().getAgents()
 
-    autoStep = False
-    audoStepRate = 25
-    autoStepTicks = pygame.time.get_ticks()
+    playback = PlaybackClock(ROUNDS_PER_SECOND, args.speed)
 
     while True:
         event = inputManager.getInputEvent()
@@ -115,15 +92,40 @@ def main():
         elif event == InputEvent.saveRun:
             run.toFile()
         elif event == InputEvent.newRun:
-            run = Run(simParams=simParams)
+            run = nextRun if nextRun != None else Run(simParams=simParams, background=True)
+            nextRun = None
+            run.seek(0)
         elif event == InputEvent.autoStep:
-            autoStep = not autoStep
+            playback.togglePlaying()
+        elif event == InputEvent.faster:
+            print(f"Playback speed {playback.faster()}x")
+        elif event == InputEvent.slower:
+            print(f"Playback speed {playback.slower()}x")
         elif event == InputEvent.restart:
             run.restart()
-
-        if autoStep and pygame.time.get_ticks()-autoStepTicks >= audoStepRate:
-            run.stepForward()
-            autoStepTicks = pygame.time.get_ticks()
+        elif event == InputEvent.zoomIn:
+            renderer.zoom(ZOOM_STEP)
+        elif event == InputEvent.zoomOut:
+            renderer.zoom(1 / ZOOM_STEP)
+        elif event == InputEvent.panUp:
+            renderer.pan(0, -PAN_STEP)
+        elif event == InputEvent.panDown:
+            renderer.pan(0, PAN_STEP)
+        elif event == InputEvent.panLeft:
+            renderer.pan(-PAN_STEP, 0)
+        elif event == InputEvent.panRight:
+            renderer.pan(PAN_STEP, 0)
+        elif event == InputEvent.resetCamera:
+            renderer.resetCamera()
+
+        # skip straight to the latest round that is due, however many that is
+        roundsDue = playback.getRoundsDue()
+        if roundsDue and run.current_state < run.getRoundCount() - 1:
+            run.seek(run.current_state + roundsDue)
+
+        # TRICKY: Start on the next run once the current one is done, so they do not share the CPU
+        if nextRun == None and not run.isSimulating():
+            nextRun = Run(simParams=simParams, background=True)
 
         renderer.draw(run.getState())
 
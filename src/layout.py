@@ -0,0 +1,148 @@
+import hashlib
+import weakref
+
+from cell import Cell
+
+
+class Layout:
+    """
+    The static part of a maze, which never changes during a run: its size, and the Cell wall
+    and exit bits of every cell as a row-major bytes object indexed by y * width + x.
+    Layouts are immutable and hashable. Equal layouts are interned, so every Gamestate of a run
+    and every run of a batch with the same maze share one Layout. Copying a Layout, deep or not,
+    returns the Layout itself, and unpickling one interns it again
+    """
+
+    # every Layout alive in this process, by (width, height, walls)
+    __interned = weakref.WeakValueDictionary()
+
+    def __init__(self, width, height, walls):
+        self.__width = width
+        self.__height = height
+        self.__walls = bytes(walls)
+        self.__exits = None
+        self.__digest = None
+
+    @classmethod
+    def intern(cls, width, height, walls):
+        """
+        Get the shared Layout of a maze
+        :param width:   the width of the grid
+        :param height:  the height of the grid
+        :param walls:   the Cell wall and exit bits of every cell, indexed by y * width + x
+        :return:        the Layout, which is the same object for equal mazes
+        """
+        walls = bytes(walls)
+        if len(walls) != width * height:
+            raise ValueError(f"A {width}x{height} layout needs {width * height} cells, not {len(walls)}")
+        key = (width, height, walls)
+        layout = cls.__interned.get(key)
+        if layout == None:
+            layout = cls(width, height, walls)
+            cls.__interned[key] = layout
+        return layout
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Layout):
+            return NotImplemented
+        return (self.__width, self.__height, self.__walls) == (other.__width, other.__height, other.__walls)
+
+    def __hash__(self):
+        return hash((self.__width, self.__height, self.__walls))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Layout.intern, (self.__width, self.__height, self.__walls))
+
+    def getWidth(self):
+        return self.__width
+
+    def getHeight(self):
+        return self.__height
+
+    def getWalls(self):
+        """
+        :return:  the bytes of Cell wall and exit bits, indexed by getIndex
+        """
+        return self.__walls
+
+    def getIndex(self, x, y):
+        return y * self.__width + x
+
+    def getExits(self):
+        """
+        :return:  the list of {"x": x, "y": y} of every exit, in index order
+        """
+        if self.__exits == None:
+            # map exit cells to 1 and everything else to 0 in C, then find the 1s
+            isExit = self.__walls.translate(bytes(1 if b & Cell.EXIT_BIT else 0 for b in range(256)))
+            self.__exits = []
+            i = isExit.find(1)
+            while i != -1:
+                self.__exits.append({"x": i % self.__width, "y": i // self.__width})
+                i = isExit.find(1, i + 1)
+        return [dict(location) for location in self.__exits]
+
+    def getOpenNeighbours(self, index):
+        """
+        :param index:  the index of a cell
+        :return:       the indexes of the neighboring cells there is no wall to, as up, down, left, right
+        """
+        walls = self.__walls[index]
+        neighbours = []
+        if not walls & Cell.WALL_UP_BIT:
+            neighbours.append(index - self.__width)
+        if not walls & Cell.WALL_DOWN_BIT:
+            neighbours.append(index + self.__width)
+        if not walls & Cell.WALL_LEFT_BIT:
+            neighbours.append(index - 1)
+        if not walls & Cell.WALL_RIGHT_BIT:
+            neighbours.append(index + 1)
+        return neighbours
+
+    def getDigest(self):
+        """
+        :return:  a hex digest of the layout, which is the same in every process and python version
+        """
+        if self.__digest == None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(self.__width.to_bytes(4, 'little'))
+            digest.update(self.__height.to_bytes(4, 'little'))
+            digest.update(self.__walls)
+            self.__digest = digest.hexdigest()
+        return self.__digest
+
+
+def closeWalls(walls, width, height):
+    """
+    Fill in walls from neighbors and grid edges where necessary, so both sides of a wall agree.
+    Done on the whole grid at once as big integers, with one byte per cell
+    :param walls:   the bytearray of Cell wall and exit bits to close, indexed by y * width + x
+    :param width:   the width of the grid
+    :param height:  the height of the grid
+    """
+    n = width * height
+    bits = int.from_bytes(walls, 'little')
+
+    def bitOf(bit):
+        return bits & int.from_bytes(bytes([bit]) * n, 'little')
+    # TRICKY: Shifting by a byte also pulls in the cell at the other end of the neighboring row.
+    # That only matters for the left and right columns, which get those walls from the edges anyway
+    closed = bits | bitOf(Cell.WALL_LEFT_BIT) >> 8 << 1 | bitOf(Cell.WALL_RIGHT_BIT) << 8 >> 1 | \
+        bitOf(Cell.WALL_UP_BIT) >> (8 * width) << 1 | bitOf(Cell.WALL_DOWN_BIT) << (8 * width) >> 1
+    closed &= (1 << (8 * n)) - 1
+
+    edges = bytearray(n)
+    edges[:width] = bytes([Cell.WALL_UP_BIT]) * width
+    edges[n - width:] = bytes([Cell.WALL_DOWN_BIT]) * width
+    edges[0::width] = bytes(b | Cell.WALL_LEFT_BIT for b in edges[0::width])
+    edges[width - 1::width] = bytes(b | Cell.WALL_RIGHT_BIT for b in edges[width - 1::width])
+    closed |= int.from_bytes(edges, 'little')
+    walls[:] = closed.to_bytes(n, 'little')
@@ -0,0 +1,218 @@
+from array import array
+from collections import OrderedDict
+
+from cell import Cell
+from layout import Layout
+
+
+class LayoutAnalysis:
+    """
+    Structural facts about a Layout: distance fields, dead ends, corridors and choke points.
+    Each fact is worked out for the whole grid the first time it is asked for, after which every
+    query is a lookup. Use analyzeLayout to get the shared analysis of a Layout
+    """
+
+    def __init__(self, layout: Layout):
+        self.__layout = layout
+        self.__width = layout.getWidth()
+        # number of walls around every cell
+        self.__wallCounts = layout.getWalls().translate(Cell.WALL_COUNTS)
+        # distance field of every target asked for so far, by target cell index
+        self.__distanceFields = {}
+        self.__exitDistances = None
+        self.__corridorLengths = None
+        self.__chokePoints = None
+
+    def getLayout(self):
+        return self.__layout
+
+    """
+    Distances
+    """
+
+    def getDistanceField(self, x, y):
+        """
+        :param x:  the x location of the target cell
+        :param y:  the y location of the target cell
+        :return:   an array of the number of moves from every cell to the target, indexed by
+                   y * width + x. -1 where the target can not be reached
+        """
+        i = y * self.__width + x
+        field = self.__distanceFields.get(i)
+        if field == None:
+            field = self.__breadthFirst([i])
+            self.__distanceFields[i] = field
+        return field
+
+    def getDistance(self, fromX, fromY, toX, toY):
+        """
+        :return:  the number of moves on the shortest path between two cells, or -1 if there is none
+        """
+        return self.getDistanceField(toX, toY)[fromY * self.__width + fromX]
+
+    def getExitDistance(self, x, y):
+        """
+        :return:  the number of moves from a cell to the nearest exit, or -1 if no exit can be reached
+        """
+        if self.__exitDistances == None:
+            self.__exitDistances = self.__breadthFirst(
+                [loc["y"] * self.__width + loc["x"] for loc in self.__layout.getExits()])
+        return self.__exitDistances[y * self.__width + x]
+
+    """
+    Structure
+    """
+
+    def isDeadEnd(self, x, y):
+        return self.__wallCounts[y * self.__width + x] >= 3
+
+    def getDeadEnds(self):
+        """
+        :return:  the list of {"x": x, "y": y} of every dead end, in index order
+        """
+        return [{"x": i % self.__width, "y": i // self.__width}
+                for i, count in enumerate(self.__wallCounts) if count >= 3]
+
+    def getCorridorLength(self, x, y):
+        """
+        A corridor is a run of cells with exactly two ways out, bends included
+        :return:  the number of cells in the corridor the cell is part of, or 0 if it is not in one
+        """
+        if self.__corridorLengths == None:
+            self.__corridorLengths = self.__findCorridors()
+        return self.__corridorLengths[y * self.__width + x]
+
+    def isChokePoint(self, x, y):
+        """
+        :return:  True if blocking the cell would cut the maze in two, False if not
+        """
+        if self.__chokePoints == None:
+            self.__chokePoints = self.__findChokePoints()
+        return self.__chokePoints[y * self.__width + x] != 0
+
+    def getChokePoints(self):
+        """
+        :return:  the list of {"x": x, "y": y} of every choke point, in index order
+        """
+        if self.__chokePoints == None:
+            self.__chokePoints = self.__findChokePoints()
+        return [{"x": i % self.__width, "y": i // self.__width}
+                for i, isChoke in enumerate(self.__chokePoints) if isChoke]
+
+    """
+    Private Methods
+    """
+
+    def __breadthFirst(self, sources):
+        n = len(self.__wallCounts)
+        width = self.__width
+        walls = self.__layout.getWalls()
+        distances = array('i', [-1]) * n
+        for i in sources:
+            distances[i] = 0
+        frontier = list(sources)
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for i in frontier:
+                bits = walls[i]
+                if not bits & Cell.WALL_UP_BIT and distances[i - width] < 0:
+                    distances[i - width] = distance
+                    nextFrontier.append(i - width)
+                if not bits & Cell.WALL_DOWN_BIT and distances[i + width] < 0:
+                    distances[i + width] = distance
+                    nextFrontier.append(i + width)
+                if not bits & Cell.WALL_LEFT_BIT and distances[i - 1] < 0:
+                    distances[i - 1] = distance
+                    nextFrontier.append(i - 1)
+                if not bits & Cell.WALL_RIGHT_BIT and distances[i + 1] < 0:
+                    distances[i + 1] = distance
+                    nextFrontier.append(i + 1)
+            frontier = nextFrontier
+        return distances
+
+    def __findCorridors(self):
+        wallCounts = self.__wallCounts
+        lengths = array('i', [0]) * len(wallCounts)
+        for start, count in enumerate(wallCounts):
+            if count != 2 or lengths[start]:
+                continue
+            # walk both ways from the start cell until the corridor opens up or ends
+            corridor = [start]
+            for first in self.__layout.getOpenNeighbours(start):
+                previous, i = start, first
+                while wallCounts[i] == 2 and i != start:
+                    corridor.append(i)
+                    previous, i = i, next(j for j in self.__layout.getOpenNeighbours(i) if j != previous)
+                if i == start:
+                    # the corridor is a ring, and the first walk went all the way round
+                    break
+            for i in corridor:
+                lengths[i] = len(corridor)
+        return lengths
+
+    def __findChokePoints(self):
+        """
+        Find the articulation points of the maze with an iterative Tarjan walk
+        """
+        n = len(self.__wallCounts)
+        neighbours = self.__layout.getOpenNeighbours
+        discovered = array('i', [-1]) * n
+        low = array('i', [0]) * n
+        parent = array('i', [-1]) * n
+        chokePoints = bytearray(n)
+        time = 0
+        for root in range(n):
+            if discovered[root] >= 0:
+                continue
+            discovered[root] = low[root] = time
+            time += 1
+            rootChildren = 0
+            stack = [(root, iter(neighbours(root)))]
+            while stack:
+                v, children = stack[-1]
+                for w in children:
+                    if discovered[w] < 0:
+                        parent[w] = v
+                        discovered[w] = low[w] = time
+                        time += 1
+                        if v == root:
+                            rootChildren += 1
+                        stack.append((w, iter(neighbours(w))))
+                        break
+                    elif w != parent[v]:
+                        low[v] = min(low[v], discovered[w])
+                else:
+                    stack.pop()
+                    if stack:
+                        u = stack[-1][0]
+                        low[u] = min(low[u], low[v])
+                        if u != root and low[v] >= discovered[u]:
+                            chokePoints[u] = 1
+            if rootChildren > 1:
+                chokePoints[root] = 1
+        return chokePoints
+
+
+# the most recently used analyses, by Layout digest
+_analyses = OrderedDict()
+ANALYSIS_CACHE_SIZE = 32
+
+
+def analyzeLayout(layout: Layout) -> LayoutAnalysis:
+    """
+    Get the analysis of a Layout, which is shared by every caller asking about the same maze
+    :param layout:  the Layout to analyze
+    :return:        the LayoutAnalysis
+    """
+    key = layout.getDigest()
+    analysis = _analyses.get(key)
+    if analysis == None:
+        analysis = LayoutAnalysis(layout)
+        _analyses[key] = analysis
+        if len(_analyses) > ANALYSIS_CACHE_SIZE:
+            _analyses.popitem(last=False)
+    else:
+        _analyses.move_to_end(key)
+    return analysis
@@ -0,0 +1,401 @@
+from abc import ABC, abstractmethod
+
+from cell import Cell
+from item import Item
+
+# TRICKY: While carving, a cell only records the passages to its right and below, reusing the bits of
+# those walls. Every other wall follows from the neighbors, see CarvedMazeGenerator._passagesToWalls
+RIGHT = Cell.WALL_RIGHT_BIT
+DOWN = Cell.WALL_DOWN_BIT
+
+
+class MazeLayout:
+    """
+    A generated layout, ready to be applied to a Gamestate
+    """
+
+    def __init__(self, width, height, walls, exits, items):
+        self.__width = width
+        self.__height = height
+        # row-major bytearray of Cell wall bits, indexed by y * width + x
+        self.__walls = walls
+        # list of {"x": x, "y": y} of every exit
+        self.__exits = exits
+        # list of ({"x": x, "y": y}, Item), in the order the items are placed
+        self.__items = items
+
+    def getWidth(self):
+        return self.__width
+
+    def getHeight(self):
+        return self.__height
+
+    def getWalls(self):
+        return self.__walls
+
+    def getExits(self):
+        return self.__exits
+
+    def getItems(self):
+        return self.__items
+
+
+class MazeGenerator(ABC):
+    """
+    Builds the walls of a layout from a random stream, and places the exits and items
+    """
+
+    # the items placed in every layout, in placement order
+    ITEMS = [Item.research, Item.gun, Item.keyCard]
+
+    @abstractmethod
+    def generate(self, width, height, rng, reserved=()):
+        """
+        Generate a layout
+        :param width:     the width of the grid
+        :param height:    the height of the grid
+        :param rng:       the random.Random the layout is drawn from
+        :param reserved:  the {"x": x, "y": y} locations no exit or item may be placed on, like agent starts
+        :return:          the MazeLayout
+        """
+        pass
+
+
+class CarvedMazeGenerator(MazeGenerator):
+    """
+    Builds a layout of any size. Subclasses only carve a perfect maze (one path between any two cells).
+    loopChance then opens that share of the remaining inner walls, so agents can run in circles
+    """
+
+    def __init__(self, loopChance: float = 0.0):
+        self.__loopChance = loopChance
+
+    def getLoopChance(self):
+        return self.__loopChance
+
+    def generate(self, width, height, rng, reserved=()):
+        if width < 3 or height < 3:
+            raise ValueError(f"A maze needs to be at least 3x3, not {width}x{height}")
+        passages = self._carve(width, height, rng)
+        if self.__loopChance > 0:
+            passages = self.__addLoops(passages, width, height, rng)
+        walls = self._passagesToWalls(passages, width, height)
+        exits, items = self.__placeFeatures(width, height, rng, reserved)
+        return MazeLayout(width, height, walls, exits, items)
+
+    @abstractmethod
+    def _carve(self, width, height, rng):
+        """
+        Carve a perfect maze
+        :return:  a row-major bytearray with RIGHT and DOWN set on every cell with a passage that way
+        """
+        pass
+
+    @staticmethod
+    def _passagesToWalls(passages, width, height):
+        """
+        Turn the right and down passages of every cell into the four walls of every cell.
+        Done on the whole grid at once as big integers, with one byte per cell
+        """
+        n = width * height
+        rightDown = int.from_bytes(passages, 'little')
+        # cell i is open to the left if cell i - 1 is open to the right. Shift a byte along, then RIGHT to LEFT
+        left = (rightDown & int.from_bytes(bytes([RIGHT]) * n, 'little')) << 8 >> 1
+        # cell i is open upwards if cell i - width is open downwards. Shift a row along, then DOWN to UP
+        up = (rightDown & int.from_bytes(bytes([DOWN]) * n, 'little')) << (8 * width) >> 1
+        opened = (rightDown | left | up) & ((1 << (8 * n)) - 1)
+        closed = int.from_bytes(bytes([Cell.WALLS_BITS]) * n, 'little') ^ opened
+        return bytearray(closed.to_bytes(n, 'little'))
+
+    def __addLoops(self, passages, width, height, rng):
+        threshold = round(self.__loopChance * 256)
+        rightTable = bytes(RIGHT if b < threshold else 0 for b in range(256))
+        downTable = bytes(DOWN if b < threshold else 0 for b in range(256))
+        n = width * height
+        extra = int.from_bytes(rng.randbytes(n).translate(rightTable), 'little') | \
+            int.from_bytes(rng.randbytes(n).translate(downTable), 'little')
+        passages = bytearray((int.from_bytes(passages, 'little') | extra).to_bytes(n, 'little'))
+        # never open the outer walls
+        passages[width - 1::width] = bytes(passages[width - 1::width]).translate(
+            bytes(b & ~RIGHT for b in range(256)))
+        passages[n - width:] = bytes(passages[n - width:]).translate(
+            bytes(b & ~DOWN for b in range(256)))
+        return passages
+
+    def __placeFeatures(self, width, height, rng, reserved):
+        """
+        Place a pair of exits on opposite sides of the maze, away from the corners,
+        and one of each item on its own free cell
+        """
+        taken = {(location["x"], location["y"]) for location in reserved}
+        if rng.random() < 0.5:
+            # left and right sides
+            exits = [(0, rng.randrange(1, height - 1)), (width - 1, rng.randrange(1, height - 1))]
+        else:
+            # top and bottom sides
+            exits = [(rng.randrange(1, width - 1), 0), (rng.randrange(1, width - 1), height - 1)]
+        taken.update(exits)
+
+        items = []
+        for item in self.ITEMS:
+            if len(taken) >= width * height:
+                break
+            location = divmod(rng.randrange(width * height), width)[::-1]
+            while location in taken:
+                location = divmod(rng.randrange(width * height), width)[::-1]
+            taken.add(location)
+            items.append(({"x": location[0], "y": location[1]}, item))
+
+        return [{"x": x, "y": y} for x, y in exits], items
+
+
+class BacktrackerMaze(CarvedMazeGenerator):
+    """
+    Randomized depth first search. Long winding corridors with few, short dead ends.
+    A pure python walk over every cell, so it is the slowest generator on very large grids:
+    about a second for 1000x1000
+    """
+
+    def _carve(self, width, height, rng):
+        n = width * height
+        # TRICKY: The walk runs over a grid with an extra column after every row and an extra row above and
+        # below the maze, all marked visited, so no neighbor needs a bounds check. Cell (x, y) is at
+        # (y + 1) * stride + x
+        stride = width + 1
+        visited = bytearray([1]) * (stride * (height + 2))
+        for y in range(1, height + 1):
+            visited[y * stride:y * stride + width] = bytes(width)
+        padded = bytearray(len(visited))
+        random = rng.random
+        start = rng.randrange(n)
+        i = (start // width + 1) * stride + start % width
+        visited[i] = 1
+        stack = [i]
+        push = stack.append
+        pop = stack.pop
+        while True:
+            up = i - stride
+            down = i + stride
+            openUp = not visited[up]
+            openDown = not visited[down]
+            openLeft = not visited[i - 1]
+            openRight = not visited[i + 1]
+            count = openUp + openDown + openLeft + openRight
+            if not count:
+                pop()
+                if not stack:
+                    break
+                i = stack[-1]
+                continue
+            # take the k-th unvisited neighbor in the order up, down, left, right.
+            # The passage is recorded on whichever cell is above or left of the other
+            k = int(random() * count)
+            if openUp and not k:
+                padded[up] |= DOWN
+                i = up
+            else:
+                k -= openUp
+                if openDown and not k:
+                    padded[i] |= DOWN
+                    i = down
+                else:
+                    k -= openDown
+                    if openLeft and not k:
+                        i -= 1
+                        padded[i] |= RIGHT
+                    else:
+                        padded[i] |= RIGHT
+                        i += 1
+            visited[i] = 1
+            push(i)
+        passages = bytearray()
+        for y in range(1, height + 1):
+            passages += padded[y * stride:y * stride + width]
+        return passages
+
+
+class SidewinderMaze(CarvedMazeGenerator):
+    """
+    Carves every row as runs of cells joined to the right, and joins each run to the row above
+    through one random cell of it. A loop per run rather than per cell, so it handles large grids.
+    The top row is always a single corridor
+    """
+
+    def _carve(self, width, height, rng):
+        n = width * height
+        # every cell except the last of its row carries on its run to the right half of the time
+        passages = bytearray(rng.randbytes(n).translate(bytes(RIGHT if b & 1 else 0 for b in range(256))))
+        passages[:width] = bytes([RIGHT]) * width
+        passages[width - 1::width] = bytes(height)
+        random = rng.random
+        for y in range(1, height):
+            rowStart = y * width
+            runStart = rowStart
+            end = rowStart + width
+            # find the end of every run of the row with bytearray.find, which loops in C
+            while runStart < end:
+                # TRICKY: the last cell of every row is 0, so there always is one
+                runEnd = passages.find(0, runStart, end)
+                # join the run to the row above through one random cell
+                passages[runStart - width + int(random() * (runEnd - runStart + 1))] |= DOWN
+                runStart = runEnd + 1
+        return passages
+
+
+class BinaryTreeMaze(CarvedMazeGenerator):
+    """
+    Every cell opens either right or down at random. Heavily biased, with a corridor along the
+    bottom and right edges, but built without a python loop over the cells, so it is the fastest
+    """
+
+    def _carve(self, width, height, rng):
+        n = width * height
+        passages = bytearray(rng.randbytes(n).translate(bytes(RIGHT if b & 1 else DOWN for b in range(256))))
+        passages[width - 1::width] = bytes([DOWN]) * height
+        passages[n - width:] = bytes([RIGHT]) * width
+        passages[n - 1] = 0
+        return passages
+
+
+class SerpentineMaze(CarvedMazeGenerator):
+    """
+    A single corridor that winds back and forth across every row, the longest path a grid can have.
+    Not random at all, only the exits and items are. A stress layout, with no choices to make but every
+    cell a long way from the others
+    """
+
+    def _carve(self, width, height, rng):
+        n = width * height
+        passages = bytearray([RIGHT]) * n
+        passages[width - 1::width] = bytes(height)
+        # join every row to the one below at alternate ends, right then left
+        rightEnds = range(width - 1, n - width, 2 * width)
+        leftEnds = range(width, n - width, 2 * width)
+        passages[width - 1:n - width:2 * width] = bytes([DOWN]) * len(rightEnds)
+        passages[width:n - width:2 * width] = bytes([RIGHT | DOWN]) * len(leftEnds)
+        return passages
+
+
+class CombMaze(CarvedMazeGenerator):
+    """
+    A corridor along the top row, with a dead end as deep as the grid hanging off every cell of it.
+    Not random at all, only the exits and items are. A stress layout for agents that explore dead ends
+    """
+
+    def _carve(self, width, height, rng):
+        n = width * height
+        passages = bytearray([DOWN]) * n
+        passages[:width] = bytes([RIGHT | DOWN]) * width
+        passages[width - 1] = DOWN
+        passages[n - width:] = bytes(width)
+        return passages
+
+
+class LegacyMaze(MazeGenerator):
+    """
+    The original hand made 10x10 layout, with a few fixed spots for the exits and every item.
+    Consumes the random stream the same way it always has, so seeds give the same runs as before.
+    Nothing is carved, so there are no walls to open for loops, and no other grid size
+    """
+
+    # the width and height of the hand made layout
+    SIZE = 10
+
+    EXIT1_LOCATIONS = [{'x': 0, 'y': 8},
+                       {'x': 5, 'y': 9},
+                       {'x': 9, 'y': 4}]
+    EXIT2_LOCATIONS = [{'x': 9, 'y': 1},
+                       {'x': 3, 'y': 0},
+                       {'x': 0, 'y': 3}]
+    RESEARCH_LOCATIONS = [{'x': 1, 'y': 1},
+                          {'x': 2, 'y': 9},
+                          {'x': 7, 'y': 6},
+                          {'x': 7, 'y': 0},
+                          {'x': 5, 'y': 5}]
+    GUN_LOCATIONS = [{'x': 1, 'y': 8},
+                     {'x': 4, 'y': 1},
+                     {'x': 7, 'y': 2},
+                     {'x': 9, 'y': 8},
+                     {'x': 4, 'y': 4}]
+    KEYCARD_LOCATIONS = [{'x': 6, 'y': 3},
+                         {'x': 1, 'y': 6},
+                         {'x': 3, 'y': 2},
+                         {'x': 8, 'y': 9},
+                         {'x': 6, 'y': 5}]
+
+    # walls of every cell of a row as up, down, left, right
+    WALLS = [
+        # Top row of maze
+        [(1, 0, 1, 1), (1, 0, 1, 1), (1, 0, 1, 0), (1, 0, 0, 0), (1, 1, 0, 0),
+         (1, 0, 0, 1), (1, 0, 1, 0), (1, 0, 0, 0), (1, 0, 0, 0), (1, 1, 0, 1)],
+        # 2nd Row
+        [(0, 0, 1, 1), (0, 0, 1, 0), (0, 1, 0, 1), (0, 1, 1, 0), (1, 1, 0, 1),
+         (0, 0, 1, 0), (0, 0, 0, 1), (0, 0, 1, 1), (0, 0, 1, 0), (1, 1, 0, 1)],
+        # 3rd Row
+        [(0, 1, 1, 0), (0, 1, 0, 0), (1, 1, 0, 0), (1, 1, 0, 0), (1, 1, 0, 0),
+         (0, 0, 0, 1), (0, 0, 0, 1), (0, 0, 1, 1), (0, 1, 1, 0), (1, 0, 0, 1)],
+        # 4th Row
+        [(1, 1, 1, 0), (1, 1, 0, 0), (1, 0, 0, 0), (1, 1, 0, 0), (0, 1, 0, 0),
+         (0, 0, 0, 1), (0, 0, 1, 1), (0, 1, 1, 0), (1, 1, 0, 0), (0, 0, 0, 1)],
+        # 5th Row
+        [(1, 0, 1, 0), (1, 1, 0, 0), (0, 0, 0, 0), (1, 0, 1, 1), (1, 0, 1, 1),
+         (0, 0, 1, 1), (0, 1, 1, 0), (1, 1, 0, 0), (1, 1, 0, 0), (0, 0, 0, 1)],
+        # 6th Row
+        [(0, 1, 1, 0), (1, 0, 0, 1), (0, 0, 1, 1), (0, 0, 1, 1), (0, 0, 1, 1),
+         (0, 0, 1, 1), (1, 0, 1, 1), (1, 0, 1, 0), (1, 1, 0, 1), (0, 0, 1, 0)],
+        # 7th Row
+        [(1, 0, 1, 0), (0, 1, 0, 1), (0, 1, 1, 0), (0, 0, 0, 1), (0, 0, 1, 1),
+         (0, 0, 1, 1), (0, 0, 1, 1), (0, 0, 1, 0), (1, 0, 0, 0), (0, 0, 0, 1)],
+        # 8th Row
+        [(0, 1, 1, 0), (1, 0, 0, 0), (1, 1, 0, 0), (0, 1, 0, 0), (0, 1, 0, 1),
+         (0, 0, 1, 1), (0, 0, 1, 0), (1, 0, 0, 0), (0, 0, 0, 1), (1, 0, 1, 1)],
+        # 9th Row
+        [(1, 1, 1, 0), (0, 0, 0, 0), (1, 1, 0, 0), (1, 1, 0, 0), (1, 0, 0, 1),
+         (0, 1, 1, 0), (0, 1, 0, 1), (0, 0, 1, 1), (0, 0, 1, 1), (0, 0, 1, 1)],
+        # 10th Row
+        [(1, 1, 1, 0), (0, 1, 0, 1), (1, 1, 1, 0), (1, 1, 0, 0), (0, 1, 0, 0),
+         (1, 1, 0, 0), (1, 1, 0, 0), (0, 1, 0, 1), (0, 1, 1, 0), (0, 1, 0, 1)],
+    ]
+
+    def __init__(self, loopChance: float = 0.0):
+        if loopChance > 0:
+            raise ValueError("The legacy layout is hand made and can not have loops. Pick a generated maze for --loops")
+
+    def generate(self, width, height, rng, reserved=()):
+        if width != self.SIZE or height != self.SIZE:
+            raise ValueError(f"The legacy layout is {self.SIZE}x{self.SIZE}, not {width}x{height}. "
+                             f"Pick a generated maze for other sizes")
+        exitNum = rng.randint(0, 2)
+        researchNum = rng.randint(0, 4)
+        gunNum = rng.randint(0, 4)
+        keyNum = rng.randint(0, 4)
+
+        walls = bytearray(width * height)
+        for y, row in enumerate(self.WALLS):
+            for x, (up, down, left, right) in enumerate(row):
+                walls[y * width + x] = (Cell.WALL_UP_BIT if up else 0) | (Cell.WALL_DOWN_BIT if down else 0) | \
+                    (Cell.WALL_LEFT_BIT if left else 0) | (Cell.WALL_RIGHT_BIT if right else 0)
+
+        # Both Exits are at a random location for the seed (they are paired together)
+        exits = [self.EXIT1_LOCATIONS[exitNum], self.EXIT2_LOCATIONS[exitNum]]
+        items = [(self.RESEARCH_LOCATIONS[researchNum], Item.research),
+                 (self.GUN_LOCATIONS[gunNum], Item.gun),
+                 (self.KEYCARD_LOCATIONS[keyNum], Item.keyCard)]
+        return MazeLayout(width, height, walls, exits, items)
+
+
+# every maze generator, by the name used on the command line
+MAZE_GENERATORS = {
+    "legacy": LegacyMaze,
+    "backtracker": BacktrackerMaze,
+    "sidewinder": SidewinderMaze,
+    "binaryTree": BinaryTreeMaze,
+    "serpentine": SerpentineMaze,
+    "comb": CombMaze,
+}
+
+
+def makeMazeGenerator(name: str = "legacy", loopChance: float = 0.0) -> MazeGenerator:
+    if name not in MAZE_GENERATORS:
+        raise ValueError(f"Unknown maze generator \"{name}\". Choose from {', '.join(MAZE_GENERATORS)}")
+    return MAZE_GENERATORS[name](loopChance)
@@ -0,0 +1,38 @@
+class Percepts:
+    """
+    Everything an Agent perceives during one tick.
+    Built once per tick by Agent.observe and shared by all of the agent's decision code,
+    so the agent's line of sight is only walked once per tick
+    """
+
+    def __init__(self, currentCell, seenCells, seenAgents, seenItems, seesExit, surroundings):
+        # the cell the agent is standing in
+        self.__currentCell = currentCell
+        # dict of the cells the agent can see and their {"x": x, "y": y} coordinates
+        self.__seenCells = seenCells
+        # agents in the seen cells, not including the agent itself
+        self.__seenAgents = seenAgents
+        # items in the seen cells
+        self.__seenItems = seenItems
+        # whether one of the seen cells is an exit
+        self.__seesExit = seesExit
+        # dict of direction: {"x": x, "y": y} of the neighboring cell, or None where there is a wall
+        self.__surroundings = surroundings
+
+    def getCurrentCell(self):
+        return self.__currentCell
+
+    def getSeenCells(self):
+        return self.__seenCells
+
+    def getSeenAgents(self):
+        return self.__seenAgents
+
+    def getSeenItems(self):
+        return self.__seenItems
+
+    def seesExit(self):
+        return self.__seesExit
+
+    def getSurroundings(self):
+        return self.__surroundings
@@ -0,0 +1,68 @@
+import time
+
+
+class PlaybackClock:
+    """
+    Turns wall clock time into rounds of a run to play, at a speed that does not depend on the frame rate.
+    Every round that comes due between two frames is played at once, so a frame only draws the latest
+    round however fast the playback is
+    """
+
+    # the speeds playback can be set to, as multiples of roundsPerSecond
+    SPEEDS = [0.25, 0.5, 1, 2, 4, 10, 25, 100, 250, 1000]
+    # the most wall clock time one frame can play, so a stalled frame does not jump ahead
+    MAX_FRAME_TIME = 0.25
+
+    def __init__(self, roundsPerSecond: float = 10, speed: float = 1):
+        """
+        :param roundsPerSecond:  the rounds played per second at a speed of 1
+        :param speed:            the starting speed. One of SPEEDS
+        """
+        self.__roundsPerSecond = roundsPerSecond
+        self.__speedIndex = self.SPEEDS.index(speed)
+        self.__isPlaying = False
+        self.__lastTime = None
+        # the fraction of a round that is due but not played yet
+        self.__dueRounds = 0.0
+
+    def isPlaying(self):
+        return self.__isPlaying
+
+    def togglePlaying(self):
+        self.__isPlaying = not self.__isPlaying
+        self.__lastTime = None
+        self.__dueRounds = 0.0
+
+    def getSpeed(self):
+        return self.SPEEDS[self.__speedIndex]
+
+    def faster(self):
+        """
+        :return:  the new speed
+        """
+        self.__speedIndex = min(self.__speedIndex + 1, len(self.SPEEDS) - 1)
+        return self.getSpeed()
+
+    def slower(self):
+        """
+        :return:  the new speed
+        """
+        self.__speedIndex = max(self.__speedIndex - 1, 0)
+        return self.getSpeed()
+
+    def getRoundsDue(self, now: float = None):
+        """
+        Call once a frame
+        :param now:  the time in seconds. time.perf_counter by default
+        :return:     the number of rounds to move forward since the last call. 0 while paused
+        """
+        if not self.__isPlaying:
+            return 0
+        now = time.perf_counter() if now == None else now
+        if self.__lastTime != None:
+            elapsed = min(now - self.__lastTime, self.MAX_FRAME_TIME)
+            self.__dueRounds += elapsed * self.__roundsPerSecond * self.getSpeed()
+        self.__lastTime = now
+        rounds = int(self.__dueRounds)
+        self.__dueRounds -= rounds
+        return rounds
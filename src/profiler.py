@@ -0,0 +1,95 @@
+import json
+import time
+
+"""
+Wall time and call counts of the phases of a simulation
+
+A phase is a stack of names, outermost first, like ("simulateRun", "round", "Monster", "chooseAction").
+The time of a phase includes the time of every phase nested in it, the way a profiler reports
+cumulative time. Reports can be written as JSON, or as collapsed stacks for flamegraph.pl and
+speedscope, which take the time spent in a phase itself, outside the phases nested in it
+"""
+
+# the unit of the counts of a collapsed stack file
+COLLAPSED_UNIT = 1e-6
+
+
+class Profiler:
+    """
+    Adds up the time spent in every phase. Timing is up to the caller:
+
+        start = profiler.now()
+        ...
+        profiler.add(("simulateRun", "stateCopy"), start)
+
+    Profilers are plain data, so they can be sent back from worker processes and merged
+    """
+
+    def __init__(self):
+        # (total seconds, calls) by phase
+        self.__phases = {}
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def add(self, phase: (str,), start: float, end: float = None):
+        """
+        Count one call of a phase
+        :param phase:  the stack of names of the phase, outermost first
+        :param start:  when the call started, from now()
+        :param end:    when the call ended. now() by default
+        """
+        elapsed = (time.perf_counter() if end == None else end) - start
+        seconds, calls = self.__phases.get(phase, (0.0, 0))
+        self.__phases[phase] = (seconds + elapsed, calls + 1)
+
+    def merge(self, other: 'Profiler'):
+        """
+        Add the phases of another profiler, like one of another run, into this one
+        """
+        for phase, (seconds, calls) in other.getPhases().items():
+            total, count = self.__phases.get(phase, (0.0, 0))
+            self.__phases[phase] = (total + seconds, count + calls)
+
+    def getPhases(self):
+        """
+        :return:  dict of phase: (total seconds, calls)
+        """
+        return self.__phases
+
+    def getSelfTimes(self):
+        """
+        :return:  dict of phase: seconds spent in the phase outside the phases nested in it
+        """
+        selfTimes = {phase: seconds for phase, (seconds, calls) in self.__phases.items()}
+        for phase, (seconds, calls) in self.__phases.items():
+            # take the time of a phase off the closest phase it is nested in that is timed itself
+            for depth in range(len(phase) - 1, 0, -1):
+                if phase[:depth] in selfTimes:
+                    selfTimes[phase[:depth]] -= seconds
+                    break
+        # TRICKY: Timer resolution can leave a phase a hair under the sum of its nested phases
+        return {phase: max(0.0, seconds) for phase, seconds in selfTimes.items()}
+
+    def toJson(self, path: str):
+        """
+        Write every phase with its calls, total time, time per call and self time, slowest first
+        """
+        selfTimes = self.getSelfTimes()
+        phases = [{"phase": list(phase), "calls": calls, "seconds": seconds,
+                   "secondsPerCall": seconds / calls, "selfSeconds": selfTimes[phase]}
+                  for phase, (seconds, calls) in self.__phases.items()]
+        phases.sort(key=lambda p: p["seconds"], reverse=True)
+        with open(path, "w") as file:
+            json.dump({"phases": phases}, file, indent=2)
+
+    def toCollapsed(self, path: str):
+        """
+        Write a collapsed stack file: a line per phase of its names joined by ; and its self time in microseconds
+        """
+        with open(path, "w") as file:
+            for phase, seconds in sorted(self.getSelfTimes().items()):
+                count = round(seconds / COLLAPSED_UNIT)
+                if count > 0:
+                    file.write(f"{';'.join(phase)} {count}\n")
@@ -1,3 +1,5 @@
+import re
+
 import pygame
 
 from pygame.locals import *
@@ -11,6 +13,7 @@ from gameState import Gamestate
 from monster import Monster
 from scientist import Scientist
 from soldier import Soldier
+from sprites import SpriteAtlas
 
 COLOR_WHITE = (255, 255, 255)
 COLOR_BLACK = (0,     0,   0)
@@ -24,154 +27,377 @@ COLOR_DARKBLUE = (0,     0, 155)
 COLOR_YELLOW = (255,  255,  0)
 COLOR_PINK = (255,  43, 227)
 
+# cells smaller than this many pixels are drawn from a raster of the whole maze instead of one by one
+DETAIL_CELL_SIZE = 6
+# the largest a cell can be zoomed to, as a share of the window
+MAX_CELL_SHARE = 1 / 4
+
+# bytes.translate tables from Cell bits to 1 where a cell has a wall or an exit, and 0 where not
+WALL_UP_RUNS = bytes(1 if bits & Cell.WALL_UP_BIT else 0 for bits in range(256))
+WALL_DOWN_RUNS = bytes(1 if bits & Cell.WALL_DOWN_BIT else 0 for bits in range(256))
+WALL_LEFT_RUNS = bytes(1 if bits & Cell.WALL_LEFT_BIT else 0 for bits in range(256))
+WALL_RIGHT_RUNS = bytes(1 if bits & Cell.WALL_RIGHT_BIT else 0 for bits in range(256))
+# the palette of the maze raster, and its index of every cell by Cell bits
+RASTER_PALETTE = [COLOR_BLACK, COLOR_WHITE, COLOR_PINK]
+RASTER_CELLS = bytes(2 if bits & Cell.EXIT_BIT else 0 for bits in range(256))
+
 
 class Renderer:
     """
     This class is responsible for rendering a Gamestate (gameState.py)
+    The window is a camera over the maze, which can be panned and zoomed. Only the cells in view are
+    drawn, and when the cells get too small to draw one by one the maze is drawn from a raster of
+    its walls, with the agents and items as colored squares on top
     """
 
-    def __init__(self, windowWidth, windowHeight, nCellsHorizontal, nCellsVertical, fps=10):
+    def __init__(self, windowWidth, windowHeight, nCellsHorizontal, nCellsVertical, fps=10, offscreen=False):
+        """
+        :param offscreen:  draw to a surface of its own instead of opening a window, for exporting frames.
+                           draw then returns as soon as the frame is drawn
+        """
         pygame.init()
         self.__clearColor = COLOR_BLACK
         self.__fps = fps
         self.__fpsClock = pygame.time.Clock()
         self.__windowWidth = windowWidth
         self.__windowHeight = windowHeight
-        self.__cellWidth = windowWidth//nCellsHorizontal
-        self.__cellHeight = windowHeight//nCellsVertical
-        self.__displaySurface = pygame.display.set_mode(
-            (self.__windowWidth, self.__windowHeight))
-        pygame.display.set_caption('Labyrinth')
+        self.__offscreen = offscreen
+        if offscreen:
+            self.__displaySurface = pygame.Surface((self.__windowWidth, self.__windowHeight))
+        else:
+            self.__displaySurface = pygame.display.set_mode(
+                (self.__windowWidth, self.__windowHeight))
+            pygame.display.set_caption('Labyrinth')
+        self.__agentColors = {Civilian: COLOR_BLUE, Soldier: COLOR_GREEN,
+                              Scientist: COLOR_ORANGE, Monster: COLOR_RED}
+        self.__sprites = SpriteAtlas(self.__agentColors, COLOR_WHITE)
 
-    def __drawRect(self, x: float, y: float, w: float, h: float, color: (int, int, int)):
-        pygame.draw.rect(self.__displaySurface, color, pygame.Rect(x, y, w, h))
+        # the camera. A zoom of 1 fits the whole maze in the window, and the view is the cell
+        # coordinates of the top left corner of the window
+        self.__nCellsHorizontal = nCellsHorizontal
+        self.__nCellsVertical = nCellsVertical
+        self.__zoom = 1.0
+        self.__viewX = 0.0
+        self.__viewY = 0.0
+        self.__updateCamera()
 
-    def __drawCircle(self, x: float, y: float, w: float, h: float, color: (int, int, int)):
-        pygame.draw.ellipse(self.__displaySurface, color,
-                            pygame.Rect(x, y, w, h))
+        # cached drawings of the Layout being shown, and what was in every occupied cell last frame
+        self.__layout = None
+        self.__cameraKey = None
+        self.__background = None
+        self.__wallLayer = None
+        self.__raster = None
+        self.__rasterView = None
+        self.__lastContents = None
 
-    def __drawLine(self, x1: int, y1: int, x2: int, y2: int, color: (int, int, int), width: int = 1):
-        pygame.draw.line(self.__displaySurface, color,
-                         (x1, y1), (x2, y2), width)
+    """
+    Camera
+    """
+
+    def pan(self, dx: float, dy: float):
+        """
+        Move the camera
+        :param dx:  how far to move, in pixels of the window
+        :param dy:  how far to move, in pixels of the window
+        """
+        self.__viewX += dx / self.__cellScaleX
+        self.__viewY += dy / self.__cellScaleY
+        self.__updateCamera()
+
+    def zoom(self, factor: float):
+        """
+        Zoom the camera in (factor > 1) or out (factor < 1), keeping the middle of the window in place
+        The camera can not zoom out past the whole maze, or in past a quarter of the window per cell
+        """
+        centerX = self.__viewX + self.__windowWidth / self.__cellScaleX / 2
+        centerY = self.__viewY + self.__windowHeight / self.__cellScaleY / 2
+        fitScale = min(self.__windowWidth / self.__nCellsHorizontal, self.__windowHeight / self.__nCellsVertical)
+        maxZoom = max(1.0, min(self.__windowWidth, self.__windowHeight) * MAX_CELL_SHARE / fitScale)
+        self.__zoom = min(max(self.__zoom * factor, 1.0), maxZoom)
+        self.__updateCamera()
+        self.__viewX = centerX - self.__windowWidth / self.__cellScaleX / 2
+        self.__viewY = centerY - self.__windowHeight / self.__cellScaleY / 2
+        self.__updateCamera()
 
-    def __drawTri(self, tri: [(int, int), (int, int), (int, int)], color: (int, int, int)):
-        pygame.draw.polygon(self.__displaySurface, color, tri)
-
-    def __getFacingTri(self, direction: str, x: int, y: int, w: int, h: int):
-        tl = (x, y)
-        tr = (x + w, y)
-        br = (x + w, y + h)
-        bl = (x, y + h)
-
-        cu = (x + w/2, y)
-        cr = (x + w, y + h/2)
-        cd = (x + w/2, y + h)
-        cl = (x, y + h/2)
-
-        if direction == "right":
-            return [tl, cr, bl]
-        if direction == "up":
-            return [bl, cu, br]
-        if direction == "left":
-            return [br, cl, tr]
-        if direction == "down":
-            return [tl, cd, tr]
-        return []
+    def resetCamera(self):
+        """
+        Zoom out to the whole maze
+        """
+        self.__zoom = 1.0
+        self.__viewX = 0.0
+        self.__viewY = 0.0
+        self.__updateCamera()
+
+    def __updateCamera(self):
+        """
+        Work out the size and position of the cells from the camera, keeping the maze in view
+        """
+        # the size of a cell in pixels, which is whole in detail and fractional when drawn from the raster
+        self.__cellScaleX = self.__windowWidth / self.__nCellsHorizontal * self.__zoom
+        self.__cellScaleY = self.__windowHeight / self.__nCellsVertical * self.__zoom
+        self.__cellWidth = max(1, int(self.__cellScaleX))
+        self.__cellHeight = max(1, int(self.__cellScaleY))
+        self.__isDetailed = min(self.__cellWidth, self.__cellHeight) >= DETAIL_CELL_SIZE
+        if self.__isDetailed:
+            self.__cellScaleX = self.__cellWidth
+            self.__cellScaleY = self.__cellHeight
+        self.__viewX = max(0.0, min(self.__viewX, self.__nCellsHorizontal - self.__windowWidth / self.__cellScaleX))
+        self.__viewY = max(0.0, min(self.__viewY, self.__nCellsVertical - self.__windowHeight / self.__cellScaleY))
+        # the pixel of the window the top left corner of the maze is at
+        self.__originX = -round(self.__viewX * self.__cellScaleX)
+        self.__originY = -round(self.__viewY * self.__cellScaleY)
+
+    """
+    Drawing
+    """
+
+    def __drawRect(self, surface, x: float, y: float, w: float, h: float, color: (int, int, int)):
+        pygame.draw.rect(surface, color, pygame.Rect(x, y, w, h))
+
+    def __drawLine(self, surface, x1: int, y1: int, x2: int, y2: int, color: (int, int, int), width: int = 1):
+        pygame.draw.line(surface, color,
+                         (x1, y1), (x2, y2), width)
 
     def __drawItem(self, x: int, y: int, item: Item):
-        color = COLOR_DARKGRAY
-        xr, yr = (x * self.__cellWidth, y * self.__cellHeight)
-        if item == Item.keyCard:
-            itemImage = pygame.image.load("keycard.png")
-            itemImage = pygame.transform.scale(itemImage, (self.__cellWidth // 2, self.__cellHeight // 2))
-            self.__displaySurface.blit(itemImage, (xr, yr))
-        if item == Item.gun:
-            itemImage = pygame.image.load("shotgun.png")
-            itemImage = pygame.transform.scale(itemImage, (self.__cellWidth, self.__cellHeight // 2))
-            self.__displaySurface.blit(itemImage, (xr, yr))
-        if item == Item.research:
-            itemImage = pygame.image.load("science.png")
-            itemImage = pygame.transform.scale(itemImage, (self.__cellWidth // 2, self.__cellHeight // 2))
-            self.__displaySurface.blit(itemImage, (xr, yr))
+        xr, yr = (self.__originX + x * self.__cellWidth, self.__originY + y * self.__cellHeight)
+        self.__displaySurface.blit(self.__sprites.getItem(item), (xr, yr))
 
     def __drawAgent(self, x: int, y: int, agent: Agent):
-        color = COLOR_DARKGRAY
-        xr, yr = (x * self.__cellWidth, y * self.__cellHeight)
-        if isinstance(agent, Civilian):
-            color = COLOR_BLUE
-            xr = xr
-            yr = yr
+        xr, yr = (self.__originX + x * self.__cellWidth, self.__originY + y * self.__cellHeight)
         if isinstance(agent, Soldier):
-            color = COLOR_GREEN
             xr = xr + self.__cellWidth // 2
-            yr = yr
         if isinstance(agent, Scientist):
-            color = COLOR_ORANGE
-            xr = xr
             yr = yr + self.__cellHeight // 2
         if isinstance(agent, Monster):
-            color = COLOR_RED
             xr = xr + self.__cellWidth // 2
             yr = yr + self.__cellHeight // 2
-        # TODO: When we get images, draw the image instead.
-        self.__drawCircle(xr, yr, self.__cellWidth // 2,
-                          self.__cellHeight // 2, color)
-        facingTri = self.__getFacingTri(
-            agent.getDirection(), xr, yr, self.__cellWidth//2, self.__cellHeight//2)
-        self.__drawTri(facingTri, COLOR_WHITE)
-
-    def __drawWalls(self, x: int, y: int, walls: {"up": bool, "right": bool, "down": bool, "left": bool}):
+        self.__displaySurface.blit(self.__sprites.getAgent(agent), (xr, yr))
+
+    def __drawWalls(self, surface, walls: bytes, width: int, height: int, xFirst: int, xLast: int, yFirst: int,
+                    yLast: int):
+        """
+        Draw the walls of a block of cells, a run of walls at a time
+        Walls are closed, so every wall is the top or left wall of a cell, or on the bottom or right edge
+        """
         color = COLOR_WHITE
-        xr, yr = (x * self.__cellWidth, y * self.__cellHeight)
-        if walls['up']:
-            self.__drawLine(xr, yr, xr + self.__cellWidth, yr, color)
-        if walls['right']:
-            self.__drawLine(xr + self.__cellWidth, yr, xr +
-                            self.__cellWidth, yr + self.__cellHeight, color)
-        if walls['down']:
-            self.__drawLine(xr, yr + self.__cellHeight, xr +
-                            self.__cellWidth, yr + self.__cellHeight, color)
-        if walls['left']:
-            self.__drawLine(xr, yr, xr, yr + self.__cellHeight, color)
-
-    def __drawExit(self, x: int, y: int):
+        ox, oy = self.__originX, self.__originY
+        for y in range(yFirst, min(yLast + 1, height - 1) + 1):
+            row = walls[y * width + xFirst:y * width + xLast + 1]
+            for run in re.finditer(b"\x01+", row.translate(WALL_UP_RUNS)):
+                self.__drawLine(surface, ox + (xFirst + run.start()) * self.__cellWidth, oy + y * self.__cellHeight,
+                                ox + (xFirst + run.end()) * self.__cellWidth, oy + y * self.__cellHeight, color)
+        if yLast == height - 1:
+            row = walls[yLast * width + xFirst:yLast * width + xLast + 1]
+            for run in re.finditer(b"\x01+", row.translate(WALL_DOWN_RUNS)):
+                self.__drawLine(surface, ox + (xFirst + run.start()) * self.__cellWidth, oy + height * self.__cellHeight,
+                                ox + (xFirst + run.end()) * self.__cellWidth, oy + height * self.__cellHeight, color)
+        for x in range(xFirst, min(xLast + 1, width - 1) + 1):
+            column = walls[yFirst * width + x:yLast * width + x + 1:width]
+            for run in re.finditer(b"\x01+", column.translate(WALL_LEFT_RUNS)):
+                self.__drawLine(surface, ox + x * self.__cellWidth, oy + (yFirst + run.start()) * self.__cellHeight,
+                                ox + x * self.__cellWidth, oy + (yFirst + run.end()) * self.__cellHeight, color)
+        if xLast == width - 1:
+            column = walls[yFirst * width + xLast:yLast * width + xLast + 1:width]
+            for run in re.finditer(b"\x01+", column.translate(WALL_RIGHT_RUNS)):
+                self.__drawLine(surface, ox + width * self.__cellWidth, oy + (yFirst + run.start()) * self.__cellHeight,
+                                ox + width * self.__cellWidth, oy + (yFirst + run.end()) * self.__cellHeight, color)
+
+    def __drawExit(self, surface, x: int, y: int):
         color = COLOR_PINK
-        xr, yr = (x * self.__cellWidth, y * self.__cellHeight)
-        self.__drawRect(xr, yr, self.__cellWidth,
+        xr, yr = (self.__originX + x * self.__cellWidth, self.__originY + y * self.__cellHeight)
+        self.__drawRect(surface, xr, yr, self.__cellWidth,
                         self.__cellHeight, color)
 
-    def __drawCell(self, x: int, y: int, cell: Cell):
-        if cell.isExit:
-            self.__drawExit(x, y)
-        for item in cell.getItemList():
-            self.__drawItem(x, y, item)
-        for agent in cell.getAgentList():
-            self.__drawAgent(x, y, agent)
-        self.__drawWalls(x, y, {"up": cell.isWallUp(),
-                                "right": cell.isWallRight(),
-                                "down": cell.isWallDown(),
-                                "left": cell.isWallLeft()})
-
-    def __drawGrid(self, width: int, height: int):
-        for x in range(0, width):
-            pygame.draw.line(self.__displaySurface, COLOR_DARKGRAY,
-                             (x * self.__cellWidth, 0),
-                             (x * self.__cellWidth, self.__windowHeight))
-        for y in range(0, height):
-            pygame.draw.line(self.__displaySurface, COLOR_DARKGRAY,
-                             (0, y * self.__cellHeight),
-                             (self.__windowWidth, y * self.__cellHeight))
-
-    def __drawState(self, state: Gamestate):
-        self.__drawGrid(state.getWidth(), state.getHeight())
-
-        for x in range(0, state.getWidth()):
-            for y in range(0, state.getHeight()):
-                cell = state.getCellAt(x, y)
-                self.__drawCell(x, y, cell)
+    def __drawGrid(self, surface, xFirst: int, xLast: int, yFirst: int, yLast: int):
+        for x in range(xFirst, xLast + 1):
+            pygame.draw.line(surface, COLOR_DARKGRAY,
+                             (self.__originX + x * self.__cellWidth, 0),
+                             (self.__originX + x * self.__cellWidth, self.__windowHeight))
+        for y in range(yFirst, yLast + 1):
+            pygame.draw.line(surface, COLOR_DARKGRAY,
+                             (0, self.__originY + y * self.__cellHeight),
+                             (self.__windowWidth, self.__originY + y * self.__cellHeight))
 
-    def draw(self, state: Gamestate):
+    def __getCellsInView(self, state: Gamestate):
+        """
+        :return:  the first and last x and y of the cells that are at least partly in the window
+        """
+        return (max(0, -self.__originX // self.__cellWidth),
+                min(state.getWidth() - 1, (self.__windowWidth - 1 - self.__originX) // self.__cellWidth),
+                max(0, -self.__originY // self.__cellHeight),
+                min(state.getHeight() - 1, (self.__windowHeight - 1 - self.__originY) // self.__cellHeight))
+
+    def __buildLayers(self, state: Gamestate):
+        """
+        Draw the parts of the maze in view that never change during a run, once per camera position
+        The background has the grid, exits and walls, and the wall layer has the walls again on a
+        transparent surface, to be laid over the agents and items
+        """
+        self.__sprites.setCellSize(self.__cellWidth, self.__cellHeight)
+        self.__background = self.__makeLayer()
+        self.__background.fill(self.__clearColor)
+        self.__wallLayer = self.__makeLayer()
+        self.__wallLayer.fill(COLOR_BLACK)
+        self.__wallLayer.set_colorkey(COLOR_BLACK)
+        xFirst, xLast, yFirst, yLast = self.__getCellsInView(state)
+        self.__drawGrid(self.__background, xFirst, xLast, yFirst, yLast)
+        for location in self.__layout.getExits():
+            if xFirst <= location["x"] <= xLast and yFirst <= location["y"] <= yLast:
+                self.__drawExit(self.__background, location["x"], location["y"])
+        for layer in (self.__background, self.__wallLayer):
+            self.__drawWalls(layer, state.getWalls(), state.getWidth(), state.getHeight(), xFirst, xLast, yFirst, yLast)
+
+    def __buildRaster(self, state: Gamestate):
+        """
+        Draw the whole maze as a small image, with a pixel for every cell, every wall between two cells
+        and every corner, to be scaled to the camera when the cells are too small to draw one by one
+        """
+        width, height = state.getWidth(), state.getHeight()
+        walls = state.getWalls()
+        rasterWidth = 2 * width + 1
+        pixels = bytearray(rasterWidth * (2 * height + 1))
+        for y in range(height + 1):
+            # corners are always walls
+            pixels[2 * y * rasterWidth:(2 * y + 1) * rasterWidth:2] = bytes([1]) * (width + 1)
+        for y in range(height):
+            row = walls[y * width:(y + 1) * width]
+            wallRow = 2 * y * rasterWidth
+            cellRow = (2 * y + 1) * rasterWidth
+            pixels[wallRow + 1:wallRow + rasterWidth:2] = row.translate(WALL_UP_RUNS)
+            pixels[cellRow] = row[0] & Cell.WALL_LEFT_BIT != 0
+            pixels[cellRow + 1:cellRow + rasterWidth:2] = row.translate(RASTER_CELLS)
+            pixels[cellRow + 2:cellRow + rasterWidth:2] = row.translate(WALL_RIGHT_RUNS)
+        bottomRow = 2 * height * rasterWidth
+        pixels[bottomRow + 1::2] = walls[(height - 1) * width:].translate(WALL_DOWN_RUNS)
+        self.__raster = pygame.image.frombytes(bytes(pixels), (rasterWidth, 2 * height + 1), 'P')
+        self.__raster.set_palette(RASTER_PALETTE)
+
+    def __buildRasterView(self, state: Gamestate):
+        """
+        Scale the part of the raster in view to the window, once per camera position
+        """
+        if self.__raster == None:
+            self.__buildRaster(state)
+        xFirst, xLast, yFirst, yLast = self.__getCellsInView(state)
+        # the raster has 2 pixels per cell, and the walls on the far side of the last cell
+        source = pygame.Rect(2 * xFirst, 2 * yFirst, 2 * (xLast - xFirst + 1) + 1, 2 * (yLast - yFirst + 1) + 1)
+        scaleX, scaleY = self.__cellScaleX / 2, self.__cellScaleY / 2
+        self.__rasterView = pygame.transform.scale(
+            self.__raster.subsurface(source), (max(1, round(source.width * scaleX)), max(1, round(source.height * scaleY))))
+        self.__rasterViewPosition = (self.__originX + round(2 * xFirst * scaleX),
+                                     self.__originY + round(2 * yFirst * scaleY))
+
+    def __makeLayer(self):
+        layer = pygame.Surface((self.__windowWidth, self.__windowHeight))
+        # surfaces can only be converted to the display format once there is a display
+        return layer if self.__offscreen else layer.convert()
+
+    def __getContents(self, state: Gamestate):
+        """
+        :return:  dict of cell index: what is drawn in the cell, for every cell with agents or items
+        """
+        agentLists = state.getAgentLists()
+        itemLists = state.getItemLists()
+        return {i: (tuple(itemLists.get(i, ())),
+                    tuple((type(agent), agent.getDirection()) for agent in agentLists.get(i, ())))
+                for i in agentLists.keys() | itemLists.keys()}
+
+    def __getCellRect(self, index: int, width: int):
+        # TRICKY: A cell's right and bottom walls, and the edges of its agents, are drawn on the first
+        # pixel of the next cell over
+        return pygame.Rect(self.__originX + (index % width) * self.__cellWidth,
+                           self.__originY + (index // width) * self.__cellHeight,
+                           self.__cellWidth + 1, self.__cellHeight + 1)
+
+    def __redraw(self, state: Gamestate, contents, rect: pygame.Rect):
+        """
+        Draw everything inside a rectangle of the window over whatever was there
+        """
+        width = state.getWidth()
+        # the cells whose sprites can reach into the rectangle, including the ones above and to the left
+        xFirst = (rect.left - self.__originX) // self.__cellWidth - 1
+        xLast = (rect.right - 1 - self.__originX) // self.__cellWidth
+        yFirst = (rect.top - self.__originY) // self.__cellHeight - 1
+        yLast = (rect.bottom - 1 - self.__originY) // self.__cellHeight
+        if (xLast - xFirst + 1) * (yLast - yFirst + 1) < len(contents):
+            cells = [y * width + x for x in range(max(0, xFirst), min(width - 1, xLast) + 1)
+                     for y in range(max(0, yFirst), min(state.getHeight() - 1, yLast) + 1) if y * width + x in contents]
+        else:
+            cells = sorted((i for i in contents if xFirst <= i % width <= xLast and yFirst <= i // width <= yLast),
+                           key=lambda i: (i % width, i // width))
+
+        self.__displaySurface.set_clip(rect)
+        self.__displaySurface.blit(self.__background, rect, rect)
+        agentLists = state.getAgentLists()
+        itemLists = state.getItemLists()
+        for i in cells:
+            for item in itemLists.get(i, ()):
+                self.__drawItem(i % width, i // width, item)
+            for agent in agentLists.get(i, ()):
+                self.__drawAgent(i % width, i // width, agent)
+        self.__displaySurface.blit(self.__wallLayer, rect, rect)
+        self.__displaySurface.set_clip(None)
+
+    def __drawRaster(self, state: Gamestate, contents):
+        """
+        Draw the maze from its raster, and every occupied cell as a square of the color of its first
+        agent, or yellow if it only has items
+        """
         self.__displaySurface.fill(self.__clearColor)
-        self.__drawState(state)
-        pygame.display.update()
+        self.__displaySurface.blit(self.__rasterView, self.__rasterViewPosition)
+        width = state.getWidth()
+        agentLists = state.getAgentLists()
+        size = (max(2, round(self.__cellScaleX)), max(2, round(self.__cellScaleY)))
+        for i in contents:
+            agents = agentLists.get(i)
+            color = self.__agentColors[type(agents[0])] if agents else COLOR_YELLOW
+            self.__drawRect(self.__displaySurface, self.__originX + round((i % width) * self.__cellScaleX),
+                            self.__originY + round((i // width) * self.__cellScaleY), *size, color)
+
+    def draw(self, state: Gamestate):
+        """
+        Draw a Gamestate, redrawing only the cells whose agents or items changed since the last one
+        unless the camera moved
+        :return:  the list of rects of the window that were redrawn
+        """
+        if state.getLayout() is not self.__layout:
+            self.__layout = state.getLayout()
+            self.__raster = None
+            if (state.getWidth(), state.getHeight()) != (self.__nCellsHorizontal, self.__nCellsVertical):
+                self.__nCellsHorizontal, self.__nCellsVertical = state.getWidth(), state.getHeight()
+                self.resetCamera()
+            self.__cameraKey = None
+        cameraKey = (self.__cellScaleX, self.__cellScaleY, self.__originX, self.__originY)
+        if cameraKey != self.__cameraKey:
+            self.__cameraKey = cameraKey
+            if self.__isDetailed:
+                self.__buildLayers(state)
+            else:
+                self.__buildRasterView(state)
+            self.__lastContents = None
+
+        contents = self.__getContents(state)
+        if not self.__isDetailed:
+            self.__drawRaster(state, contents)
+            dirtyRects = [self.__displaySurface.get_rect()]
+        else:
+            if self.__lastContents == None:
+                dirtyRects = [self.__displaySurface.get_rect()]
+            else:
+                dirtyRects = [self.__getCellRect(i, state.getWidth())
+                              for i in contents.keys() | self.__lastContents.keys()
+                              if contents.get(i) != self.__lastContents.get(i)]
+            for rect in dirtyRects:
+                self.__redraw(state, contents, rect)
+        self.__lastContents = contents
+        if self.__offscreen:
+            return dirtyRects
+        pygame.display.update(dirtyRects)
         self.__fpsClock.tick(self.__fps)
+        return dirtyRects
+
+    def getSurface(self):
+        """
+        :return:  the surface frames are drawn to
+        """
+        return self.__displaySurface
@@ -0,0 +1,486 @@
+import bisect
+import lzma
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+from array import array
+
+from civilian import Civilian
+from gameState import Gamestate
+from item import Item
+from layout import Layout
+from monster import Monster
+from scientist import Scientist
+from soldier import Soldier
+
+"""
+A saved run is a replay file:
+
+    header   magic, version, codec, width, height, the name and role of every agent, and the layout
+    chunks   a run of rounds each, as columns of agent positions, directions, statuses, inventories and
+             places in the agent list of their cell, and the items on the grid. Every chunk is compressed
+             on its own and carries a checksum
+    footer   the offset and first round of every chunk
+    trailer  the offset of the footer
+
+All numbers are little endian. The footer and trailer are rewritten after every chunk, and the next
+chunk is written over them. A replay cut off while a chunk was being written has no trailer, and is
+read by walking the chunks from the header for as long as their checksums hold.
+"""
+
+REPLAY_MAGIC = b"LBRP"
+REPLAY_VERSION = 2
+CHUNK_MAGIC = b"LBCK"
+FOOTER_MAGIC = b"LBFT"
+TRAILER_MAGIC = b"LBRE"
+
+# magic, version, codec, width, height, number of agents
+HEADER = struct.Struct("<4sHBxIIH")
+# magic, first round, number of rounds, compressed size, crc32 of the compressed payload
+CHUNK_HEADER = struct.Struct("<4sIIII")
+# offset, first round, number of rounds
+CHUNK_ENTRY = struct.Struct("<QII")
+# magic, number of rounds, number of chunks
+FOOTER_HEADER = struct.Struct("<4sII")
+# footer offset, magic
+TRAILER = struct.Struct("<Q4s")
+
+CODECS = {
+    "none": 0,
+    "zlib": 1,
+    "lzma": 2,
+}
+
+# the class of every agent role, by its number in the header
+ROLES = [Monster, Civilian, Soldier, Scientist]
+DIRECTIONS = [Monster.UP, Monster.DOWN, Monster.LEFT, Monster.RIGHT]
+# items by their number in an inventory or item column
+ITEMS = [Item.gun, Item.keyCard, Item.research]
+# an inventory is a number of INVENTORY_BITS per item, in the order the items were picked up, holding
+# the number of the item + 1. Replays before version 2 hold a bit per number of the item instead
+INVENTORY_BITS = 2
+MAX_INVENTORY = 8
+# the place in its cell of an agent that is in no cell
+NO_CELL = 255
+
+# agent status bits. The order an agent escaped in, starting at 1, is in the high 4 bits
+IN_PLAY = 1
+ALIVE = 2
+VICTOR = 4
+
+DEFAULT_CHUNK_ROUNDS = 256
+
+
+def _compress(codec, data):
+    if codec == CODECS["zlib"]:
+        return zlib.compress(data, 6)
+    if codec == CODECS["lzma"]:
+        return lzma.compress(data)
+    return bytes(data)
+
+
+def _decompress(codec, data):
+    if codec == CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec == CODECS["lzma"]:
+        return lzma.decompress(data)
+    return bytes(data)
+
+
+def _littleEndian(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _fromLittleEndian(typecode, data):
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def isReplay(path: str):
+    """
+    :return:  True if the file is a replay, False if not (like a run pickled before replays)
+    """
+    with open(path, "rb") as f:
+        return f.read(len(REPLAY_MAGIC)) == REPLAY_MAGIC
+
+
+class ReplayWriter:
+    """
+    Writes the rounds of a run to a replay file, a chunk of rounds at a time
+    Only the rounds of the chunk being filled are held in memory, so rounds can be streamed
+    to the file as they are simulated
+    """
+
+    def __init__(self, path: str, state: Gamestate, codec: str = "zlib", chunkRounds: int = DEFAULT_CHUNK_ROUNDS):
+        """
+        :param path:         the file to write
+        :param state:        any Gamestate of the run, for its layout and agents
+        :param codec:        how chunks are compressed. One of CODECS
+        :param chunkRounds:  the number of rounds in each chunk. The file is flushed after every chunk
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec \"{codec}\". Choose from {', '.join(CODECS)}")
+        self.__codec = CODECS[codec]
+        self.__chunkRounds = max(1, chunkRounds)
+        self.__agentNames = list(state.getAllAgents().keys())
+        self.__nRounds = 0
+        self.__chunks = []
+        self.__file = open(path, "wb")
+        self.__writeHeader(state)
+        self.__clearColumns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __writeHeader(self, state: Gamestate):
+        agents = state.getAllAgents()
+        header = bytearray(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.__codec,
+                                       state.getWidth(), state.getHeight(), len(agents)))
+        for name, agent in agents.items():
+            encodedName = name.encode()
+            header += bytes([ROLES.index(type(agent)), len(encodedName)]) + encodedName
+        walls = _compress(self.__codec, state.getWalls())
+        header += struct.pack("<I", len(walls)) + walls
+        self.__file.write(header)
+
+    def __clearColumns(self):
+        self.__firstRound = self.__nRounds
+        self.__xs = array('I')
+        self.__ys = array('I')
+        self.__directions = bytearray()
+        self.__statuses = bytearray()
+        self.__inventories = array('H')
+        self.__cellOrders = bytearray()
+        self.__itemCounts = array('I')
+        self.__itemCells = array('I')
+        self.__itemKinds = bytearray()
+
+    def addRound(self, state: Gamestate):
+        """
+        Append the Gamestate at the end of the next round
+        """
+        inPlay = state.getAgents()
+        # TRICKY: Look agents up by name. Runs pickled before the event log hold separate copies
+        # of the agents in every round, and only list the agents still in play
+        escapees = [agent.getName() for agent in state.getEscapees()]
+        victors = [agent.getName() for agent in state.getVictors()]
+        allAgents = dict(state.getAllAgents())
+        for agent in state.getEscapees() + state.getVictors():
+            allAgents.setdefault(agent.getName(), agent)
+        # TRICKY: The first agent of a cell is the one that gets shot and drawn, so keep the order agents
+        # entered their cell in rather than the order of the columns
+        cellOrders = {agent.getName(): order for agentList in state.getAgentLists().values()
+                      for order, agent in enumerate(agentList)}
+
+        row = []
+        for name in self.__agentNames:
+            agent = allAgents.get(name)
+            if agent == None:
+                # an agent that was killed before the round, in a run that did not keep it
+                row.append((0, 0, 0, 0, 0, NO_CELL))
+                continue
+            status = (IN_PLAY if name in inPlay else 0) | (ALIVE if agent.isAlive() else 0) | \
+                (VICTOR if name in victors else 0)
+            if name in escapees:
+                status |= (escapees.index(name) + 1) << 4
+            if len(agent.getInventory()) > MAX_INVENTORY:
+                raise ValueError(f"{name} holds {len(agent.getInventory())} items. "
+                                 f"A replay holds at most {MAX_INVENTORY} per agent")
+            inventory = 0
+            for slot, item in enumerate(agent.getInventory()):
+                inventory |= (ITEMS.index(item) + 1) << (slot * INVENTORY_BITS)
+            row.append((agent.getLocation()["x"], agent.getLocation()["y"],
+                        DIRECTIONS.index(agent.getDirection()), status, inventory, cellOrders.get(name, NO_CELL)))
+        items = [(index, ITEMS.index(item))
+                 for index, cellItems in sorted(state.getItemLists().items()) for item in cellItems]
+
+        # only add to the columns once the whole round is known, so they never hold half a round
+        for x, y, direction, status, inventory, cellOrder in row:
+            self.__xs.append(x)
+            self.__ys.append(y)
+            self.__directions.append(direction)
+            self.__statuses.append(status)
+            self.__inventories.append(inventory)
+            self.__cellOrders.append(cellOrder)
+        for index, kind in items:
+            self.__itemCells.append(index)
+            self.__itemKinds.append(kind)
+        self.__itemCounts.append(len(items))
+
+        self.__nRounds += 1
+        if self.__nRounds - self.__firstRound >= self.__chunkRounds:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the rounds added since the last chunk as a chunk of their own
+        """
+        nRounds = self.__nRounds - self.__firstRound
+        if nRounds == 0:
+            return
+        payload = struct.pack("<I", len(self.__itemKinds)) + _littleEndian(self.__xs) + \
+            _littleEndian(self.__ys) + self.__directions + self.__statuses + _littleEndian(self.__inventories) + \
+            self.__cellOrders + \
+            _littleEndian(self.__itemCounts) + _littleEndian(self.__itemCells) + self.__itemKinds
+        payload = _compress(self.__codec, payload)
+        self.__chunks.append((self.__file.tell(), self.__firstRound, nRounds))
+        self.__file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self.__firstRound, nRounds,
+                                            len(payload), zlib.crc32(payload)))
+        self.__file.write(payload)
+        self.__clearColumns()
+        self.__writeFooter()
+
+    def __writeFooter(self):
+        """
+        Write the footer after the last chunk, make sure it is on disk, and go back to
+        where the next chunk starts
+        """
+        footerOffset = self.__file.tell()
+        self.__file.write(FOOTER_HEADER.pack(FOOTER_MAGIC, self.__nRounds, len(self.__chunks)))
+        for chunk in self.__chunks:
+            self.__file.write(CHUNK_ENTRY.pack(*chunk))
+        self.__file.write(TRAILER.pack(footerOffset, TRAILER_MAGIC))
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__file.seek(footerOffset)
+
+    def getRoundCount(self):
+        return self.__nRounds
+
+    def close(self):
+        """
+        Write the last chunk and the footer, and close the file
+        """
+        if self.__file.closed:
+            return
+        self.flush()
+        if not self.__chunks:
+            self.__writeFooter()
+        self.__file.close()
+
+
+class ReplayReader:
+    """
+    Reads the rounds of a replay file back as Gamestates
+    The file is memory mapped, and chunks are only read and decoded when one of their rounds is
+    asked for. Opening a replay reads its header and footer, whatever the length of the run
+    """
+
+    # the most decoded chunks kept at once
+    MAX_CHUNKS = 4
+
+    def __init__(self, path: str):
+        self.__path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError("Not a replay file")
+            # the map keeps its own handle on the file, which stays open until close
+            self.__data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__readHeader()
+        self.__readFooter()
+        # decoded columns of the most recently used chunks, by chunk number
+        self.__columns = {}
+        # TRICKY: Every round is decoded into the same Gamestate and agents, so the Cell views stay valid.
+        # Agents hold a memory of the whole grid, so they are only made once a round is asked for
+        self.__agents = None
+        self.__state = None
+
+    def __readHeader(self):
+        magic, version, self.__codec, width, height, nAgents = HEADER.unpack_from(self.__data, 0)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Not a replay file")
+        if version > REPLAY_VERSION:
+            raise ValueError(f"Replay version {version} is newer than this version of labyrinth ({REPLAY_VERSION})")
+        self.__version = version
+        offset = HEADER.size
+        # (name, agent class) of every agent, in the order of the columns
+        self.__roles = []
+        for _ in range(nAgents):
+            role, nameLength = self.__data[offset], self.__data[offset + 1]
+            name = self.__data[offset + 2:offset + 2 + nameLength].decode()
+            offset += 2 + nameLength
+            self.__roles.append((name, ROLES[role]))
+        wallsSize, = struct.unpack_from("<I", self.__data, offset)
+        offset += 4
+        walls = _decompress(self.__codec, self.__data[offset:offset + wallsSize])
+        self.__layout = Layout.intern(width, height, walls)
+        self.__firstChunk = offset + wallsSize
+
+    def __readFooter(self):
+        footerOffset, magic = TRAILER.unpack_from(self.__data, len(self.__data) - TRAILER.size) \
+            if len(self.__data) >= self.__firstChunk + TRAILER.size else (0, None)
+        if magic == TRAILER_MAGIC and FOOTER_HEADER.unpack_from(self.__data, footerOffset)[0] == FOOTER_MAGIC:
+            magic, self.__nRounds, nChunks = FOOTER_HEADER.unpack_from(self.__data, footerOffset)
+            self.__chunks = [CHUNK_ENTRY.unpack_from(self.__data, footerOffset + FOOTER_HEADER.size + i * CHUNK_ENTRY.size)
+                             for i in range(nChunks)]
+        else:
+            self.__recoverChunks()
+        self.__firstRounds = [firstRound for _, firstRound, _ in self.__chunks]
+
+    def __recoverChunks(self):
+        """
+        Find the chunks of a replay that was never closed, by walking them from the header
+        """
+        self.__chunks = []
+        self.__nRounds = 0
+        offset = self.__firstChunk
+        while offset + CHUNK_HEADER.size <= len(self.__data):
+            magic, firstRound, nRounds, size, crc = CHUNK_HEADER.unpack_from(self.__data, offset)
+            payload = self.__data[offset + CHUNK_HEADER.size:offset + CHUNK_HEADER.size + size]
+            if magic != CHUNK_MAGIC or firstRound != self.__nRounds or len(payload) != size or \
+                    zlib.crc32(payload) != crc:
+                break
+            self.__chunks.append((offset, firstRound, nRounds))
+            self.__nRounds += nRounds
+            offset += CHUNK_HEADER.size + size
+        print(f"The replay was not closed. Recovered {self.__nRounds} rounds")
+        if self.__nRounds == 0:
+            raise ValueError("The replay has no complete chunks")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.__columns = {}
+        self.__data.close()
+
+    def getPath(self):
+        return self.__path
+
+    def getLayout(self):
+        return self.__layout
+
+    def getRoundCount(self):
+        return self.__nRounds
+
+    def getAgentNames(self):
+        return [name for name, _ in self.__roles]
+
+    def __makeState(self):
+        """
+        Make the agents and the Gamestate every round is decoded into
+        """
+        width, height = self.__layout.getWidth(), self.__layout.getHeight()
+        self.__agents = {name: role(startingLocation={"x": 0, "y": 0}, sightRange=3, width=width, height=height,
+                                    name=name, rng=random.Random(0))
+                         for name, role in self.__roles}
+        self.__state = Gamestate.fromLayout(self.__layout, self.__agents)
+
+    def getState(self, round: int) -> Gamestate:
+        """
+        Get the Gamestate at the end of a round
+        The returned Gamestate is reused for following calls and must not be modified
+        """
+        if not 0 <= round < self.__nRounds:
+            raise IndexError(f"The replay has no round {round}")
+        chunk = bisect.bisect_right(self.__firstRounds, round) - 1
+        xs, ys, directions, statuses, inventories, cellOrders, itemStarts, itemCells, itemKinds = \
+            self.__getColumns(chunk)
+        row = round - self.__firstRounds[chunk]
+        if self.__state == None:
+            self.__makeState()
+
+        nAgents = len(self.__agents)
+        inPlay = {}
+        agentLists = {}
+        escapees = []
+        victors = []
+        for a, (name, agent) in enumerate(self.__agents.items()):
+            i = row * nAgents + a
+            agent.setLocation({"x": xs[i], "y": ys[i]})
+            agent.setDirection(DIRECTIONS[directions[i]])
+            agent.setInventory(self.__decodeInventory(inventories[i]))
+            agent.setAlive(statuses[i] & ALIVE != 0)
+            if statuses[i] & IN_PLAY:
+                inPlay[name] = agent
+                agentLists.setdefault(self.__layout.getIndex(xs[i], ys[i]), []).append(
+                    (NO_CELL if cellOrders == None else cellOrders[i], a, agent))
+            if statuses[i] & VICTOR:
+                victors.append(agent)
+            if statuses[i] >> 4:
+                escapees.append((statuses[i] >> 4, agent))
+
+        # put the agents of every cell back in the order they entered it. By column before version 2
+        agentLists = {index: [agent for _, _, agent in sorted(agentList, key=lambda entry: entry[:2])]
+                      for index, agentList in agentLists.items()}
+
+        itemLists = {}
+        for i in range(itemStarts[row], itemStarts[row + 1]):
+            itemLists.setdefault(itemCells[i], []).append(ITEMS[itemKinds[i]])
+
+        self.__state.setSnapshot(inPlay, agentLists, itemLists,
+                                 [agent for _, agent in sorted(escapees, key=lambda e: e[0])], victors)
+        return self.__state
+
+    def __getColumns(self, chunk: int):
+        columns = self.__columns.pop(chunk, None)
+        if columns == None:
+            columns = self.__decodeChunk(chunk)
+            if len(self.__columns) >= self.MAX_CHUNKS:
+                del self.__columns[next(iter(self.__columns))]
+        self.__columns[chunk] = columns
+        return columns
+
+    def __decodeChunk(self, chunk: int):
+        offset, firstRound, nRounds = self.__chunks[chunk]
+        magic, _, _, size, crc = CHUNK_HEADER.unpack_from(self.__data, offset)
+        payload = self.__data[offset + CHUNK_HEADER.size:offset + CHUNK_HEADER.size + size]
+        if magic != CHUNK_MAGIC or zlib.crc32(payload) != crc:
+            raise ValueError(f"Chunk {chunk} of the replay is corrupt")
+        payload = _decompress(self.__codec, payload)
+
+        nValues = nRounds * len(self.__roles)
+        nItems, = struct.unpack_from("<I", payload, 0)
+        offset = 4
+        xs = _fromLittleEndian('I', payload[offset:offset + 4 * nValues])
+        offset += 4 * nValues
+        ys = _fromLittleEndian('I', payload[offset:offset + 4 * nValues])
+        offset += 4 * nValues
+        directions = payload[offset:offset + nValues]
+        offset += nValues
+        statuses = payload[offset:offset + nValues]
+        offset += nValues
+        if self.__version >= 2:
+            inventories = _fromLittleEndian('H', payload[offset:offset + 2 * nValues])
+            offset += 2 * nValues
+            cellOrders = payload[offset:offset + nValues]
+            offset += nValues
+        else:
+            inventories = payload[offset:offset + nValues]
+            offset += nValues
+            cellOrders = None
+        itemCounts = _fromLittleEndian('I', payload[offset:offset + 4 * nRounds])
+        offset += 4 * nRounds
+        itemCells = _fromLittleEndian('I', payload[offset:offset + 4 * nItems])
+        offset += 4 * nItems
+        itemKinds = payload[offset:offset + nItems]
+
+        # where the items of every round start in the item columns
+        itemStarts = array('I', [0])
+        for count in itemCounts:
+            itemStarts.append(itemStarts[-1] + count)
+        return xs, ys, directions, statuses, inventories, cellOrders, itemStarts, itemCells, itemKinds
+
+    def __decodeInventory(self, inventory: int):
+        if self.__version < 2:
+            return [item for bit, item in enumerate(ITEMS) if inventory & (1 << bit)]
+        items = []
+        while inventory:
+            items.append(ITEMS[(inventory & ((1 << INVENTORY_BITS) - 1)) - 1])
+            inventory >>= INVENTORY_BITS
+        return items
@@ -1,3 +1,4 @@
+import hashlib
 import random
 
 
@@ -15,15 +16,31 @@ LABYRINTH_SEED_IDXS = {
     'soldier': 1,
 }
 
+SEED_MASK = (1 << 64) - 1
 
-def labyrinthSeed(type):
-    seedIdx = LABYRINTH_SEED_IDXS[type]
-    seedIdx = seedIdx % len(LABYRINTH_SEEDS)
-    # print(f"Using seed {type}: {seedIdx} : {LABYRINTH_SEEDS[seedIdx]}")
-    random.seed(LABYRINTH_SEEDS[seedIdx])
+
+def labyrinthDeriveSeed(masterSeed, *keys):
+    """
+    Derive an independent 64 bit seed from a master seed and a path of keys
+    The same master seed and keys always give the same seed, whatever else has been derived before
+    :param masterSeed:  a 64 bit seed
+    :param keys:        names or numbers identifying what the seed is for, ie. ('agent', 'monster')
+    :return:            the derived 64 bit seed
+    """
+    material = repr((masterSeed & SEED_MASK,) + keys).encode()
+    return int.from_bytes(hashlib.blake2b(material, digest_size=8).digest(), 'little')
 
 
-def labyrinthSetSeedIdxs(seedIdxs):
-    global LABYRINTH_SEED_IDXS
-    # print(f"Setting seed idxs {seedIdxs}")
-    LABYRINTH_SEED_IDXS = seedIdxs
+def labyrinthRng(type, seedIdxs=LABYRINTH_SEED_IDXS, masterSeed=None):
+    """
+    Make the random number generator owned by one part of the simulation
+    :param type:        what the generator is for. 'layout' or the name of an agent
+    :param seedIdxs:    indexes into LABYRINTH_SEEDS for each type. Used when there is no master seed
+    :param masterSeed:  the 64 bit master seed of the simulation, or None
+    :return:            a random.Random that nothing else draws from
+    """
+    if masterSeed != None:
+        return random.Random(labyrinthDeriveSeed(masterSeed, type))
+    seedIdx = seedIdxs[type] % len(LABYRINTH_SEEDS)
+    # print(f"Using seed {type}: {seedIdx} : {LABYRINTH_SEEDS[seedIdx]}")
+    return random.Random(LABYRINTH_SEEDS[seedIdx])
@@ -1,13 +1,17 @@
 import copy
+import os
 import pickle
+import threading
 import time
 
-from rng import labyrinthSeed, labyrinthSetSeedIdxs, LABYRINTH_SEED_IDXS
+from rng import LABYRINTH_SEED_IDXS
 from gameState import Gamestate
-from civilian import Civilian
-from soldier import Soldier
-from scientist import Scientist
+from maze import makeMazeGenerator
+from item import Item
+from replay import isReplay, ReplayReader, ReplayWriter
+from runEvent import RunEvent
 from monster import Monster
+from profiler import Profiler
 
 
 class SimParams:
@@ -15,10 +19,22 @@ class SimParams:
     This allows us to configure the simulation
     """
 
-    def __init__(self, width: int = 10, height: int = 10, seedIdxs=LABYRINTH_SEED_IDXS):
+    def __init__(self, width: int = 10, height: int = 10, seedIdxs=LABYRINTH_SEED_IDXS, seed: int = None,
+                 maze: str = "legacy", loopChance: float = 0.0, roundLimit: int = 200, recordPath: str = None):
         self.__width = width
         self.__height = height
+        # name of the MazeGenerator that builds the layout, see MAZE_GENERATORS
+        self.__maze = maze
+        # share of the inner walls the MazeGenerator knocks down after carving a perfect maze
+        self.__loopChance = loopChance
+        # Indexes into LABYRINTH_SEEDS for the layout and each agent. Only used without a seed
         self.__seedIdxs = seedIdxs
+        # 64 bit master seed that the layout and every agent derive their own random streams from
+        self.__seed = seed
+        # the most rounds a run lasts, including its starting round
+        self.__roundLimit = roundLimit
+        # replay file the run is streamed to as it is simulated. Kept in memory if None
+        self.__recordPath = recordPath
 
     def getWidth(self):
         return self.__width
@@ -29,40 +45,123 @@ class SimParams:
     def getSeedIdxs(self):
         return self.__seedIdxs
 
+    def getSeed(self):
+        return self.__seed
+
+    def getMaze(self):
+        return self.__maze
+
+    def getLoopChance(self):
+        return self.__loopChance
+
+    def getRoundLimit(self):
+        return self.__roundLimit
+
+    def getRecordPath(self):
+        return self.__recordPath
+
 
 class Run:
-    states = []
+    """
+    A simulated (or loaded) sequence of rounds.
+    Only one live Gamestate is simulated. Every round records a list of RunEvents, and a copy
+    of the Gamestate is kept as a keyframe every keyframeInterval rounds. The Gamestate of any
+    round is rebuilt by replaying at most keyframeInterval - 1 rounds of events onto a copy of
+    the keyframe before it. Copies leave out the Cell views and other caches of the Gamestate and
+    its agents, so seeking costs about one copy whatever the keyframeInterval.
+    Runs loaded from a replay file read the Gamestate of every round from the file instead.
+    So do runs recorded to a replay file, which are written round by round while they are simulated
+    and never hold more than a chunk of rounds in memory.
+    Runs simulated in the background return straight away, and their rounds can be viewed as soon as
+    they are simulated. getRoundCount grows until the simulation is done.
+    Runs given a Profiler time every phase of the simulation into it. Nothing is timed without one.
+    """
     current_state: int = 0
     HUMAN_COUNT = 3
-
-    def __init__(self, load_path: str = "", simParams: SimParams = SimParams()):
+    DEFAULT_KEYFRAME_INTERVAL = 50
+
+    def __init__(self, load_path: str = "", simParams: SimParams = SimParams(),
+                 keyframeInterval: int = DEFAULT_KEYFRAME_INTERVAL, background: bool = False,
+                 profiler: Profiler = None):
+        """
+        :param background:  simulate the run on a thread of its own instead of before returning
+        :param profiler:    the Profiler to time the phases of the simulation into. Not timed if None
+        """
+        self.__keyframeInterval = max(1, keyframeInterval)
+        self.__profiler = profiler
+        self.__replayFile = None
+        self.__initialState = None
+        # set once the starting round can be viewed
+        self.__started = threading.Event()
+        self.__simulation = None
+        self.__simulationError = None
         if load_path:
             print(f"Loading run from \"{load_path}\"")
             self.__from_file(load_path)
+            self.__started.set()
+        elif background:
+            if simParams.getRecordPath() != None:
+                raise ValueError("Runs simulated in the background can not be recorded to a file")
+            print(f"Simulating new run in the background")
+            self.__simulation = threading.Thread(target=self.__simulateInBackground, args=(simParams,),
+                                                 daemon=True)
+            self.__simulation.start()
         else:
             print(f"Simulating new run")
             self.__simulateRun(simParams)
         self.current_state = 0
+        self.__replayState = None
+        self.__replayRound = 0
 
     def __simulateRun(self, params: SimParams):
-        # Set the seeds
-
-        labyrinthSetSeedIdxs(params.getSeedIdxs())
-
-        roundLimit = 200
+        roundLimit = params.getRoundLimit()
         terminated = False
-        self.states = [
-            Gamestate(width=params.getWidth(), height=params.getHeight())]
+        # TRICKY: Every phase is only timed behind a check of the profiler, so runs without one do no extra work
+        profiler = self.__profiler
+        if profiler != None:
+            runStart = phaseStart = profiler.now()
+        nextState = Gamestate(width=params.getWidth(), height=params.getHeight(),
+                              seedIdxs=params.getSeedIdxs(), seed=params.getSeed(),
+                              mazeGenerator=makeMazeGenerator(params.getMaze(), params.getLoopChance()))
+        if profiler != None:
+            profiler.add(("simulateRun", "generate"), phaseStart)
+            phaseStart = profiler.now()
+        self.__initialState = copy.deepcopy(nextState)
+        if profiler != None:
+            profiler.add(("simulateRun", "stateCopy"), phaseStart)
+        self.__finalState = nextState
+        self.__log = []
+        self.__keyframes = {0: self.__initialState}
+        self.__started.set()
+        recorder = None
+        if params.getRecordPath() != None:
+            recorder = ReplayWriter(params.getRecordPath(), nextState)
+            recorder.addRound(nextState)
+            self.__keyframes = {}
+        # rounds simulated so far, after the starting round
+        nRounds = 0
 
         while not terminated:
-            nextState = copy.deepcopy(self.states[-1])
+            events = []
+            if profiler != None:
+                roundStart = profiler.now()
 
             for agentName, agent in nextState.getAgents().items():
                 if agent.isAlive():
-
-                    agent.observe(nextState.getCellAt(agent.getLocation()['x'],
-                                                      agent.getLocation()['y']))
-                    action = agent.chooseAction()
+                    direction = agent.getDirection()
+
+                    if profiler != None:
+                        agentType = type(agent).__name__
+                        phaseStart = profiler.now()
+                    percepts = agent.observe(nextState.getCellAt(agent.getLocation()['x'],
+                                                                 agent.getLocation()['y']))
+                    if profiler != None:
+                        profiler.add(("simulateRun", "round", agentType, "observe"), phaseStart)
+                        phaseStart = profiler.now()
+                    action = agent.chooseAction(percepts)
+                    if profiler != None:
+                        profiler.add(("simulateRun", "round", agentType, "chooseAction"), phaseStart)
+                        phaseStart = profiler.now()
 
                     # handle actions all agents can make
                     if action == agent.move:
@@ -74,6 +173,8 @@ class Run:
                         # place agent in new cell
                         nextState.getCellAt(agent.getLocation()['x'],
                                             agent.getLocation()['y']).addAgent(agent)
+                        events.append((RunEvent.move, agentName,
+                                       agent.getLocation()['x'], agent.getLocation()['y']))
                     elif action == agent.pickUp:
                         items = nextState.getCellAt(
                             agent.getLocation()['x'], agent.getLocation()['y']).getItemList()
@@ -82,6 +183,8 @@ class Run:
                             action(item)
                             nextState.getCellAt(agent.getLocation()['x'],
                                                 agent.getLocation()['y']).removeItem(item)
+                            events.append(
+                                (RunEvent.pickUp, agentName, item))
                             # print(f"{agentName} picked up {item}")
 
                     # handle monster actions
@@ -89,15 +192,9 @@ class Run:
                         targets = action()
                         # print(f"Monster killed {targets}")
                         for target in targets:
-                            itemsDropped = target.die()
-                            # remove target from grid
-                            targetCell = nextState.getCellAt(target.getLocation()["x"],
-                                                             target.getLocation()["y"])
-                            nextState.removeAgent(target)
-                            targetCell.removeAgent(target)
-                            # Drop items in cell
-                            for i in itemsDropped:
-                                targetCell.addItem(i)
+                            self.__killAgent(nextState, target)
+                            events.append(
+                                (RunEvent.kill, agentName, target.getName()))
                     elif isinstance(agent, Monster) and action == agent.dashAttack:
                         # move the monster forwards
                         nextState.getCellAt(agent.getLocation()['x'],
@@ -105,23 +202,21 @@ class Run:
                         targets = action()
                         nextState.getCellAt(agent.getLocation()['x'],
                                             agent.getLocation()['y']).addAgent(agent)
+                        events.append((RunEvent.move, agentName,
+                                       agent.getLocation()['x'], agent.getLocation()['y']))
                         # attack the target
                         for target in targets:
-                            itemsDropped = target.die()
-                            # remove target from grid
-                            targetCell = nextState.getCellAt(target.getLocation()["x"],
-                                                             target.getLocation()["y"])
-                            nextState.removeAgent(target)
-                            targetCell.removeAgent(target)
-                            # Drop items in cell
-                            for i in itemsDropped:
-                                targetCell.addItem(i)
+                            self.__killAgent(nextState, target)
+                            events.append(
+                                (RunEvent.kill, agentName, target.getName()))
                     elif isinstance(agent, Monster) and action == agent.run:
                         nextState.getCellAt(agent.getLocation()['x'],
                                             agent.getLocation()['y']).removeAgent(agent)
                         action()
                         nextState.getCellAt(agent.getLocation()['x'],
                                             agent.getLocation()['y']).addAgent(agent)
+                        events.append((RunEvent.move, agentName,
+                                       agent.getLocation()['x'], agent.getLocation()['y']))
 
                     # handle human actions
                     elif not isinstance(agent, Monster) and action == agent.shoot:
@@ -165,30 +260,35 @@ class Run:
                         # This is a trick to make sure we dont shoot through walls, and also ourselves!
                         bulletPath = [p for p in bulletPath if p != agentPos]
 
+                        shotTargets = []
                         for p in bulletPath:
                             targets = nextState.getCellAt(
                                 p['x'], p['y']).getAgentList()
                             if len(targets):
                                 # Just kill the first thing
                                 target = targets[0]
-                                targetCell = nextState.getCellAt(target.getLocation()["x"],
-                                                                 target.getLocation()["y"])
-                                nextState.removeAgent(target)
-                                targetCell.removeAgent(target)
-                                # TODO: For now, notify all agents that the monster is killed.
-                                # Maybe come up with some way for agents to communicate? See a body?
-                                for _, a in nextState.getAgents().items():
-                                    a.learnOfMonsterDeath()
+                                self.__shootAgent(nextState, target)
+                                shotTargets.append(target.getName())
                                 # print(f"{type(agent).__name__} killed {type(target).__name__}")
+                        if len(shotTargets):
+                            for targetName in shotTargets:
+                                events.append(
+                                    (RunEvent.shoot, agentName, targetName))
+                        else:
+                            events.append((RunEvent.shoot, agentName, None))
 
                     elif not isinstance(agent, Monster) and action == agent.win:
-                        nextState.getCellAt(agent.getLocation()['x'],
-                                            agent.getLocation()['y']).removeAgent(agent)
-                        nextState.removeAgent(agent)
-                        nextState.addEscapee(agent)
+                        self.__escapeAgent(nextState, agent)
+                        events.append((RunEvent.escape, agentName))
                     else:
                         action()
 
+                    if agent.getDirection() != direction:
+                        events.append(
+                            (RunEvent.turn, agentName, agent.getDirection()))
+                    if profiler != None:
+                        profiler.add(("simulateRun", "round", "resolve", action.__name__), phaseStart)
+
             hasMonster = len([a for a in nextState.getAgents().values()
                              if isinstance(a, Monster)]) > 0
             hasHumans = len([a for a in nextState.getAgents().values()
@@ -204,6 +304,7 @@ class Run:
                 # print("Monster killed all humans!")
                 m = list(nextState.getAgents().values())[0]
                 nextState.addVictor(m)
+                events.append((RunEvent.victory, m.getName()))
                 terminated = True
             if not hasHumans and len(nextState.getVictors()) > 0:
                 # print("Some humans escaped!")
@@ -217,56 +318,278 @@ class Run:
                 humans = list(nextState.getAgents().values())
                 for h in humans:
                     nextState.addVictor(h)
+                    events.append((RunEvent.victory, h.getName()))
                 # print("Humans killed the monster!")
                 terminated = True
-            if len(self.states) + 1 >= roundLimit:
+            if nRounds + 2 >= roundLimit:
                 # print(f"No winner after reaching round limit")
                 terminated = True
 
-            self.states.append(nextState)
+            if profiler != None:
+                profiler.add(("simulateRun", "round"), roundStart)
+
+            nRounds += 1
+            if recorder != None:
+                if profiler != None:
+                    phaseStart = profiler.now()
+                recorder.addRound(nextState)
+                if profiler != None:
+                    profiler.add(("simulateRun", "record"), phaseStart)
+                continue
+            # TRICKY: A round can be viewed as soon as it is in the log, which may be from another thread,
+            # so its keyframe has to be there first
+            if nRounds % self.__keyframeInterval == 0:
+                if profiler != None:
+                    phaseStart = profiler.now()
+                self.__keyframes[nRounds] = copy.deepcopy(nextState)
+                if profiler != None:
+                    profiler.add(("simulateRun", "stateCopy"), phaseStart)
+            self.__log.append(events)
+
+        if recorder != None:
+            if profiler != None:
+                phaseStart = profiler.now()
+            recorder.close()
+            self.__replayFile = ReplayReader(params.getRecordPath())
+            if profiler != None:
+                profiler.add(("simulateRun", "record"), phaseStart)
+        if profiler != None:
+            profiler.add(("simulateRun",), runStart)
+
+    def __simulateInBackground(self, params: SimParams):
+        try:
+            self.__simulateRun(params)
+        except Exception as e:
+            self.__simulationError = e
+            raise
+        finally:
+            # never leave the viewer waiting for a starting round that is not coming
+            self.__started.set()
+
+    def __waitUntilStarted(self):
+        self.__started.wait()
+        if self.__initialState == None:
+            raise RuntimeError("The run could not be simulated") from self.__simulationError
+
+    def isSimulating(self):
+        """
+        :return:  True while rounds are still being simulated in the background
+        """
+        return self.__simulation != None and self.__simulation.is_alive()
+
+    def waitForSimulation(self):
+        """
+        Wait until every round is simulated. Returns straight away unless the run is simulated in the background
+        """
+        if self.__simulation != None:
+            self.__simulation.join()
+        if self.__simulationError != None:
+            raise RuntimeError("The run could not be simulated") from self.__simulationError
+
+    """
+    World updates
+    These are shared by the simulation and the replay of logged events
+    """
+
+    @staticmethod
+    def __killAgent(state: Gamestate, target):
+        itemsDropped = target.die()
+        # remove target from grid
+        targetCell = state.getCellAt(target.getLocation()["x"],
+                                     target.getLocation()["y"])
+        state.removeAgent(target)
+        targetCell.removeAgent(target)
+        # Drop items in cell
+        for i in itemsDropped:
+            targetCell.addItem(i)
+
+    @staticmethod
+    def __shootAgent(state: Gamestate, target):
+        targetCell = state.getCellAt(target.getLocation()["x"],
+                                     target.getLocation()["y"])
+        state.removeAgent(target)
+        targetCell.removeAgent(target)
+        # TODO: For now, notify all agents that the monster is killed.
+        # Maybe come up with some way for agents to communicate? See a body?
+        for _, a in state.getAgents().items():
+            a.learnOfMonsterDeath()
+
+    @staticmethod
+    def __escapeAgent(state: Gamestate, agent):
+        state.getCellAt(agent.getLocation()['x'],
+                        agent.getLocation()['y']).removeAgent(agent)
+        state.removeAgent(agent)
+        state.addEscapee(agent)
+
+    def __applyEvents(self, state: Gamestate, agents, events):
+        """
+        Replay the events of one round onto a Gamestate
+        :param state:   the Gamestate at the start of the round. It is modified in place
+        :param agents:  every agent of the state by name, including the ones that were removed
+        :param events:  the RunEvents logged for the round
+        """
+        for event in events:
+            agent = agents[event[1]]
+            if event[0] == RunEvent.move:
+                state.getCellAt(agent.getLocation()['x'],
+                                agent.getLocation()['y']).removeAgent(agent)
+                agent.setLocation({'x': event[2], 'y': event[3]})
+                state.getCellAt(event[2], event[3]).addAgent(agent)
+            elif event[0] == RunEvent.turn:
+                agent.setDirection(event[2])
+            elif event[0] == RunEvent.pickUp:
+                agent.pickUp(event[2])
+                state.getCellAt(agent.getLocation()['x'],
+                                agent.getLocation()['y']).removeItem(event[2])
+            elif event[0] == RunEvent.kill:
+                self.__killAgent(state, agents[event[2]])
+            elif event[0] == RunEvent.shoot:
+                if Item.gun in agent.getInventory():
+                    agent.removeItem(Item.gun)
+                if event[2] != None:
+                    self.__shootAgent(state, agents[event[2]])
+            elif event[0] == RunEvent.escape:
+                self.__escapeAgent(state, agent)
+            elif event[0] == RunEvent.victory:
+                state.addVictor(agent)
+
+    """
+    Loading and saving
+    """
 
     def __from_file(self, file_path: str):
+        if isReplay(file_path):
+            self.__replayFile = ReplayReader(file_path)
+            self.__log = []
+            self.__keyframes = {}
+            self.__initialState = copy.deepcopy(self.__replayFile.getState(0))
+            self.__finalState = copy.deepcopy(
+                self.__replayFile.getState(self.__replayFile.getRoundCount() - 1))
+            return
+
+        # Runs saved before replay files were pickled
         with open(file_path, "rb") as f:
-            self.states = pickle.load(f)
-
-    def toFile(self):
-        file_path = time.strftime("labyrinth_run_%m%d%Y_%H%M%S")
-        print(f"Writing run to file \"{file_path}.pkl\"")
-        with open(f"{file_path}.pkl", "wb") as f:
-            pickle.dump(self.states, f)
+            saved = pickle.load(f)
+        if isinstance(saved, list):
+            # Runs saved before the event log was introduced are a list of every Gamestate.
+            # Every one of those rounds becomes a keyframe
+            self.__keyframeInterval = 1
+            self.__initialState = saved[0]
+            self.__finalState = saved[-1]
+            self.__log = [[] for _ in range(len(saved) - 1)]
+            self.__keyframes = {i: s for i, s in enumerate(saved)}
+        else:
+            self.__keyframeInterval = saved["keyframeInterval"]
+            self.__initialState = saved["initialState"]
+            self.__finalState = saved["finalState"]
+            self.__log = saved["log"]
+            self.__keyframes = saved["keyframes"]
+
+    def toFile(self, file_path: str = None, codec: str = "zlib"):
+        """
+        Save the run as a replay file
+        :param file_path:  the file to write. Named after the current time by default
+        :param codec:      how the replay is compressed. One of replay.CODECS
+        """
+        self.waitForSimulation()
+        if file_path == None:
+            file_path = time.strftime("labyrinth_run_%m%d%Y_%H%M%S.replay")
+        # TRICKY: The replay a run was loaded from is memory mapped, and truncating it would pull the rounds out from under it
+        if self.__replayFile != None and os.path.exists(file_path) and \
+                os.path.samefile(file_path, self.__replayFile.getPath()):
+            raise ValueError(f"Can not overwrite \"{file_path}\", which the run is being read from")
+        print(f"Writing run to file \"{file_path}\"")
+        with ReplayWriter(file_path, self.__initialState, codec) as writer:
+            for round in range(self.getRoundCount()):
+                writer.addRound(self.getState(round))
 
     def stepForward(self):
-        if self.current_state < len(self.states) - 1:
-            self.current_state += 1
-            print(
-                f"Viewing state ({self.current_state + 1}/{len(self.states)})")
+        if self.current_state < self.getRoundCount() - 1:
+            self.seek(self.current_state + 1)
             # TODO: Perhaps add some kind of action log here? Would make debugging/explaining easier
 
     def stepBack(self):
         if self.current_state > 0:
-            self.current_state -= 1
-            print(
-                f"Viewing state ({self.current_state + 1}/{len(self.states)})")
+            self.seek(self.current_state - 1)
 
     def restart(self):
-        self.current_state = 0
-        print(f"Viewing state ({self.current_state + 1}/{len(self.states)})")
-
-    def getState(self) -> Gamestate:
-        return self.states[self.current_state]
+        self.seek(0)
+
+    def seek(self, round: int) -> Gamestate:
+        """
+        Jump to any round of the run
+        :param round:  the round to view. Clamped to the rounds of the run
+        :return:       the Gamestate of that round
+        """
+        self.current_state = min(max(round, 0), self.getRoundCount() - 1)
+        print(f"Viewing state ({self.current_state + 1}/{self.getRoundCount()})")
+        return self.getState()
+
+    def getRoundCount(self):
+        self.__waitUntilStarted()
+        if self.__replayFile != None:
+            return self.__replayFile.getRoundCount()
+        return len(self.__log) + 1
+
+    def getKeyframeInterval(self):
+        return self.__keyframeInterval
+
+    def getProfiler(self):
+        return self.__profiler
+
+    def getState(self, round: int = None) -> Gamestate:
+        """
+        Get the Gamestate at the end of a round, rebuilt from the keyframe before it and the event log
+        The returned Gamestate is reused for following calls and must not be modified
+        :param round:  the round to get. Defaults to the round currently being viewed
+        :return:       the Gamestate of that round
+        """
+        if round == None:
+            round = self.current_state
+        self.__waitUntilStarted()
+        if self.__replayFile != None:
+            return self.__replayFile.getState(round)
+        keyframeRound = round - round % self.__keyframeInterval
+
+        # Continue from the round already rebuilt when it lies between the keyframe and the round
+        if self.__replayState == None or not keyframeRound <= self.__replayRound <= round:
+            self.__replayState = copy.deepcopy(self.__keyframes[keyframeRound])
+            self.__replayRound = keyframeRound
+        if self.__replayRound < round:
+            agents = self.__replayState.getAllAgents()
+            while self.__replayRound < round:
+                self.__applyEvents(self.__replayState, agents,
+                                   self.__log[self.__replayRound])
+                self.__replayRound += 1
+        return self.__replayState
+
+    def getLog(self):
+        return self.__log
+
+    def getLayout(self):
+        self.__waitUntilStarted()
+        return self.__initialState.getLayout()
+
+    def getStartingLocations(self):
+        """
+        :return:  dict of agent name: {"x": x, "y": y} of where the agent started
+        """
+        self.__waitUntilStarted()
+        return {name: agent.getLocation() for name, agent in self.__initialState.getAgents().items()}
 
     def getStats(self):
-        terminalState = self.states[-1]
+        self.waitForSimulation()
+        terminalState = self.__finalState
 
         victors = [a.getName() for a in terminalState.getVictors()]
         escaped = [a.getName() for a in terminalState.getEscapees()]
 
-        allAgents = [a for a in self.states[0].getAgents()]
+        allAgents = [a for a in self.__initialState.getAgents()]
         remaningAgents = [a for a in terminalState.getAgents()]
 
         killed = [
             a for a in allAgents if a not in victors and a not in escaped and a not in remaningAgents]
 
-        nRounds = len(self.states)
+        nRounds = self.getRoundCount()
 
         return nRounds, victors, escaped, killed
@@ -0,0 +1,23 @@
+from enum import Enum
+
+
+class RunEvent(Enum):
+    """
+    This class represents the things that can change the true state of the game during a round.
+    Runs record these instead of copying the whole Gamestate every round.
+    Each logged event is a tuple of the RunEvent followed by its arguments:
+        (move, agentName, x, y)
+        (turn, agentName, direction)
+        (pickUp, agentName, item)
+        (kill, agentName, targetName)
+        (shoot, agentName, targetName)  # targetName is None on a miss
+        (escape, agentName)
+        (victory, agentName)
+    """
+    move = 1
+    turn = 2
+    pickUp = 3
+    kill = 4
+    shoot = 5
+    escape = 6
+    victory = 7
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import argparse
+import multiprocessing
+import os
+import random
+
+from layoutAnalysis import analyzeLayout
+from maze import MAZE_GENERATORS
+from profiler import Profiler
+from run import Run, SimParams
+from rng import labyrinthDeriveSeed
+
+
+class RunResult:
+    """
+    The outcome of a simulated Run, without any of its Gamestates
+    """
+
+    def __init__(self, nRounds, victors, escaped, killed, exitDistances, profiler=None):
+        self.__nRounds = nRounds
+        self.__victors = victors
+        self.__escaped = escaped
+        self.__killed = killed
+        # dict of agent name: moves from where the agent started to the nearest exit
+        self.__exitDistances = exitDistances
+        # the Profiler of the simulation, if it was profiled
+        self.__profiler = profiler
+
+    def getNRounds(self):
+        return self.__nRounds
+
+    def getVictors(self):
+        return self.__victors
+
+    def getEscaped(self):
+        return self.__escaped
+
+    def getKilled(self):
+        return self.__killed
+
+    def getExitDistances(self):
+        return self.__exitDistances
+
+    def getProfiler(self):
+        return self.__profiler
+
+
+class SimArgs:
+    def __init__(self):
+        parser = argparse.ArgumentParser(
+            prog="sim", description='Run Labyrinth simulations and report stats without a display')
+        parser.add_argument('-n', '--simulations', type=int, default=20,
+                            help='The number of simulations to run')
+        parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='The number of worker processes')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='The 64 bit seed that every simulation derives its seed from. Random by default')
+        parser.add_argument('--maze', type=str, default="legacy", choices=MAZE_GENERATORS.keys(),
+                            help='How every simulation builds its layout')
+        parser.add_argument('--width', type=int, default=10,
+                            help='The width of every simulation. Generated mazes only')
+        parser.add_argument('--height', type=int, default=10,
+                            help='The height of every simulation. Generated mazes only')
+        parser.add_argument('--loops', type=float, default=0.0,
+                            help='The share of inner walls a generated maze knocks down to make loops')
+        parser.add_argument('--rounds', type=int, default=200,
+                            help='The most rounds a simulation lasts')
+        parser.add_argument('--record', type=str, default=None,
+                            help='A directory to stream every simulation to as a replay file while it runs')
+        parser.add_argument('--profile', type=str, nargs='?', const="profile", default=None,
+                            help='Time every phase of the simulations and write PROFILE.json and the collapsed '
+                                 'stacks for flame graphs to PROFILE.folded')
+        args = vars(parser.parse_args())
+        if args['simulations'] < 1:
+            parser.error(f"argument -n/--simulations: must be at least 1, not {args['simulations']}")
+        if args['workers'] < 1:
+            parser.error(f"argument -w/--workers: must be at least 1, not {args['workers']}")
+        self.nSimulations = args['simulations']
+        self.nWorkers = args['workers']
+        self.seed = args['seed']
+        self.maze = args['maze']
+        self.width = args['width']
+        self.height = args['height']
+        self.loopChance = args['loops']
+        self.roundLimit = args['rounds']
+        self.recordDir = args['record']
+        self.profilePath = args['profile']
+
+
+def simulate(simParams: SimParams, profile: bool = False) -> RunResult:
+    """
+    Simulate a single Run
+    :param simParams:  the configuration of the simulation
+    :param profile:    time the phases of the simulation into a Profiler
+    :return:           the outcome of the Run
+    """
+    run = Run(simParams=simParams, profiler=Profiler() if profile else None)
+    analysis = analyzeLayout(run.getLayout())
+    exitDistances = {name: analysis.getExitDistance(location["x"], location["y"])
+                     for name, location in run.getStartingLocations().items()}
+    return RunResult(*run.getStats(), exitDistances, run.getProfiler())
+
+
+def _simulateIndexed(indexedParams):
+    index, simParams, profile = indexedParams
+    return index, simulate(simParams, profile)
+
+
+def simulateBatch(paramsList, nWorkers: int = 1, profile: bool = False):
+    """
+    Simulate many Runs, spread across a pool of worker processes
+    Results are yielded as soon as they finish, so they are not in the order of paramsList
+    :param paramsList:  the SimParams of every simulation
+    :param nWorkers:    the number of worker processes. 1 simulates in this process
+    :param profile:     give every RunResult the Profiler of its simulation
+    :return:            a generator of (index in paramsList, RunResult)
+    """
+    if nWorkers < 1:
+        raise ValueError(f"The number of workers must be at least 1, not {nWorkers}")
+    indexedParams = [(index, simParams, profile) for index, simParams in enumerate(paramsList)]
+    if nWorkers == 1:
+        for indexed in indexedParams:
+            yield _simulateIndexed(indexed)
+        return
+
+    chunkSize = max(1, len(indexedParams) // (nWorkers * 16))
+    with multiprocessing.Pool(nWorkers) as pool:
+        for indexedResult in pool.imap_unordered(_simulateIndexed, indexedParams, chunkSize):
+            yield indexedResult
+
+
+def makeSimParams(nSimulations: int, seed: int = None, width: int = 10, height: int = 10,
+                  maze: str = "legacy", loopChance: float = 0.0, roundLimit: int = 200, recordDir: str = None):
+    """
+    Pick the seeds of every simulation of a batch up front, so the batch is reproducible
+    :param nSimulations:  the number of simulations
+    :param seed:          the 64 bit seed of the batch. Random if None
+    :param width:         the width of every simulation
+    :param height:        the height of every simulation
+    :param maze:          the name of the MazeGenerator of every simulation
+    :param loopChance:    the share of inner walls the MazeGenerator knocks down
+    :param roundLimit:    the most rounds every simulation lasts
+    :param recordDir:     a directory to record every simulation to as run_<index>.replay. Not recorded if None
+    :return:              the list of SimParams
+    """
+    if seed == None:
+        seed = random.SystemRandom().getrandbits(64)
+        print(f"Batch seed: {seed}")
+    if recordDir != None:
+        os.makedirs(recordDir, exist_ok=True)
+    # Every simulation gets its own master seed, derived from the batch seed and its index
+    return [SimParams(width=width, height=height, seed=labyrinthDeriveSeed(seed, 'simulation', i),
+                      maze=maze, loopChance=loopChance, roundLimit=roundLimit,
+                      recordPath=None if recordDir == None else os.path.join(recordDir, f"run_{i}.replay"))
+            for i in range(nSimulations)]
+
+
+def runSimulations(nSimulations: int = 20, nWorkers: int = 1, seed: int = None, width: int = 10,
+                   height: int = 10, maze: str = "legacy", loopChance: float = 0.0, roundLimit: int = 200,
+                   recordDir: str = None, profilePath: str = None):
+    paramsList = makeSimParams(nSimulations, seed, width, height, maze, loopChance, roundLimit, recordDir)
+    results = [None] * nSimulations
+    nFinished = 0
+    for index, result in simulateBatch(paramsList, nWorkers, profilePath != None):
+        # TRICKY: Store results by index so the report is the same whatever order they finish in
+        results[index] = result
+        nFinished += 1
+        if nFinished % max(1, nSimulations // 10) == 0:
+            print(f"Finished {nFinished}/{nSimulations} simulations")
+    reportStats(results)
+    if profilePath != None:
+        writeProfile(results, profilePath)
+
+
+def writeProfile(results, profilePath: str):
+    """
+    Add up the Profilers of every simulation and write them as <profilePath>.json and <profilePath>.folded
+    :param results:  the RunResults of every simulation, profiled
+    """
+    profiler = Profiler()
+    for result in results:
+        profiler.merge(result.getProfiler())
+    profiler.toJson(profilePath + ".json")
+    profiler.toCollapsed(profilePath + ".folded")
+    print(f"Wrote profile to {profilePath}.json and {profilePath}.folded")
+
+
+def averageExitDistance(results, agentName: str):
+    """
+    :param results:    the RunResults of every simulation
+    :param agentName:  the name of the agent
+    :return:           (the mean moves from the agent's start to the nearest exit, over the runs an exit could be
+                       reached in, or None if there were none, the number of runs no exit could be reached in)
+    """
+    # TRICKY: The layout analysis gives -1 for a start no exit can be reached from, which is not a distance
+    distances = [r.getExitDistances()[agentName] for r in results if r.getExitDistances()[agentName] >= 0]
+    nUnreachable = len(results) - len(distances)
+    return (sum(distances) / len(distances) if distances else None), nUnreachable
+
+
+def reportStats(results):
+    """
+    Aggregate and report overall stats
+    :param results:  the RunResults of every simulation
+    """
+    nSimulations = len(results)
+    averageNRounds = sum([r.getNRounds() for r in results]) // nSimulations
+    humanWinRate = sum([1 if 'monster' not in r.getVictors()
+                        and len(r.getVictors()) else 0 for r in results]) / nSimulations
+    monsterWinRate = sum(
+        [1 if 'monster' in r.getVictors() and len(r.getVictors()) else 0 for r in results]) / nSimulations
+    stalemateRate = sum(
+        [1 if len(r.getVictors()) == 0 else 0 for r in results]) / nSimulations
+    civilianEscapeRate = sum(
+        [1 if 'civilian' in r.getEscaped() else 0 for r in results]) / nSimulations
+    civilianDeathRate = sum(
+        [1 if 'civilian' in r.getKilled() else 0 for r in results]) / nSimulations
+    scientistEscapeRate = sum(
+        [1 if 'scientist' in r.getEscaped() else 0 for r in results]) / nSimulations
+    scientistDeathRate = sum(
+        [1 if 'scientist' in r.getKilled() else 0 for r in results]) / nSimulations
+    soldierEscapeRate = sum(
+        [1 if 'soldier' in r.getEscaped() else 0 for r in results]) / nSimulations
+    soldierDeathRate = sum(
+        [1 if 'soldier' in r.getKilled() else 0 for r in results]) / nSimulations
+    # how far the humans had to go, from the layout analysis of every run
+    civilianExitDistance, civilianUnreachable = averageExitDistance(results, 'civilian')
+    scientistExitDistance, scientistUnreachable = averageExitDistance(results, 'scientist')
+    soldierExitDistance, soldierUnreachable = averageExitDistance(results, 'soldier')
+
+    print("===Simulation Stats===")
+    print(f"Avg number of rounds: \t{averageNRounds}")
+    print(f"Human win rate: \t{humanWinRate:.2f}")
+    print(f"Monster win rate: \t{monsterWinRate:.2f}")
+    print(f"Stalemate rate: \t{stalemateRate:.2f}")
+    print(f"Civilian escape rate: \t{civilianEscapeRate:.2f}")
+    print(f"Civilian death rate: \t{civilianDeathRate:.2f}")
+    print(f"Scientist escape rate: \t{scientistEscapeRate:.2f}")
+    print(f"Scientist death rate: \t{scientistDeathRate:.2f}")
+    print(f"Soldier escape rate: \t{soldierEscapeRate:.2f}")
+    print(f"Soldier death rate: \t{soldierDeathRate:.2f}")
+    for name, distance, nUnreachable in [("Civilian", civilianExitDistance, civilianUnreachable),
+                                         ("Scientist", scientistExitDistance, scientistUnreachable),
+                                         ("Soldier", soldierExitDistance, soldierUnreachable)]:
+        print(f"{name} exit distance: \t{'n/a' if distance == None else f'{distance:.1f}'}")
+        print(f"{name} exit unreachable: \t{nUnreachable}")
+
+
+def main():
+    args = SimArgs()
+    runSimulations(args.nSimulations, args.nWorkers, args.seed,
+                   args.width, args.height, args.maze, args.loopChance, args.roundLimit, args.recordDir,
+                   args.profilePath)
+
+
+if __name__ == '__main__':
+    main()
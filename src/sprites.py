@@ -0,0 +1,115 @@
+import os
+
+import pygame
+
+from agent import Agent
+from item import Item
+from monster import Monster
+
+# the image of every item, next to this file, and its size as a share of a cell
+ITEM_IMAGES = {
+    Item.keyCard: ("keycard.png", 1 / 2, 1 / 2),
+    Item.gun: ("shotgun.png", 1, 1 / 2),
+    Item.research: ("science.png", 1 / 2, 1 / 2),
+}
+FACINGS = [Monster.UP, Monster.DOWN, Monster.LEFT, Monster.RIGHT]
+
+
+class SpriteAtlas:
+    """
+    Every sprite the Renderer draws, scaled to the size of a cell and packed into one surface.
+    Images are loaded from disk once, and the atlas is only rebuilt when the cell size changes,
+    so drawing a frame never loads or scales anything
+    Agents have no images yet. Each role is drawn once per facing as a colored circle with a
+    triangle pointing the way it faces
+    """
+
+    def __init__(self, agentColors: {type: (int, int, int)}, facingColor: (int, int, int)):
+        """
+        :param agentColors:  the color of every agent class
+        :param facingColor:  the color of the triangle showing which way an agent faces
+        """
+        self.__agentColors = agentColors
+        self.__facingColor = facingColor
+        # item images as loaded, by item
+        self.__images = None
+        self.__cellSize = None
+        self.__atlas = None
+        # subsurfaces of the atlas, by item and by (agent class, facing)
+        self.__sprites = {}
+
+    def setCellSize(self, cellWidth: int, cellHeight: int):
+        """
+        Scale every sprite to a cell size. Does nothing if the sprites already have that size
+        """
+        if self.__cellSize == (cellWidth, cellHeight):
+            return
+        self.__cellSize = (cellWidth, cellHeight)
+        if self.__images == None:
+            self.__images = {item: self.__loadImage(name) for item, (name, _, _) in ITEM_IMAGES.items()}
+
+        # TRICKY: Agent sprites are a pixel bigger than half a cell, as the facing triangle touches
+        # the far edges of the circle and pygame draws polygons inclusive of their corners
+        agentSize = (cellWidth // 2 + 1, cellHeight // 2 + 1)
+        sizes = {item: (max(1, int(cellWidth * w)), max(1, int(cellHeight * h)))
+                 for item, (_, w, h) in ITEM_IMAGES.items()}
+        for agentClass in self.__agentColors:
+            for facing in FACINGS:
+                sizes[(agentClass, facing)] = agentSize
+
+        # pack the sprites in a single row
+        self.__atlas = self.__makeSurface(sum(w for w, _ in sizes.values()), max(h for _, h in sizes.values()))
+        self.__atlas.fill((0, 0, 0, 0))
+        self.__sprites = {}
+        x = 0
+        for key, (w, h) in sizes.items():
+            sprite = self.__atlas.subsurface(pygame.Rect(x, 0, w, h))
+            if key in ITEM_IMAGES:
+                sprite.blit(pygame.transform.scale(self.__images[key], (w, h)), (0, 0))
+            else:
+                self.__drawAgent(sprite, *key)
+            self.__sprites[key] = sprite
+            x += w
+
+    def getItem(self, item: Item):
+        return self.__sprites[item]
+
+    def getAgent(self, agent: Agent):
+        return self.__sprites[(type(agent), agent.getDirection())]
+
+    """
+    Private Methods
+    """
+
+    def __loadImage(self, name: str):
+        image = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), name))
+        # images can only be converted to the display format once there is a display
+        return image.convert_alpha() if pygame.display.get_surface() != None else image
+
+    def __makeSurface(self, width: int, height: int):
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        return surface.convert_alpha() if pygame.display.get_surface() != None else surface
+
+    def __drawAgent(self, sprite, agentClass: type, facing: str):
+        w, h = self.__cellSize[0] // 2, self.__cellSize[1] // 2
+        pygame.draw.ellipse(sprite, self.__agentColors[agentClass], pygame.Rect(0, 0, w, h))
+        pygame.draw.polygon(sprite, self.__facingColor, self.__getFacingTri(facing, w, h))
+
+    def __getFacingTri(self, direction: str, w: int, h: int):
+        tl = (0, 0)
+        tr = (w, 0)
+        br = (w, h)
+        bl = (0, h)
+
+        cu = (w/2, 0)
+        cr = (w, h/2)
+        cd = (w/2, h)
+        cl = (0, h/2)
+
+        if direction == Monster.RIGHT:
+            return [tl, cr, bl]
+        if direction == Monster.UP:
+            return [bl, cu, br]
+        if direction == Monster.LEFT:
+            return [br, cl, tr]
+        return [tl, cd, tr]
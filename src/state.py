@@ -1,8 +1,14 @@
+import heapq
+from array import array
+
+from cell import Cell
+
 
 class State:
     """
     An Agent's way of representing the world.
-    Recreates the grid
+    Recreates the grid as compact arrays indexed by y * width + x. It copies what the agent
+    learns about a cell and never holds on to the Gamestate's cells
     """
 
     def __init__(self, memoryLoss, width, height):
@@ -11,33 +17,61 @@ class State:
         # dimensions of the grid
         self.__width = width
         self.__height = height
-        # grid the Agent constructs while traversing the environment. None value indicates unseen cell
-        self.__grid = []
-        # grid of locations the agent has already traversed
-        self.__visitedCells = []
-        for i in range(width):
-            self.__grid.append([])
-            self.__visitedCells.append([])
-            for j in range(height):
-                self.__grid[i].append(None)
-                self.__visitedCells[i].append(False)
+        # Cell wall and exit bits of every cell the Agent has seen while traversing the environment
+        self.__walls = bytearray(width * height)
+        # tick each cell was last seen on. -1 indicates unseen cell
+        self.__lastSeen = array('i', [-1]) * (width * height)
+        # bitset of locations the agent has already traversed
+        self.__visitedCells = bytearray((width * height + 7) // 8)
+        # number of ticks the agent has observed the world for
+        self.__tick = 0
 
         self.__breadTrails = []
+        # distance field of every recent path plan, by target cell index. See getNextStepToward
+        self.__plans = {}
+        # cells whose walls were learned since the plans were last repaired
+        self.__newWalls = []
+
+    # the most path plans kept at once
+    MAX_PLANS = 4
+
+    def nextTick(self):
+        self.__tick += 1
 
     def remember(self, x, y, cell, beenTo=False):
-        self.__grid[x][y] = cell
+        i = y * self.__width + x
+        bits = cell.getBits()
+        if self.__plans and (bits ^ self.__walls[i]) & Cell.WALLS_BITS:
+            self.__newWalls.append(i)
+        self.__walls[i] = bits
+        self.__lastSeen[i] = self.__tick
         if beenTo:
-            self.__visitedCells[x][y] = True
+            self.__visitedCells[i >> 3] |= 1 << (i & 7)
+
+    def isKnown(self, x, y):
+        return self.__lastSeen[y * self.__width + x] >= 0
 
-    def getCellAt(self, x, y):
-        return self.__grid[x][y]
+    def getLastSeen(self, x, y):
+        """
+        :return:  the tick the cell was last seen on, or -1 if it has never been seen
+        """
+        return self.__lastSeen[y * self.__width + x]
+
+    def getKnownWalls(self, x, y):
+        """
+        :return:  the Cell wall and exit bits of the cell, or None if it has never been seen
+        """
+        i = y * self.__width + x
+        return self.__walls[i] if self.__lastSeen[i] >= 0 else None
 
-    def getCellLocation(self, cell):
-        if cell != None:
-            for x in range(len(self.__grid)):
-                for y in range(len(self.__grid[x])):
-                    if self.__grid[x][y] == cell:
-                        return {"x": x, "y": y}
+    def getKnownLocation(self, location):
+        """
+        Check if the Agent knows about a location
+        :param location:  {"x": x, "y": y} coordinates, or None
+        :return:          the location if the cell there has been seen, None if not
+        """
+        if location != None and self.isKnown(location["x"], location["y"]):
+            return location
         return None
 
     def getBreadTrails(self):
@@ -61,34 +95,34 @@ class State:
 
 
     def isVisited(self, x, y):
-        return self.__visitedCells[x][y]
+        i = y * self.__width + x
+        return self.__visitedCells[i >> 3] & (1 << (i & 7)) != 0
 
-    def cellIsDeadEnd(self, cell):
+    def cellIsDeadEnd(self, x, y):
         """
-        Check if a cell has a way out, or if it is a dead end
-        :param cell:  the cell to check
-        :return:      True if dead end, False if not
+        Check if a known cell has a way out, or if it is a dead end
+        :param x:  the x location of the cell
+        :param y:  the y location of the cell
+        :return:   True if dead end, False if not
         """
-        wallCount = 0
-        wallCount += cell.isWallUp()
-        wallCount += cell.isWallDown()
-        wallCount += cell.isWallLeft()
-        wallCount += cell.isWallRight()
-        return wallCount >= 3
+        walls = self.getKnownWalls(x, y)
+        if walls == None:
+            return False
+        return Cell.WALL_COUNTS[walls] >= 3
 
     def getKnownSurroundings(self, x, y):
         """
-        Determine which neighboring cells the Agent knows about
+        Determine which neighboring locations the Agent can reach from a known cell
         :param x:  The x location of the agent
         :param y:  The y location of the agent
-        :return:   a dict of known neighboring cells
+        :return:   a dict of direction: {"x": x, "y": y} of the neighboring cell, or None where there is a wall
         """
-        currentCell = self.getCellAt(x, y)
+        walls = self.getKnownWalls(x, y)
         return {
-            "up": currentCell.getCellUp() if not currentCell.isWallUp() else None,
-            "down": currentCell.getCellDown() if not currentCell.isWallDown() else None,
-            "left": currentCell.getCellLeft() if not currentCell.isWallLeft() else None,
-            "right": currentCell.getCellRight() if not currentCell.isWallRight() else None
+            "up": {"x": x, "y": y - 1} if not walls & Cell.WALL_UP_BIT and y > 0 else None,
+            "down": {"x": x, "y": y + 1} if not walls & Cell.WALL_DOWN_BIT and y + 1 < self.__height else None,
+            "left": {"x": x - 1, "y": y} if not walls & Cell.WALL_LEFT_BIT and x > 0 else None,
+            "right": {"x": x + 1, "y": y} if not walls & Cell.WALL_RIGHT_BIT and x + 1 < self.__width else None
         }
 
     def resetVisitedCells(self):
@@ -96,19 +130,158 @@ class State:
         Mark every cell in the state as unvisited.
         This functions to allow the agent to continue exploring the labyrinth after exploring all it initially can
         """
-        for x in range(len(self.__visitedCells)):
-            for y in range(len(self.__visitedCells[x])):
-                self.__visitedCells[x][y] = False
+        self.__visitedCells = bytearray(len(self.__visitedCells))
+
+    """
+    Path planning
+    No agent plans paths yet. They find their way back along BreadTrails, so seeded runs stay the same.
+    bench.py times the planner
+    """
+
+    def getNextStepToward(self, x, y, targetX, targetY):
+        """
+        Plan the shortest path to a cell over the known map, assuming unseen cells have no walls
+        The plan is kept, and only repaired when the agent learns of walls that may lengthen it,
+        so asking again every tick is cheap
+        :param x:        the x location of the agent
+        :param y:        the y location of the agent
+        :param targetX:  the x location of the target cell
+        :param targetY:  the y location of the target cell
+        :return:         {"x": x, "y": y} of the next cell on the path, or None if at the target or it can't be reached
+        """
+        distances = self.__getPlan(targetY * self.__width + targetX)
+        i = y * self.__width + x
+        if distances[i] <= 0:
+            return None
+        for j in self.__openNeighbours(i):
+            if distances[j] == distances[i] - 1:
+                return {"x": j % self.__width, "y": j // self.__width}
+        return None
+
+    def getPlannedDistance(self, x, y, targetX, targetY):
+        """
+        :return:  the number of moves on the planned path to the target, or -1 if it can't be reached
+        """
+        return self.__getPlan(targetY * self.__width + targetX)[y * self.__width + x]
+
+    def __getPlan(self, target):
+        if self.__newWalls:
+            for distances in self.__plans.values():
+                self.__repairPlan(distances, self.__newWalls)
+            self.__newWalls = []
+        distances = self.__plans.pop(target, None)
+        if distances == None:
+            distances = self.__planFrom(target)
+            if len(self.__plans) >= self.MAX_PLANS:
+                del self.__plans[next(iter(self.__plans))]
+        # TRICKY: Reinsert the plan, so the dict is ordered from least to most recently used
+        self.__plans[target] = distances
+        return distances
+
+    def __openNeighbours(self, i):
+        """
+        :return:  the indexes of the cells next to cell i that neither cell remembers a wall to
+        """
+        walls = self.__walls
+        width = self.__width
+        neighbours = []
+        if i >= width and not walls[i] & Cell.WALL_UP_BIT and not walls[i - width] & Cell.WALL_DOWN_BIT:
+            neighbours.append(i - width)
+        if i + width < len(walls) and not walls[i] & Cell.WALL_DOWN_BIT and not walls[i + width] & Cell.WALL_UP_BIT:
+            neighbours.append(i + width)
+        if i % width > 0 and not walls[i] & Cell.WALL_LEFT_BIT and not walls[i - 1] & Cell.WALL_RIGHT_BIT:
+            neighbours.append(i - 1)
+        if i % width + 1 < width and not walls[i] & Cell.WALL_RIGHT_BIT and not walls[i + 1] & Cell.WALL_LEFT_BIT:
+            neighbours.append(i + 1)
+        return neighbours
+
+    def __planFrom(self, target):
+        """
+        Breadth first search out from the target
+        :return:  an array of the number of moves from every cell to the target. -1 where it can't be reached
+        """
+        distances = array('i', [-1]) * len(self.__walls)
+        distances[target] = 0
+        frontier = [target]
+        while frontier:
+            nextFrontier = []
+            for i in frontier:
+                for j in self.__openNeighbours(i):
+                    if distances[j] < 0:
+                        distances[j] = distances[i] + 1
+                        nextFrontier.append(j)
+            frontier = nextFrontier
+        return distances
+
+    def __repairPlan(self, distances, changedCells):
+        """
+        Repair a plan after walls were learned. Walls only ever close passages, so distances can only grow.
+        Only the cells that lost every shortest way to the target are searched again
+        """
+        # cells that may have lost their way to the target, by distance
+        candidates = []
+        for i in changedCells:
+            for j in (i, i - self.__width, i + self.__width, i - 1, i + 1):
+                if 0 <= j < len(distances) and distances[j] > 0:
+                    heapq.heappush(candidates, (distances[j], j))
+
+        # TRICKY: Candidates are settled nearest first, so every cell one step closer to the target is
+        # settled before a cell checks whether it still has a way through one of them
+        lost = set()
+        while candidates:
+            distance, i = heapq.heappop(candidates)
+            if i in lost:
+                continue
+            neighbours = self.__openNeighbours(i)
+            if any(distances[j] == distance - 1 and j not in lost for j in neighbours):
+                continue
+            lost.add(i)
+            # cells that went through this one may have lost their way too
+            for j in (i - self.__width, i + self.__width, i - 1, i + 1):
+                if 0 <= j < len(distances) and distances[j] == distance + 1 and j not in lost:
+                    heapq.heappush(candidates, (distance + 1, j))
+        if not lost:
+            return
+
+        # search again from the edge of the lost cells, with the distances that are still right
+        frontier = []
+        for i in lost:
+            best = -1
+            for j in self.__openNeighbours(i):
+                if j not in lost and distances[j] >= 0 and (best < 0 or distances[j] + 1 < best):
+                    best = distances[j] + 1
+            distances[i] = best
+            if best >= 0:
+                heapq.heappush(frontier, (best, i))
+        while frontier:
+            distance, i = heapq.heappop(frontier)
+            if distance != distances[i]:
+                continue
+            for j in self.__openNeighbours(i):
+                if j in lost and (distances[j] < 0 or distance + 1 < distances[j]):
+                    distances[j] = distance + 1
+                    heapq.heappush(frontier, (distance + 1, j))
+
+    def getMemoryUsage(self):
+        """
+        :return:  the number of bytes used by the State's arrays
+        """
+        return len(self.__walls) + len(self.__lastSeen) * self.__lastSeen.itemsize + len(self.__visitedCells) + \
+            sum(len(distances) * distances.itemsize for distances in self.__plans.values())
 
     class BreadTrail:
         """
         A path of cells through the internal state
         Used by Agents to retrace their steps back to specific remembered points
+        Coming back to a cell already on the path cuts off the loop in between, so the path
+        never holds a cell twice and never grows longer than the number of cells
         """
 
         def __init__(self, x, y):
             self.__startingPoint = {"x": x, "y": y}
-            self.__path = [self.__startingPoint]
+            self.__path = [(x, y)]
+            # position of every point in the path, by (x, y)
+            self.__positions = {(x, y): 0}
 
         def getNextStep(self, x, y):
             """
@@ -117,13 +290,24 @@ class State:
             :param y:  the y coordinate of the agent
             :return:   the coordinates of the next cell
             """
-            curr = self.__path.index({"x": x, "y": y})
+            curr = self.__positions.get((x, y))
             if curr == None or curr == 0:
                 return None
-            return self.__path[curr - 1]
+            x, y = self.__path[curr - 1]
+            return {"x": x, "y": y}
 
         def addPoint(self, x, y):
-            self.__path.append({"x": x, "y": y})
+            curr = self.__positions.get((x, y))
+            if curr == None:
+                self.__positions[(x, y)] = len(self.__path)
+                self.__path.append((x, y))
+                return
+            # the agent walked in a loop, or is retracing its steps. Drop everything after the cell
+            while len(self.__path) > curr + 1:
+                del self.__positions[self.__path.pop()]
+
+        def getLength(self):
+            return len(self.__path)
 
         def isFinished(self, x, y):
             return (x == self.__startingPoint["x"] and y == self.__startingPoint["y"])
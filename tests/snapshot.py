@@ -0,0 +1,19 @@
+def describeState(state):
+    """
+    Everything a viewer sees of a Gamestate, as plain values that can be compared
+    :return:  (agent names of every occupied cell in order, items of every cell with any, every agent's
+              name, location, direction, life and inventory, escapee names, victor names)
+    """
+    return ({i: [a.getName() for a in agents] for i, agents in state.getAgentLists().items() if agents},
+            {i: list(items) for i, items in state.getItemLists().items() if items},
+            sorted((a.getName(), a.getLocation()['x'], a.getLocation()['y'], a.getDirection(), a.isAlive(),
+                    tuple(a.getInventory())) for a in state.getAgents().values()),
+            [a.getName() for a in state.getEscapees()],
+            [a.getName() for a in state.getVictors()])
+
+
+def describeRun(run):
+    """
+    :return:  the describeState of every round of a Run
+    """
+    return [describeState(run.getState(round)) for round in range(run.getRoundCount())]
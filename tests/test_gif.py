@@ -0,0 +1,117 @@
+import random
+import struct
+
+import pytest
+
+from gif import INDEX_BITS, GifWriter, encodeFrame, lzwEncode
+
+
+def lzwDecode(data: bytes):
+    """
+    Decompress GIF image data the way a GIF reader does
+    """
+    clearCode = 1 << INDEX_BITS
+    endCode = clearCode + 1
+    out = bytearray()
+    table = None
+    bits = nBits = position = 0
+    codeSize = INDEX_BITS + 1
+    previous = None
+    while True:
+        while nBits < codeSize:
+            bits |= data[position] << nBits
+            position += 1
+            nBits += 8
+        code = bits & ((1 << codeSize) - 1)
+        bits >>= codeSize
+        nBits -= codeSize
+        if code == clearCode:
+            table = [bytes([i]) for i in range(clearCode)] + [None, None]
+            codeSize = INDEX_BITS + 1
+            previous = None
+            continue
+        assert table != None, "the data must start with a clear code"
+        if code == endCode:
+            assert position == len(data), "nothing may follow the end code"
+            return bytes(out)
+        if code < len(table):
+            entry = table[code]
+        else:
+            assert code == len(table) and previous != None, f"code {code} is not in the table"
+            entry = previous + previous[:1]
+        out += entry
+        if previous != None:
+            assert len(table) < 4096, "the table is full, and should have been cleared"
+            table.append(previous + entry[:1])
+            if len(table) == 1 << codeSize and codeSize < 12:
+                codeSize += 1
+        previous = entry
+
+
+def readGif(path):
+    """
+    :return:  (width, height, list of (left, top, width, height, delay, transparent index or None, indexes))
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:6] == b"GIF89a"
+    width, height, flags = struct.unpack_from("<HHB", data, 6)
+    position = 13 + 3 * (2 << (flags & 7))
+    frames = []
+    control = None
+    while data[position] != 0x3B:
+        if data[position] == 0x21:
+            label = data[position + 1]
+            if label == 0xF9:
+                _, packed, delay, transparent, _ = struct.unpack_from("<BBHBB", data, position + 2)
+                control = (delay, transparent if packed & 1 else None)
+            position += 2
+            while data[position]:
+                position += data[position] + 1
+            position += 1
+        else:
+            assert data[position] == 0x2C
+            left, top, frameWidth, frameHeight, _ = struct.unpack_from("<HHHHB", data, position + 1)
+            assert data[position + 10] == INDEX_BITS
+            position += 11
+            image = bytearray()
+            while data[position]:
+                image += data[position + 1:position + 1 + data[position]]
+                position += data[position] + 1
+            position += 1
+            frames.append((left, top, frameWidth, frameHeight, *control, lzwDecode(bytes(image))))
+    assert position == len(data) - 1
+    return width, height, frames
+
+
+def sampleIndexes():
+    rng = random.Random(0)
+    return {
+        "one pixel": bytes([7]),
+        "noise": rng.randbytes(20000),
+        # enough strings to fill the code table several times over
+        "few colors": bytes(rng.choice(b"\x00\x01\x02\x03") for _ in range(120000)),
+        "runs": b"".join(bytes([rng.randrange(256)]) * rng.randrange(1, 300) for _ in range(400)),
+        "transparent runs": b"".join(bytes([255]) * rng.randrange(1, 5000) + rng.randbytes(rng.randrange(1, 9))
+                                     for _ in range(100)),
+        "all transparent": bytes([255]) * 70000,
+    }
+
+
+@pytest.mark.parametrize("runIndex", [None, 255])
+@pytest.mark.parametrize("name", sampleIndexes())
+def test_lzwDecodesToTheInput(name, runIndex):
+    indexes = sampleIndexes()[name]
+    assert lzwDecode(lzwEncode(indexes, runIndex)) == indexes
+
+
+def test_framesDecodeToTheInput(tmp_path):
+    path = str(tmp_path / "run.gif")
+    rng = random.Random(1)
+    frames = [(0, 0, 40, 30, 10, None, rng.randbytes(40 * 30)),
+              (5, 7, 12, 9, 10, 255, bytes(rng.choice(b"\x03\xff") for _ in range(12 * 9))),
+              (39, 29, 1, 1, 250, 0, b"\x00")]
+    with GifWriter(path, 40, 30, [(i, i, i) for i in range(200)]) as writer:
+        for left, top, width, height, delay, transparent, indexes in frames:
+            writer.writeFrame(encodeFrame(indexes, left, top, width, height, delay, transparent))
+    assert readGif(path) == (40, 30, frames)
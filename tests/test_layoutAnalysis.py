@@ -0,0 +1,51 @@
+import pytest
+
+from gameState import Gamestate
+from layoutAnalysis import LayoutAnalysis
+from maze import makeMazeGenerator
+
+# layouts with and without loops: a tree, a few loops, a grid with no inner walls, and long dead ends
+LAYOUTS = [("legacy", 0.0, 10, 10), ("backtracker", 0.0, 12, 9), ("backtracker", 0.15, 12, 9),
+           ("sidewinder", 0.3, 7, 15), ("binaryTree", 1.0, 6, 5), ("comb", 0.05, 11, 8)]
+
+
+def isCutCell(layout, cell):
+    """
+    Brute force: block the cell, and check if the cells next to it can still reach each other
+    """
+    neighbours = layout.getOpenNeighbours(cell)
+    if len(neighbours) < 2:
+        return False
+    reached = {cell, neighbours[0]}
+    frontier = [neighbours[0]]
+    while frontier:
+        i = frontier.pop()
+        for j in layout.getOpenNeighbours(i):
+            if j not in reached:
+                reached.add(j)
+                frontier.append(j)
+    return any(j not in reached for j in neighbours)
+
+
+@pytest.mark.parametrize("name, loopChance, width, height", LAYOUTS)
+def test_chokePointsMatchBruteForce(name, loopChance, width, height):
+    for seed in range(4):
+        layout = Gamestate(width=width, height=height, seed=seed,
+                           mazeGenerator=makeMazeGenerator(name, loopChance)).getLayout()
+        analysis = LayoutAnalysis(layout)
+        expected = [i for i in range(width * height) if isCutCell(layout, i)]
+        assert [location["y"] * width + location["x"] for location in analysis.getChokePoints()] == expected
+        for i in range(width * height):
+            assert analysis.isChokePoint(i % width, i // width) == (i in expected)
+
+
+def test_openRoomHasNoChokePoints():
+    layout = Gamestate(width=6, height=5, seed=0, mazeGenerator=makeMazeGenerator("binaryTree", 1.0)).getLayout()
+    assert LayoutAnalysis(layout).getChokePoints() == []
+
+
+def test_corridorCellsAreAllChokePoints():
+    layout = Gamestate(width=8, height=6, seed=0, mazeGenerator=makeMazeGenerator("serpentine")).getLayout()
+    analysis = LayoutAnalysis(layout)
+    # every cell of a single corridor but its two ends cuts it in two
+    assert len(analysis.getChokePoints()) == 8 * 6 - 2
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from cell import Cell
+from gameState import Gamestate
+from maze import MAZE_GENERATORS, LegacyMaze, makeMazeGenerator
+
+SIZES = [(10, 10), (17, 9), (3, 30)]
+SEEDS = range(5)
+
+
+def mazeCases():
+    for name in MAZE_GENERATORS:
+        if name == "legacy":
+            yield name, 0.0, (LegacyMaze.SIZE, LegacyMaze.SIZE)
+            continue
+        for loopChance in (0.0, 0.2, 1.0):
+            for size in SIZES:
+                yield name, loopChance, size
+
+
+def reachableFrom(layout, start):
+    """
+    :return:  the set of indexes of every cell that can be reached from the start cell
+    """
+    reached = {start}
+    frontier = [start]
+    while frontier:
+        i = frontier.pop()
+        for j in layout.getOpenNeighbours(i):
+            if j not in reached:
+                reached.add(j)
+                frontier.append(j)
+    return reached
+
+
+@pytest.mark.parametrize("name, loopChance, size", list(mazeCases()))
+def test_everyCellIsReachable(name, loopChance, size):
+    width, height = size
+    for seed in SEEDS:
+        layout = Gamestate(width=width, height=height, seed=seed,
+                           mazeGenerator=makeMazeGenerator(name, loopChance)).getLayout()
+        walls = layout.getWalls()
+        for i, bits in enumerate(walls):
+            x, y = i % width, i // width
+            # both sides of a wall agree, and the edges of the grid are closed
+            assert bool(bits & Cell.WALL_UP_BIT) == (y == 0 or bool(walls[i - width] & Cell.WALL_DOWN_BIT))
+            assert bool(bits & Cell.WALL_LEFT_BIT) == (x == 0 or bool(walls[i - 1] & Cell.WALL_RIGHT_BIT))
+            assert y + 1 < height or bits & Cell.WALL_DOWN_BIT
+            assert x + 1 < width or bits & Cell.WALL_RIGHT_BIT
+        assert len(reachableFrom(layout, 0)) == width * height, f"seed {seed}"
+        exits = layout.getExits()
+        assert len(exits) == 2
+        for location in exits:
+            assert location["x"] in (0, width - 1) or location["y"] in (0, height - 1)
+
+
+@pytest.mark.parametrize("name", [name for name in MAZE_GENERATORS if name != "legacy"])
+def test_seedPicksTheMaze(name):
+    generator = makeMazeGenerator(name, 0.1)
+    first = generator.generate(12, 8, random.Random(3))
+    again = generator.generate(12, 8, random.Random(3))
+    assert bytes(first.getWalls()) == bytes(again.getWalls())
+    assert first.getExits() == again.getExits()
+    assert first.getItems() == again.getItems()
+
+
+@pytest.mark.parametrize("size", [(9, 10), (10, 11), (20, 20)])
+def test_legacyLayoutIsOnly10x10(size):
+    with pytest.raises(ValueError):
+        LegacyMaze().generate(*size, random.Random(0))
+    with pytest.raises(ValueError):
+        Gamestate(width=size[0], height=size[1], seed=0)
+
+
+def test_legacyLayoutHasNoLoops():
+    with pytest.raises(ValueError):
+        makeMazeGenerator("legacy", 0.1)
@@ -0,0 +1,73 @@
+import copy
+import pickle
+
+import pytest
+
+from convert import convertRun
+from replay import CODECS, ReplayReader, isReplay
+from run import Run, SimParams
+from snapshot import describeRun
+
+# a run with an escape and agents killed, and a larger generated maze with loops
+PARAMS = {
+    "escape": SimParams(seed=5, roundLimit=300),
+    "sidewinder": SimParams(width=14, height=9, seed=2, maze="sidewinder", loopChance=0.1, roundLimit=150),
+}
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("name", PARAMS)
+def test_replayRoundTrip(tmp_path, name, codec):
+    run = Run(simParams=PARAMS[name])
+    path = str(tmp_path / "run.replay")
+    run.toFile(path, codec)
+    assert isReplay(path)
+    loaded = Run(load_path=path)
+    assert loaded.getRoundCount() == run.getRoundCount()
+    assert loaded.getLayout() is run.getLayout()
+    assert loaded.getStartingLocations() == run.getStartingLocations()
+    assert loaded.getStats() == run.getStats()
+    assert describeRun(loaded) == describeRun(run)
+
+
+def test_recordedRunMatchesTheSavedRun(tmp_path):
+    path = str(tmp_path / "recorded.replay")
+    params = PARAMS["sidewinder"]
+    recorded = Run(simParams=SimParams(width=params.getWidth(), height=params.getHeight(), seed=params.getSeed(),
+                                       maze=params.getMaze(), loopChance=params.getLoopChance(),
+                                       roundLimit=params.getRoundLimit(), recordPath=path))
+    expected = describeRun(Run(simParams=params))
+    assert describeRun(recorded) == expected
+    reader = ReplayReader(path)
+    try:
+        assert reader.getRoundCount() == len(expected)
+        assert describeRun(reader) == expected
+    finally:
+        reader.close()
+
+
+def test_legacyPickleConvertsToReplay(tmp_path):
+    run = Run(simParams=PARAMS["escape"])
+    expected = describeRun(run)
+    path = tmp_path / "labyrinth_run.pkl"
+    # runs used to be saved as a pickled list of the Gamestate of every round
+    with open(path, "wb") as f:
+        pickle.dump([copy.deepcopy(run.getState(round)) for round in range(run.getRoundCount())], f)
+    assert not isReplay(str(path))
+
+    legacy = Run(load_path=str(path))
+    assert describeRun(legacy) == expected
+    assert legacy.getStats() == run.getStats()
+
+    replayPath = convertRun(str(path), "lzma")
+    assert replayPath == str(tmp_path / "labyrinth_run.replay")
+    converted = Run(load_path=replayPath)
+    assert describeRun(converted) == expected
+    assert converted.getStats() == run.getStats()
+
+
+def test_runCanNotOverwriteItsOwnReplay(tmp_path):
+    path = str(tmp_path / "run.replay")
+    Run(simParams=PARAMS["escape"]).toFile(path)
+    with pytest.raises(ValueError):
+        Run(load_path=path).toFile(path)
@@ -0,0 +1,62 @@
+import functools
+import random
+
+import pytest
+
+from run import Run, SimParams
+from snapshot import describeRun, describeState
+
+# runs with a monster shot, a victory, an escape and agents killed between them, and a generated maze with loops
+PARAMS = {
+    "shot": SimParams(seed=1, roundLimit=300),
+    "escape": SimParams(seed=5, roundLimit=300),
+    "backtracker": SimParams(width=16, height=12, seed=5, maze="backtracker", loopChance=0.1, roundLimit=150),
+}
+
+
+@functools.lru_cache
+def simulateLive(name):
+    """
+    :return:  the describeState of every round as it was simulated. With a keyframe every round,
+              getState copies the Gamestate the simulation kept and replays no events
+    """
+    return describeRun(Run(simParams=PARAMS[name], keyframeInterval=1))
+
+
+@pytest.mark.parametrize("keyframeInterval", [7, Run.DEFAULT_KEYFRAME_INTERVAL])
+@pytest.mark.parametrize("name", PARAMS)
+def test_getStateMatchesTheLiveSimulation(name, keyframeInterval):
+    expected = simulateLive(name)
+    run = Run(simParams=PARAMS[name], keyframeInterval=keyframeInterval)
+    assert run.getRoundCount() == len(expected)
+    # out of order, so rounds are rebuilt both from their keyframe and from the round before them
+    rounds = list(range(len(expected))) * 2
+    random.Random(0).shuffle(rounds)
+    for round in rounds:
+        assert describeState(run.getState(round)) == expected[round], f"round {round}"
+
+
+@pytest.mark.parametrize("name", PARAMS)
+def test_seekMatchesTheLiveSimulation(name):
+    expected = simulateLive(name)
+    run = Run(simParams=PARAMS[name], keyframeInterval=7)
+    # seeks past either end are clamped
+    assert describeState(run.seek(len(expected) + 10)) == expected[-1]
+    assert run.current_state == len(expected) - 1
+    for round in range(len(expected) - 2, -1, -1):
+        run.stepBack()
+        assert describeState(run.getState()) == expected[round], f"round {round}"
+    run.stepBack()
+    assert run.current_state == 0
+    for round in range(1, len(expected)):
+        run.stepForward()
+        assert describeState(run.getState()) == expected[round], f"round {round}"
+    assert describeState(run.seek(-5)) == expected[0]
+
+
+def test_backgroundRunMatchesTheLiveSimulation():
+    expected = simulateLive("escape")
+    run = Run(simParams=PARAMS["escape"], keyframeInterval=7, background=True)
+    run.waitForSimulation()
+    assert describeRun(run) == expected
+    assert run.getStats() == Run(simParams=PARAMS["escape"]).getStats()
@@ -0,0 +1,49 @@
+import pytest
+
+from sim import makeSimParams, runSimulations, simulateBatch
+
+N_SIMULATIONS = 8
+BATCH_SEED = 11
+
+
+def simulateInOrder(nWorkers):
+    """
+    :return:  the outcome of every simulation of the batch, in the order of its SimParams
+    """
+    paramsList = makeSimParams(N_SIMULATIONS, BATCH_SEED, roundLimit=150)
+    results = [None] * len(paramsList)
+    for index, result in simulateBatch(paramsList, nWorkers):
+        assert results[index] == None
+        results[index] = (result.getNRounds(), result.getVictors(), result.getEscaped(), result.getKilled(),
+                          result.getExitDistances())
+    return results
+
+
+def test_resultsDoNotDependOnTheWorkers():
+    expected = simulateInOrder(1)
+    assert simulateInOrder(2) == expected
+    assert simulateInOrder(3) == expected
+
+
+def readReport(capsys):
+    # TRICKY: Runs simulated by workers print to the workers' own output, so only this process' lines are kept
+    return [line for line in capsys.readouterr().out.splitlines() if line != "Simulating new run"]
+
+
+def test_reportDoesNotDependOnTheWorkers(capsys):
+    runSimulations(N_SIMULATIONS, 1, BATCH_SEED, roundLimit=150)
+    expected = readReport(capsys)
+    runSimulations(N_SIMULATIONS, 3, BATCH_SEED, roundLimit=150)
+    assert readReport(capsys) == expected
+
+
+def test_batchSeedPicksTheSimulations():
+    seeds = [params.getSeed() for params in makeSimParams(N_SIMULATIONS, BATCH_SEED)]
+    assert seeds == [params.getSeed() for params in makeSimParams(N_SIMULATIONS, BATCH_SEED)]
+    assert len(set(seeds)) == N_SIMULATIONS
+    assert seeds != [params.getSeed() for params in makeSimParams(N_SIMULATIONS, BATCH_SEED + 1)]
+
+
+def test_batchNeedsAWorker():
+    with pytest.raises(ValueError):
+        next(simulateBatch(makeSimParams(1, BATCH_SEED), 0))
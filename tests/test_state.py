@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from gameState import Gamestate
+from maze import makeMazeGenerator
+from state import State
+
+
+def makeWorld(seed, loopChance):
+    return Gamestate(width=13, height=11, seed=seed, mazeGenerator=makeMazeGenerator("backtracker", loopChance))
+
+
+def plannedDistances(state, world, target):
+    return [state.getPlannedDistance(x, y, *target)
+            for y in range(world.getHeight()) for x in range(world.getWidth())]
+
+
+@pytest.mark.parametrize("loopChance", [0.0, 0.2])
+@pytest.mark.parametrize("seed", range(3))
+def test_repairedPlansMatchFreshPlans(seed, loopChance):
+    world = makeWorld(seed, loopChance)
+    width, height = world.getWidth(), world.getHeight()
+    # no more targets than the State keeps plans for, so every plan is repaired rather than planned again
+    targets = [(0, 0), (width - 1, height - 1), (6, 4), (2, 9)][:State.MAX_PLANS]
+    cells = [(x, y) for y in range(height) for x in range(width)]
+    random.Random(seed).shuffle(cells)
+
+    planner = State(0, width, height)
+    for target in targets:
+        planner.getPlannedDistance(0, 0, *target)
+    for seen in range(5, len(cells) + 5, 5):
+        for x, y in cells[seen - 5:seen]:
+            planner.remember(x, y, world.getCellAt(x, y))
+        fresh = State(0, width, height)
+        for x, y in cells[:seen]:
+            fresh.remember(x, y, world.getCellAt(x, y))
+        for target in targets:
+            assert plannedDistances(planner, world, target) == plannedDistances(fresh, world, target), \
+                f"{seen} cells seen, target {target}"
+
+
+def test_nextStepFollowsThePlan():
+    world = makeWorld(0, 0.1)
+    width, height = world.getWidth(), world.getHeight()
+    state = State(0, width, height)
+    for y in range(height):
+        for x in range(width):
+            state.remember(x, y, world.getCellAt(x, y))
+    target = (width - 1, height - 1)
+    x, y = 0, 0
+    distance = state.getPlannedDistance(x, y, *target)
+    assert distance > 0
+    while (x, y) != target:
+        step = state.getNextStepToward(x, y, *target)
+        assert abs(step["x"] - x) + abs(step["y"] - y) == 1
+        x, y = step["x"], step["y"]
+        assert state.getPlannedDistance(x, y, *target) == distance - 1
+        distance -= 1
+    assert state.getNextStepToward(x, y, *target) == None